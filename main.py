@@ -1,3 +1,4 @@
+import multiprocessing
 from lindugui import *
 
 from lindugui.settings.icon import *
@@ -118,6 +119,8 @@ class MainWindow(LMainWindow):
         self.tabMainView.removeTab(currentIndex)
 
 if __name__ == '__main__':
+    # worker processes of the frozen exe start main.py again, they must stop here
+    multiprocessing.freeze_support()
     app = QtGui.QApplication(sys.argv)
     main = MainWindow()
     splash_pix = QtGui.QPixmap(icon.splash_screen)
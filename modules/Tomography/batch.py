@@ -0,0 +1,189 @@
+import os
+import sys
+import time
+import json
+import argparse
+import numpy as np
+from modules.Tomography.subroutine.tomo_inverse import inversion, inversionS, inversion_test, inversion_testS
+from modules.Tomography.subroutine.tomo_log import tomo_log, read_log, stage_log
+from modules.Tomography.subroutine.progress import wrap
+
+# headless runner for the tomography inversion, the same runs and output files as the
+# Tomography window without Qt or mayavi. A run is described by an existing .log file
+# or a json file with the same keys; python -m modules.Tomography.batch run.log
+
+keys = ['evtdat', 'statdat', 'veldat', 'xout', 'yout', 'zout', 'velog', 'velobsout', 'velcalout', 'velpout', 'velsout',
+        'velpsout', 'type', 'deg2km', 'nx', 'ny', 'nz', 'normd', 'gradd', 'iter', 'cacah', 'biter', 'split', 'pert',
+        'solver', 'tol', 'maxiter', 'nproc', 'ttol', 'engine', 'budget',
+        'levels', 'lscale', 'minhits', 'depth', 'linear']
+
+# split (Number of Splitting Ray Resolution) is deprecated: it is read and logged but has no effect
+defaults = dict(xout='', yout='', zout='', velog='', velobsout='', velcalout='', velpout='', velsout='', velpsout='',
+                type='P', deg2km='111.19', split='1', pert='0.05', solver='INV', tol='1e-6', maxiter='0', nproc='1',
+                ttol='0', engine='BENDING', budget='0',
+                levels='1', lscale='1', minhits='0', depth='3', linear='0')
+
+
+class progress(object):
+    # stands in for the Qt progress signal
+    def __init__(self, stream=sys.stdout):
+        self.stream = stream
+
+    def emit(self, s):
+        if self.stream is not None:
+            self.stream.write(str(s) + '\n')
+            self.stream.flush()
+
+
+def config(path, **overrides):
+    # run settings as strings, the way the log file and the window hold them
+    if os.path.splitext(path)[1] == '.json':
+        file = open(path, 'r')
+        settings = dict(defaults, **json.load(file))
+        file.close()
+    else:
+        settings = dict(zip(keys, read_log(path)))
+    settings.update(overrides)
+    missing = [key for key in keys if key not in settings]
+    if missing != []:
+        raise ValueError('missing settings: ' + ', '.join(missing))
+    return {key: str(settings[key]) for key in keys}
+
+
+def options(settings, tag, resume=False, update=False, keep=False):
+    # keyword settings of the inversion calls, checkpoint, result and update state next to the log file
+    checkpoint = None
+    result = None
+    state = None
+    if settings['velog'] != '':
+        checkpoint = os.path.splitext(settings['velog'])[0] + '-' + tag + '.ckpt.npz'
+        result = os.path.splitext(settings['velog'])[0] + '-' + tag + '.tomo.npz'
+        if keep or update:
+            state = os.path.splitext(settings['velog'])[0] + '-' + tag + '.state.npz'
+    opts = dict(solver=settings['solver'], tol=float(settings['tol']), maxiter=int(settings['maxiter']),
+                nproc=int(settings['nproc']), ttol=float(settings['ttol']), engine=settings['engine'],
+                checkpoint=checkpoint, resume=resume, result=result, budget=int(float(settings['budget']) * 2 ** 20),
+                levels=int(settings['levels']), lscale=float(settings['lscale']), minhits=int(settings['minhits']),
+                depth=int(settings['depth']), linear=settings['linear'] == '1')
+    if tag in ['P', 'S']:
+        opts.update(state=state, update=update)
+    return opts
+
+
+def arguments(settings):
+    s = settings
+    return [s['evtdat'], s['statdat'], s['veldat'], float(s['deg2km']), int(s['nx']), int(s['ny']), int(s['nz']),
+            float(s['normd']), float(s['gradd']), int(s['iter']), int(s['split']), int(s['biter']), int(s['cacah'])]
+
+
+def save(vxyz, path):
+    if path != '':
+        np.ndarray.tofile(vxyz, path)
+
+
+def elapsed(start):
+    # same format as tac of lindugui, which can not be imported without Qt
+    t_sec = round(time.time() - start)
+    (t_min, t_sec) = divmod(t_sec, 60)
+    (t_hour, t_min) = divmod(t_min, 60)
+    return '{}hour:{}min:{}sec'.format(t_hour, t_min, t_sec)
+
+
+def write_log(settings, rms):
+    # the run description followed by the rms of every phase, as the window writes it
+    if settings['velog'] == '':
+        return
+    tomo_log(settings['velog'], *[settings[key] for key in keys])
+    file = open(settings['velog'], 'a')
+    for name in rms:
+        file.write('\n' + name + ':' + '\n')
+        for i in range(len(rms[name])):
+            file.write('Iteration' + '\t' + str(i + 1) + ':' + '\t')
+            file.write(str(rms[name][i]) + '\n')
+    file.close()
+
+
+def run(settings, test=False, resume=False, progress_callback=None, update=False, keep=False):
+    # P, S or P & S inversion, or the checkerboard test with test=True; returns the models
+    # by phase ('P', 'S', 'PS') and the rms histories. With update=True an inversion only
+    # traces the events appended since the previous run, which needs the normal equations an
+    # earlier run wrote with keep=True
+    if progress_callback is None:
+        progress_callback = progress()
+    progress_callback = wrap(progress_callback)
+    start = time.time()
+    s = settings
+    phases = ['P', 'S'] if s['type'] == 'P & S' else [s['type']]
+    args = arguments(s)
+    models = {}
+    velr = {}
+    rms = {}
+    for phase in phases:
+        if test:
+            fn = inversion_test if phase == 'P' else inversion_testS
+            x, y, z, models[phase], velr[phase], rms[phase] = \
+                fn(*args, float(s['pert']), progress_callback, **options(s, 'test-' + phase, resume))
+        else:
+            fn = inversion if phase == 'P' else inversionS
+            x, y, z, models[phase], rms[phase] = fn(*args, progress_callback, **options(s, phase, resume, update, keep))
+
+    if len(phases) == 2:
+        models['PS'] = models['P'] / models['S']
+        if test:
+            velr['PS'] = velr['P'] / velr['S']
+
+    if test and len(phases) == 1:
+        save(models[phases[0]], s['velcalout'])
+        save(velr[phases[0]], s['velobsout'])
+    elif test:
+        pathcal = s['velcalout'].split('.')
+        pathobs = s['velobsout'].split('.')
+        for name in ['P', 'S', 'PS']:
+            save(models[name], pathcal[0] + '-' + name + '.' + pathcal[1])
+            save(velr[name], pathobs[0] + '-' + name + '.' + pathobs[1])
+    else:
+        for name, key in [('P', 'velpout'), ('S', 'velsout'), ('PS', 'velpsout')]:
+            if name in models:
+                save(models[name], s[key])
+    save(x, s['xout'])
+    save(y, s['yout'])
+    save(z, s['zout'])
+
+    if len(phases) == 1:
+        write_log(s, {'RMS': rms[phases[0]]})
+    else:
+        write_log(s, {'RMS P': rms['P'], 'RMS S': rms['S']})
+    if s['velog'] != '':
+        stage_log(s['velog'], progress_callback.times)
+        file = open(s['velog'], 'a')
+        file.write('Elapsed Time:' + '\t' + elapsed(start) + '\n')
+        file.close()
+    return x, y, z, models, velr, rms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='tomography inversion without the graphical interface')
+    parser.add_argument('config', help='run description, a tomography .log file or a .json file with the same keys')
+    parser.add_argument('--test', action='store_true', help='checkerboard test instead of the inversion')
+    parser.add_argument('--resume', action='store_true', help='continue from the checkpoints of an earlier run')
+    parser.add_argument('--keep-state', action='store_true',
+                        help='also write the normal equations, for later runs with --update')
+    parser.add_argument('--update', action='store_true',
+                        help='add the events appended to the catalog since the previous run')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help='override one setting, e.g. --set normd=10 --set velog=run10.log')
+    parser.add_argument('--quiet', action='store_true', help='no progress messages')
+    a = parser.parse_args(argv)
+
+    overrides = dict(item.split('=', 1) for item in a.set)
+    unknown = [key for key in overrides if key not in keys]
+    if unknown != []:
+        parser.error('unknown settings: ' + ', '.join(unknown))
+    settings = config(a.config, **overrides)
+    mon = wrap(progress(None if a.quiet else sys.stdout))
+    run(settings, a.test, a.resume, mon, a.update, a.keep_state)
+    mon.emit('stage time: ' + mon.summary())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import numpy as np
+import scipy.sparse as sp
+import modules.Tomography.subroutine.tomo_inverse as ti
+import modules.Tomography.subroutine.parameterization as pr
+import modules.Tomography.subroutine.basic as bs
+import modules.Tomography.subroutine.kernel as kr
+import modules.Tomography.subroutine.solver as sv
+import modules.Tomography.subroutine.block as blk
+import modules.Tomography.subroutine.smoothing as sm
+import modules.Tomography.subroutine.progress as pg
+import modules.Tomography.submodule.analyze2D.submodule.subroutine.actFwdModel as fm2
+import modules.Tomography.submodule.analyze2D.submodule.subroutine.actInvModel as im2
+
+# timing of the tomography stages on synthetic problems of a given size, written as json.
+# Every record is one stage of one engine: wall time of a plain call and, in a second
+# call under tracemalloc, the peak of the memory allocated in it. LEGACY is the inversion
+# as it was before the vectorised engines, the reference for them: scalar iterbending per
+# ray and the dense per-ray kernel loop. The analyze2D records are labelled ANALYZE2D.
+#   python -m modules.Tomography.benchmark --events 20 --stations 10 --out bench.json
+
+legacy = 'LEGACY'
+analyze2d = 'ANALYZE2D'
+
+
+def measure(memory, fn, *args, **kwargs):
+    # result, seconds and peak MB of fn; the memory pass is a second call
+    start = time.perf_counter()
+    out = fn(*args, **kwargs)
+    record = {'seconds': time.perf_counter() - start}
+    if memory:
+        tracemalloc.start()
+        fn(*args, **kwargs)
+        record['peak_mb'] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        tracemalloc.stop()
+    return out, record
+
+
+def problem3d(path, nevent, nsta, seed=0):
+    # .evt, station and 1D velocity files of nevent events recorded by nsta stations
+    # within about 50 km, P picks at every station and S picks at half of them
+    rng = np.random.default_rng(seed)
+    vel = np.array([[0.0, 5.0, 2.9], [5.0, 6.0, 3.4], [15.0, 6.5, 3.7], [30.0, 7.5, 4.3]])
+    sta = [('ST%03d' % i, -7.0 + rng.uniform(-0.25, 0.25), 110.0 + rng.uniform(-0.25, 0.25)) for i in range(nsta)]
+    file = open(os.path.join(path, 'sta.dat'), 'w')
+    for s in sta:
+        file.write('%s %.4f %.4f\n' % s)
+    file.close()
+    file = open(os.path.join(path, 'ev.evt'), 'w')
+    for e in range(nevent):
+        lat = -7.0 + rng.uniform(-0.2, 0.2)
+        lon = 110.0 + rng.uniform(-0.2, 0.2)
+        dep = rng.uniform(5, 25)
+        file.write('# 2020 1 1 0 0 0.0 %.4f %.4f %.2f 1.0 0 0 0 %d\n' % (lat, lon, dep, e + 1))
+        for n in range(len(sta)):
+            d = np.hypot(np.hypot((lat - sta[n][1]) * 111.19, (lon - sta[n][2]) * 111.19), dep)
+            file.write('%s %.3f 1.0 P\n' % (sta[n][0], d / 6.0 * (1 + rng.normal(0, 0.02))))
+            if n % 2 == 0:
+                file.write('%s %.3f 1.0 S\n' % (sta[n][0], d / 3.5 * (1 + rng.normal(0, 0.02))))
+    file.close()
+    np.savetxt(os.path.join(path, 'vel.vel'), vel, fmt='%.2f')
+    return os.path.join(path, 'ev.evt'), os.path.join(path, 'sta.dat'), os.path.join(path, 'vel.vel')
+
+
+def problem2d(path, nevent, nsta, nx, ny, seed=0):
+    # source, station and velocity (.vel2d) files of the analyze2D forward model
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 50, nx)
+    y = np.linspace(0, 30, ny)
+    vel = 5.0 + 2.0 * y[:, None] / 30.0 + 0.3 * np.sin(x[None, :] / 8.0)
+    file = open(os.path.join(path, 'vel.vel2d'), 'wb')
+    np.savez(file, vel=vel, x=x, y=y)
+    file.close()
+    file = open(os.path.join(path, 'vin.vel2d'), 'wb')
+    np.savez(file, vel=np.full(vel.shape, 6.0), x=x, y=y)
+    file.close()
+    file = open(os.path.join(path, 'sta.stat'), 'w')
+    for i in range(nsta):
+        file.write('S%d %.3f %.3f\n' % (i, 1 + i * 48.0 / max(nsta - 1, 1), 0.0))
+    file.close()
+    file = open(os.path.join(path, 'src.src'), 'w')
+    for e in range(nevent):
+        file.write('E%d %.3f %.3f\n' % (e, rng.uniform(5, 45), rng.uniform(8, 28)))
+    file.close()
+    return [os.path.join(path, name) for name in ['src.src', 'sta.stat', 'vel.vel2d', 'vin.vel2d']]
+
+
+def legacy_forward(x, y, z, vxyz, src, rcv, biter, cacah):
+    # one scalar iterbending call per ray, as the inversion did before the vectorised engines
+    dvx, dvy, dvz = bs.diff_cube(vxyz, x, y, z)
+    paths = np.zeros((len(src), cacah + 1, 3))
+    for n in range(len(src)):
+        xi, yi, zi = ti.iterbending(biter, cacah, x, y, z, vxyz, src[n, 0], src[n, 1], src[n, 2], rcv[n, 0], rcv[n, 1],
+                                    dvx, dvy, dvz)
+        paths[n] = np.transpose([xi, yi, zi])
+    return paths
+
+
+def legacy_kernel(x, y, z, vxyz, paths, gr):
+    # the dense per-ray loop of the inversion before the sparse kernel: every path segment
+    # is cut into gr pieces per crossed block, each piece charged to the block it starts in
+    nx, ny, nz = vxyz.shape
+    k = np.zeros((len(paths), vxyz.size))
+    tcal = np.zeros(len(paths))
+    for tri in range(len(paths)):
+        xi, yi, zi = paths[tri, :, 0], paths[tri, :, 1], paths[tri, :, 2]
+        for g in range(len(xi) - 1):
+            o1, p1, q1 = bs.index(x, y, z, xi[g], yi[g], zi[g])
+            o2, p2, q2 = bs.index(x, y, z, xi[g + 1], yi[g + 1], zi[g + 1])
+            ngr = np.abs(o2 - o1) + np.abs(p2 - p1) + np.abs(q2 - q1) + 1
+            lgr = gr * ngr
+            xsp = np.linspace(xi[g], xi[g + 1], int(lgr))
+            ysp = np.linspace(yi[g], yi[g + 1], int(lgr))
+            zsp = np.linspace(zi[g], zi[g + 1], int(lgr))
+            for ii in range(lgr - 1):
+                l = np.sqrt(pow(xsp[ii] - xsp[ii + 1], 2) + pow(ysp[ii] - ysp[ii + 1], 2) +
+                            pow(zsp[ii] - zsp[ii + 1], 2))
+                oi, pi, qi = bs.index(x, y, z, xsp[ii], ysp[ii], zsp[ii])
+                nb = bs.noblok(oi, pi, qi, nx, ny)
+                k[tri, nb] = k[tri, nb] + l
+                tcal[tri] = tcal[tri] + l / vxyz[oi, pi, qi]
+    return sp.csr_matrix(k), tcal
+
+
+def bench3d(nevent, nsta, nx, ny, nz, biter=5, cacah=6, engines=None, nproc=1, solver='INV', normd=20.0,
+            gradd=20.0, memory=True, gr=10):
+    if engines is None:
+        engines = [legacy] + ti.engines
+    mon = pg.monitor()
+    base = {'problem': '3d', 'events': nevent, 'stations': nsta, 'shape': [nx, ny, nz]}
+    records = []
+    path = tempfile.mkdtemp()
+    try:
+        evtfile, statfile, velfile = problem3d(path, nevent, nsta)
+        (cat, velocity), r = measure(memory, ti.load, evtfile, statfile, velfile, 111.19, mon)
+        records.append(dict(base, engine='', stage='load', **r))
+        (x, y, z, vxyz), r = measure(memory, pr.param2, cat, velocity, 111.19, nx, ny, nz)
+        records.append(dict(base, engine='', stage='parameterize', **r))
+        src, rcv, tobs = cat.phase('P')
+        base['rays'] = len(src)
+
+        for engine in engines:
+            if engine == legacy:
+                paths, r = measure(memory, legacy_forward, x, y, z, vxyz, src, rcv, biter, cacah)
+                records.append(dict(base, engine=engine, stage='ray tracing', **r))
+                (kray, tcal), r = measure(memory, legacy_kernel, x, y, z, vxyz, paths, gr)
+                records.append(dict(base, engine=engine, stage='kernel', **r))
+            else:
+                # the split between ray tracing and kernel comes from the stage timers, summed
+                # over both calls of measure
+                mon.times.clear()
+                (kray, tcal, paths), r = measure(memory, ti.forward, x, y, z, vxyz, src, rcv, biter, cacah, nproc,
+                                                 engine=engine, progress_callback=mon)
+                seconds = dict(mon.times)
+                scale = r['seconds'] / max(sum(seconds.values()), 1e-12)
+                for stage in ['ray tracing', 'kernel']:
+                    records.append(dict(base, engine=engine, stage=stage, seconds=seconds.get(stage, 0.0) * scale))
+                records.append(dict(base, engine=engine, stage='forward', **r))
+
+            gamma = sm.gamma(vxyz.shape)
+            k = kr.damped(kray, normd, gradd, gamma)
+            ds, r = measure(memory, sv.solve, k, tobs - tcal, solver)
+            # rms of the residuals going into the solve, to check the engines agree
+            records.append(dict(base, engine=engine, stage='solve', solver=solver,
+                                rms=float(np.sum((tobs - tcal) ** 2)), **r))
+            v, r = measure(memory, lambda: blk.scatter(blk.update(blk.flatten(vxyz), ds), vxyz.shape))
+            records.append(dict(base, engine=engine, stage='update', **r))
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    return records
+
+
+def bench2d(nevent, nsta, nx, ny, biter=5, cacah=6, memory=True):
+    # the analyze2D forward model and one inversion iteration, timed as wholes
+    mon = pg.monitor()
+    base = {'problem': '2d', 'events': nevent, 'stations': nsta, 'shape': [nx, ny], 'rays': nevent * nsta,
+            'engine': analyze2d}
+    records = []
+    path = tempfile.mkdtemp()
+    try:
+        srcfile, statfile, velfile, vinfile = problem2d(path, nevent, nsta, nx, ny)
+        evtfile = os.path.join(path, 'ev.evt')
+        rayfile = os.path.join(path, 'ray')
+        r = measure(memory, fm2.fwdModel, srcfile, statfile, velfile, evtfile, rayfile, 1, biter, cacah, mon)[1]
+        records.append(dict(base, stage='forward', **r))
+        r = measure(memory, im2.inversion, evtfile, statfile, vinfile, rayfile + '.inv', os.path.join(path, 'vout'),
+                    20, 20, 1, 1, biter, cacah, 0, mon)[1]
+        records.append(dict(base, stage='inversion', **r))
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    return records
+
+
+def environment():
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'machine': platform.machine(),
+            'processor': platform.processor(), 'cpus': os.cpu_count(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S')}
+
+
+def compare(old, new):
+    # ratio old/new of the seconds of every record found in both runs, > 1 is a speedup
+    def key(r):
+        return (r['problem'], r['events'], r['stations'], tuple(r['shape']), r['engine'], r['stage'])
+    before = {key(r): r['seconds'] for r in old['results']}
+    rows = []
+    for r in new['results']:
+        if key(r) in before and r['seconds'] > 0:
+            rows.append(list(key(r)) + [before[key(r)], r['seconds'], before[key(r)] / r['seconds']])
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='benchmark of the tomography engines on synthetic problems')
+    parser.add_argument('--events', type=int, nargs='+', default=[10], help='numbers of events, one problem each')
+    parser.add_argument('--stations', type=int, default=8)
+    parser.add_argument('--grid', type=int, nargs=3, default=[8, 8, 6], metavar=('NX', 'NY', 'NZ'))
+    parser.add_argument('--grid2d', type=int, nargs=2, default=[11, 7], metavar=('NX', 'NY'))
+    parser.add_argument('--engines', nargs='+', default=[legacy] + ti.engines)
+    parser.add_argument('--nproc', type=int, default=1)
+    parser.add_argument('--solver', default='INV')
+    parser.add_argument('--biter', type=int, default=5)
+    parser.add_argument('--cacah', type=int, default=6)
+    parser.add_argument('--split', type=int, default=10, help='pieces per crossed block of the LEGACY kernel')
+    parser.add_argument('--no-2d', action='store_true', help='3D problems only')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc pass')
+    parser.add_argument('--out', help='json output file, standard output by default')
+    parser.add_argument('--compare', help='earlier json output; prints old/new time ratios')
+    a = parser.parse_args(argv)
+
+    results = []
+    for nevent in a.events:
+        results += bench3d(nevent, a.stations, a.grid[0], a.grid[1], a.grid[2], a.biter, a.cacah, a.engines,
+                           a.nproc, a.solver, memory=not a.no_memory, gr=a.split)
+        if not a.no_2d:
+            results += bench2d(nevent, a.stations, a.grid2d[0], a.grid2d[1], a.biter, a.cacah,
+                               memory=not a.no_memory)
+    report = {'environment': environment(), 'arguments': vars(a), 'results': results}
+
+    if a.out is None:
+        json.dump(report, sys.stdout, indent=1)
+        sys.stdout.write('\n')
+    else:
+        file = open(a.out, 'w')
+        json.dump(report, file, indent=1)
+        file.close()
+    if a.compare is not None:
+        file = open(a.compare, 'r')
+        old = json.load(file)
+        file.close()
+        for row in compare(old, report):
+            sys.stderr.write('\t'.join(str(c) for c in row[:6]) + '\t%.4g\t%.4g\t%.2fx\n' % tuple(row[6:]))
+
+
+if __name__ == '__main__':
+    main()
@@ -3,11 +3,16 @@ from lindugui import LMainWindow, \
     MessageBox, \
     sys, QtGui, QtCore
 
+import os
 import numpy as np
 
-from modules.Tomography.subroutine.tomo_inverse import inversion, inversionS, inversion_test, inversion_testS
-from modules.Tomography.subroutine.tomo_log import tomo_log, read_log
+from modules.Tomography.subroutine.tomo_inverse import inversion, inversionS, inversion_test, inversion_testS, lcurve, \
+    resolution, engines
+from modules.Tomography.subroutine.tomo_log import tomo_log, read_log, stage_log
+from modules.Tomography.subroutine.progress import monitor
+from modules.Tomography.subroutine.solver import methods
 import modules.Tomography.subroutine.hypoDD2tomofile as ht
+import modules.Tomography.subroutine.result as rt
 # import module.Tomography.submodule.analyze2D.main as an2d
 
 class MainWindow(LMainWindow):
@@ -19,6 +24,7 @@ class MainWindow(LMainWindow):
         self.menubar()
         self.main_widget()
         self.threadpool = QtCore.QThreadPool()
+        self.timing = ''
 
     # create main widget
     def main_widget(self):
@@ -163,10 +169,12 @@ class MainWindow(LMainWindow):
         self.biter.setText('100')
 
         lb_split = QtGui.QLabel()
-        lb_split.setText('Number of Splitting Ray Resolution')
+        lb_split.setText('Number of Splitting Ray Resolution (deprecated)')
+        lb_split.setToolTip('Deprecated: rays are traversed exactly through the blocks, this value is ignored')
         # lb_split.setToolTip('Index of cluster to be relocated (0 = all)')
         self.split = QtGui.QLineEdit()
         self.split.setText('100')
+        self.split.setEnabled(False)
 
         lb_pert = QtGui.QLabel()
         lb_pert.setText('Value of Perturbation Test')
@@ -174,6 +182,89 @@ class MainWindow(LMainWindow):
         self.pert = QtGui.QLineEdit()
         self.pert.setText('0.3')
 
+        lb_sizes = QtGui.QLabel()
+        lb_sizes.setText('Checkerboard Sizes (Resolution)')
+        lb_sizes.setToolTip('Blocks per checkerboard square, comma separated')
+        self.sizes = QtGui.QLineEdit()
+        self.sizes.setText('1')
+
+        lb_rdiag = QtGui.QLabel()
+        lb_rdiag.setText('Resolution Matrix Diagonal (dense)')
+        self.rdiag = QtGui.QCheckBox()
+
+        lb_solver = QtGui.QLabel()
+        lb_solver.setText('Inversion Solver')
+        self.solver = QtGui.QComboBox()
+        for i in range(len(methods)):
+            self.solver.addItem(methods[i])
+
+        lb_tol = QtGui.QLabel()
+        lb_tol.setText('Solver Tolerance')
+        self.tol = QtGui.QLineEdit()
+        self.tol.setText('1e-6')
+
+        lb_maxiter = QtGui.QLabel()
+        lb_maxiter.setText('Solver Iteration Limit (0 = auto)')
+        self.maxiter = QtGui.QLineEdit()
+        self.maxiter.setText('0')
+
+        lb_nproc = QtGui.QLabel()
+        lb_nproc.setText('Number of Processes (Forward Modelling)')
+        self.nproc = QtGui.QLineEdit()
+        self.nproc.setText('1')
+
+        lb_ttol = QtGui.QLabel()
+        lb_ttol.setText('Ray Bending Tolerance (s, 0 = off)')
+        self.ttol = QtGui.QLineEdit()
+        self.ttol.setText('0')
+
+        lb_budget = QtGui.QLabel()
+        lb_budget.setText('Memory Budget (MB, 0 = all rays at once)')
+        self.budget = QtGui.QLineEdit()
+        self.budget.setText('0')
+
+        lb_levels = QtGui.QLabel()
+        lb_levels.setText('Grid Levels (coarse to fine)')
+        self.levels = QtGui.QLineEdit()
+        self.levels.setText('1')
+
+        lb_lscale = QtGui.QLabel()
+        lb_lscale.setText('Level Damping Factor')
+        self.lscale = QtGui.QLineEdit()
+        self.lscale.setText('1')
+
+        lb_minhits = QtGui.QLabel()
+        lb_minhits.setText('Adaptive Min Hits (0 = regular grid)')
+        self.minhits = QtGui.QLineEdit()
+        self.minhits.setText('0')
+
+        lb_depth = QtGui.QLabel()
+        lb_depth.setText('Adaptive Merge Depth')
+        self.depth = QtGui.QLineEdit()
+        self.depth.setText('3')
+
+        lb_linear = QtGui.QLabel()
+        lb_linear.setText('Trilinear Velocity in Ray Bending')
+        self.linear = QtGui.QCheckBox()
+
+        lb_engine = QtGui.QLabel()
+        lb_engine.setText('Forward Engine')
+        self.engine = QtGui.QComboBox()
+        for i in range(len(engines)):
+            self.engine.addItem(engines[i])
+
+        lb_resume = QtGui.QLabel()
+        lb_resume.setText('Resume from Checkpoint')
+        self.resume = QtGui.QCheckBox()
+
+        lb_keep = QtGui.QLabel()
+        lb_keep.setText('Keep Normal Equations for Updates')
+        self.keep = QtGui.QCheckBox()
+
+        lb_update = QtGui.QLabel()
+        lb_update.setText('Update with New Events')
+        self.incremental = QtGui.QCheckBox()
+
         # -> settings to layout
         layout_parameters.addRow(lb_type, self.type)
         layout_parameters.addRow(lb_deg2km, self.deg2km)
@@ -187,6 +278,23 @@ class MainWindow(LMainWindow):
         layout_parameters.addRow(lb_biter, self.biter)
         layout_parameters.addRow(lb_split, self.split)
         layout_parameters.addRow(lb_pert, self.pert)
+        layout_parameters.addRow(lb_sizes, self.sizes)
+        layout_parameters.addRow(lb_rdiag, self.rdiag)
+        layout_parameters.addRow(lb_solver, self.solver)
+        layout_parameters.addRow(lb_tol, self.tol)
+        layout_parameters.addRow(lb_maxiter, self.maxiter)
+        layout_parameters.addRow(lb_nproc, self.nproc)
+        layout_parameters.addRow(lb_ttol, self.ttol)
+        layout_parameters.addRow(lb_engine, self.engine)
+        layout_parameters.addRow(lb_linear, self.linear)
+        layout_parameters.addRow(lb_budget, self.budget)
+        layout_parameters.addRow(lb_levels, self.levels)
+        layout_parameters.addRow(lb_lscale, self.lscale)
+        layout_parameters.addRow(lb_minhits, self.minhits)
+        layout_parameters.addRow(lb_depth, self.depth)
+        layout_parameters.addRow(lb_resume, self.resume)
+        layout_parameters.addRow(lb_keep, self.keep)
+        layout_parameters.addRow(lb_update, self.incremental)
         group_parameters.setLayout(layout_parameters)
         self.relocatelayout.addWidget(group_parameters)
 
@@ -310,15 +418,63 @@ class MainWindow(LMainWindow):
         btn_settings_test.setText('Test Resolution!')
         btn_settings_test.clicked.connect(self.btn_relocate_test_clicked)
 
+        btn_settings_lcurve = QtGui.QPushButton()
+        btn_settings_lcurve.setSizePolicy(QtGui.QSizePolicy.Fixed, QtGui.QSizePolicy.Fixed)
+        btn_settings_lcurve.setText('L-Curve!')
+        btn_settings_lcurve.setToolTip('Norm and Gradient Value as comma separated lists')
+        btn_settings_lcurve.clicked.connect(self.btn_lcurve_clicked)
+
+        btn_settings_resolution = QtGui.QPushButton()
+        btn_settings_resolution.setSizePolicy(QtGui.QSizePolicy.Fixed, QtGui.QSizePolicy.Fixed)
+        btn_settings_resolution.setText('Resolution!')
+        btn_settings_resolution.setToolTip('Checkerboard recovery on the kernel of the inversion, '
+                                           'Value of Perturbation Test as comma separated list')
+        btn_settings_resolution.clicked.connect(self.btn_resolution_clicked)
+
         # -> settings to layout
         okcancel_layout = QtGui.QHBoxLayout()
         okcancel_layout.addWidget(btn_settings_ok)
         okcancel_layout.addWidget(btn_settings_test)
+        okcancel_layout.addWidget(btn_settings_lcurve)
+        okcancel_layout.addWidget(btn_settings_resolution)
         layout_parameters.addRow(okcancel_layout)
 
+    def options(self, tag):
+        # keyword settings shared by every inversion call, checkpoints and the result container
+        # are kept next to the log file
+        checkpoint = None
+        result = None
+        if self.line_velog.text() != '':
+            checkpoint = os.path.splitext(self.line_velog.text())[0] + '-' + tag + '.ckpt.npz'
+            result = os.path.splitext(self.line_velog.text())[0] + '-' + tag + '.tomo.npz'
+        opts = dict(solver=self.solver.currentText(), tol=float(self.tol.text()), maxiter=int(self.maxiter.text()),
+                    nproc=int(self.nproc.text()), ttol=float(self.ttol.text()), engine=self.engine.currentText(),
+                    checkpoint=checkpoint, resume=self.resume.isChecked(), result=result,
+                    budget=int(float(self.budget.text()) * 2 ** 20), levels=int(self.levels.text()),
+                    lscale=float(self.lscale.text()), minhits=int(self.minhits.text()), depth=int(self.depth.text()),
+                    linear=self.linear.isChecked())
+        if tag in ['P', 'S']:
+            # with keep checked the inversion also writes its normal equations (K^T K grows with the
+            # square of the block count); a later run with update checked only traces the rays of
+            # events appended to the catalog
+            state = None
+            if self.line_velog.text() != '' and (self.keep.isChecked() or self.incremental.isChecked()):
+                state = os.path.splitext(self.line_velog.text())[0] + '-' + tag + '.state.npz'
+            opts.update(state=state, update=self.incremental.isChecked())
+        return opts
+
+    def output(self, tag):
+        # L-curve and resolution files next to the log file, or next to the 1D velocity model without one
+        if self.line_velog.text() != '':
+            return os.path.splitext(self.line_velog.text())[0] + '-' + tag
+        return os.path.splitext(self.line_veldat.text())[0] + '-' + tag
+
     def execute_this_btn_relocate_test_clicked(self, progress_callback):
         self.labstat.setText('Status: Processing . . .')
         tic()
+        # stage timing of the whole run, shown when it finishes
+        progress_callback = monitor(progress_callback)
+        self.timing = ''
         if self.type.currentIndex() == 0:
             x, y, z, vxyz, velr, rms = inversion_test(self.line_evtdat.text(), self.line_statdat.text(),
                                                       self.line_veldat.text(), float(self.deg2km.text()),
@@ -327,7 +483,8 @@ class MainWindow(LMainWindow):
                                                       float(self.normd.text()), float(self.gradd.text()),
                                                       int(self.iter.text()),
                                                       int(self.split.text()), int(self.biter.text()),
-                                                      int(self.cacah.text()), float(self.pert.text()),progress_callback)
+                                                      int(self.cacah.text()), float(self.pert.text()), progress_callback,
+                                                      **self.options('test-P'))
             np.ndarray.tofile(vxyz, self.line_velcalout.text())
             np.ndarray.tofile(velr, self.line_velobsout.text())
             np.ndarray.tofile(x, self.line_xout.text())
@@ -338,7 +495,11 @@ class MainWindow(LMainWindow):
                      self.line_velobsout.text(), self.line_velcalout.text(), self.line_velpout.text(), self.line_velsout.text(),
                      self.line_velpsout.text(), self.type.currentText(), self.deg2km.text(), self.nx.text(), self.ny.text(),
                      self.nz.text(), self.normd.text(), self.gradd.text(), self.iter.text(), self.cacah.text(), self.biter.text(),
-                     self.split.text(), self.pert.text())
+                     self.split.text(), self.pert.text(), self.solver.currentText(), self.tol.text(),
+                     self.maxiter.text(), self.nproc.text(), self.ttol.text(),
+                     self.engine.currentText(), self.budget.text(),
+                     self.levels.text(), self.lscale.text(), self.minhits.text(), self.depth.text(),
+                     '1' if self.linear.isChecked() else '0')
             file = open(self.line_velog.text(), 'a')
             file.write('\n' + 'RMS:' + '\n')
             for i in range(len(rms)):
@@ -354,7 +515,8 @@ class MainWindow(LMainWindow):
                                                        float(self.normd.text()), float(self.gradd.text()),
                                                        int(self.iter.text()),
                                                        int(self.split.text()), int(self.biter.text()),
-                                                       int(self.cacah.text()), float(self.pert.text()),progress_callback)
+                                                       int(self.cacah.text()), float(self.pert.text()), progress_callback,
+                                                       **self.options('test-S'))
             np.ndarray.tofile(vxyz, self.line_velcalout.text())
             np.ndarray.tofile(velr, self.line_velobsout.text())
             np.ndarray.tofile(x, self.line_xout.text())
@@ -368,7 +530,11 @@ class MainWindow(LMainWindow):
                      self.ny.text(),
                      self.nz.text(), self.normd.text(), self.gradd.text(), self.iter.text(), self.cacah.text(),
                      self.biter.text(),
-                     self.split.text(), self.pert.text())
+                     self.split.text(), self.pert.text(), self.solver.currentText(), self.tol.text(),
+                     self.maxiter.text(), self.nproc.text(), self.ttol.text(),
+                     self.engine.currentText(), self.budget.text(),
+                     self.levels.text(), self.lscale.text(), self.minhits.text(), self.depth.text(),
+                     '1' if self.linear.isChecked() else '0')
             file = open(self.line_velog.text(), 'a')
             file.write('\n' + 'RMS:' + '\n')
             for i in range(len(rms)):
@@ -384,7 +550,8 @@ class MainWindow(LMainWindow):
                                                          float(self.normd.text()), float(self.gradd.text()),
                                                          int(self.iter.text()),
                                                          int(self.split.text()), int(self.biter.text()),
-                                                         int(self.cacah.text()), float(self.pert.text()),progress_callback)
+                                                         int(self.cacah.text()), float(self.pert.text()), progress_callback,
+                                                         **self.options('test-P'))
             x, y, z, vxyzs, velrs, rmss = inversion_testS(self.line_evtdat.text(), self.line_statdat.text(),
                                                           self.line_veldat.text(), float(self.deg2km.text()),
                                                           int(self.nx.text()),
@@ -392,7 +559,8 @@ class MainWindow(LMainWindow):
                                                           float(self.normd.text()), float(self.gradd.text()),
                                                           int(self.iter.text()),
                                                           int(self.split.text()), int(self.biter.text()),
-                                                          int(self.cacah.text()), float(self.pert.text()),progress_callback)
+                                                          int(self.cacah.text()), float(self.pert.text()), progress_callback,
+                                                          **self.options('test-S'))
             vxyzps = vxyzp / vxyzs
             velrps = velrp / velrs
             pathcal = self.line_velcalout.text().split('.')
@@ -414,7 +582,11 @@ class MainWindow(LMainWindow):
                      self.ny.text(),
                      self.nz.text(), self.normd.text(), self.gradd.text(), self.iter.text(), self.cacah.text(),
                      self.biter.text(),
-                     self.split.text(), self.pert.text())
+                     self.split.text(), self.pert.text(), self.solver.currentText(), self.tol.text(),
+                     self.maxiter.text(), self.nproc.text(), self.ttol.text(),
+                     self.engine.currentText(), self.budget.text(),
+                     self.levels.text(), self.lscale.text(), self.minhits.text(), self.depth.text(),
+                     '1' if self.linear.isChecked() else '0')
             file = open(self.line_velog.text(), 'a')
             file.write('\n' + 'RMS P:' + '\n')
             for i in range(len(rmsp)):
@@ -425,6 +597,8 @@ class MainWindow(LMainWindow):
                 file.write('Iteration' + '\t' + str(i + 1) + ':' + '\t')
                 file.write(str(rmss[i]) + '\n')
             file.close()
+        stage_log(self.line_velog.text(), progress_callback.times)
+        self.timing = progress_callback.summary()
         elt = tac()
         return elt
 
@@ -433,7 +607,7 @@ class MainWindow(LMainWindow):
         file.write('Elapsed Time:' + '\t' + s + '\n')
 
     def btn_relocate_test_clicked_complete(self):
-        self.labstat.setText('Status: Finished')
+        self.labstat.setText('Status: Finished' + ('' if self.timing == '' else ' (' + self.timing + ')'))
 
     def progress_btn_relocate_test_clicked(self, n):
         self.labstat.setText(n)
@@ -457,13 +631,16 @@ class MainWindow(LMainWindow):
     def execute_this_btn_relocate_ok_clicked(self, progress_callback):
         self.labstat.setText('Status: Processing . . .')
         tic()
+        # stage timing of the whole run, shown when it finishes
+        progress_callback = monitor(progress_callback)
+        self.timing = ''
         if self.type.currentIndex() == 0:
             x, y, z, vxyz, rms = inversion(self.line_evtdat.text(), self.line_statdat.text(), self.line_veldat.text(),
                                            float(self.deg2km.text()), int(self.nx.text()),
                                            int(self.ny.text()), int(self.nz.text()), float(self.normd.text()),
                                            float(self.gradd.text()), int(self.iter.text()),
                                            int(self.split.text()), int(self.biter.text()), int(self.cacah.text()),
-                                           progress_callback)
+                                           progress_callback, **self.options('P'))
             np.ndarray.tofile(vxyz, self.line_velpout.text())
             np.ndarray.tofile(x, self.line_xout.text())
             np.ndarray.tofile(y, self.line_yout.text())
@@ -476,7 +653,11 @@ class MainWindow(LMainWindow):
                      self.ny.text(),
                      self.nz.text(), self.normd.text(), self.gradd.text(), self.iter.text(), self.cacah.text(),
                      self.biter.text(),
-                     self.split.text(), self.pert.text())
+                     self.split.text(), self.pert.text(), self.solver.currentText(), self.tol.text(),
+                     self.maxiter.text(), self.nproc.text(), self.ttol.text(),
+                     self.engine.currentText(), self.budget.text(),
+                     self.levels.text(), self.lscale.text(), self.minhits.text(), self.depth.text(),
+                     '1' if self.linear.isChecked() else '0')
             file = open(self.line_velog.text(), 'a')
             file.write('\n' + 'RMS:' + '\n')
             for i in range(len(rms)):
@@ -490,7 +671,7 @@ class MainWindow(LMainWindow):
                                             int(self.ny.text()), int(self.nz.text()), float(self.normd.text()),
                                             float(self.gradd.text()), int(self.iter.text()),
                                             int(self.split.text()), int(self.biter.text()), int(self.cacah.text()),
-                                            progress_callback)
+                                            progress_callback, **self.options('S'))
             np.ndarray.tofile(vxyz, self.line_velsout.text())
             np.ndarray.tofile(x, self.line_xout.text())
             np.ndarray.tofile(y, self.line_yout.text())
@@ -503,7 +684,11 @@ class MainWindow(LMainWindow):
                      self.ny.text(),
                      self.nz.text(), self.normd.text(), self.gradd.text(), self.iter.text(), self.cacah.text(),
                      self.biter.text(),
-                     self.split.text(), self.pert.text())
+                     self.split.text(), self.pert.text(), self.solver.currentText(), self.tol.text(),
+                     self.maxiter.text(), self.nproc.text(), self.ttol.text(),
+                     self.engine.currentText(), self.budget.text(),
+                     self.levels.text(), self.lscale.text(), self.minhits.text(), self.depth.text(),
+                     '1' if self.linear.isChecked() else '0')
             file = open(self.line_velog.text(), 'a')
             file.write('\n' + 'RMS:' + '\n')
             for i in range(len(rms)):
@@ -517,14 +702,14 @@ class MainWindow(LMainWindow):
                                              int(self.ny.text()), int(self.nz.text()), float(self.normd.text()),
                                              float(self.gradd.text()), int(self.iter.text()),
                                              int(self.split.text()), int(self.biter.text()), int(self.cacah.text()),
-                                             progress_callback)
+                                             progress_callback, **self.options('P'))
             x, y, z, vxyzs, rmss = inversionS(self.line_evtdat.text(), self.line_statdat.text(),
                                               self.line_veldat.text(),
                                               float(self.deg2km.text()), int(self.nx.text()),
                                               int(self.ny.text()), int(self.nz.text()), float(self.normd.text()),
                                               float(self.gradd.text()), int(self.iter.text()),
                                               int(self.split.text()), int(self.biter.text()), int(self.cacah.text()),
-                                              progress_callback)
+                                              progress_callback, **self.options('S'))
             vxyzps = vxyzp / vxyzs
             np.ndarray.tofile(vxyzp, self.line_velpout.text())
             np.ndarray.tofile(vxyzs, self.line_velsout.text())
@@ -540,7 +725,11 @@ class MainWindow(LMainWindow):
                      self.ny.text(),
                      self.nz.text(), self.normd.text(), self.gradd.text(), self.iter.text(), self.cacah.text(),
                      self.biter.text(),
-                     self.split.text(), self.pert.text())
+                     self.split.text(), self.pert.text(), self.solver.currentText(), self.tol.text(),
+                     self.maxiter.text(), self.nproc.text(), self.ttol.text(),
+                     self.engine.currentText(), self.budget.text(),
+                     self.levels.text(), self.lscale.text(), self.minhits.text(), self.depth.text(),
+                     '1' if self.linear.isChecked() else '0')
             file = open(self.line_velog.text(), 'a')
             file.write('\n' + 'RMS P:' + '\n')
             for i in range(len(rmsp)):
@@ -551,6 +740,8 @@ class MainWindow(LMainWindow):
                 file.write('Iteration' + '\t' + str(i + 1) + ':' + '\t')
                 file.write(str(rmss[i]) + '\n')
             file.close()
+        stage_log(self.line_velog.text(), progress_callback.times)
+        self.timing = progress_callback.summary()
         elt = tac()
         return elt
 
@@ -559,7 +750,7 @@ class MainWindow(LMainWindow):
         file.write('Elapsed Time:' + '\t' + s + '\n')
 
     def btn_relocate_ok_clicked_complete(self):
-        self.labstat.setText('Status: Finished')
+        self.labstat.setText('Status: Finished' + ('' if self.timing == '' else ' (' + self.timing + ')'))
 
     def progress_btn_relocate_ok_clicked(self, n):
         self.labstat.setText(n)
@@ -579,6 +770,110 @@ class MainWindow(LMainWindow):
         # Execute
         self.threadpool.start(worker)
 
+    def execute_this_btn_lcurve_clicked(self, progress_callback):
+        self.labstat.setText('Status: Processing . . .')
+        tic()
+        # stage timing of the whole run, shown when it finishes
+        progress_callback = monitor(progress_callback)
+        self.timing = ''
+        normds = [float(a) for a in self.normd.text().split(',')]
+        gradds = [float(a) for a in self.gradd.text().split(',')]
+        phases = ['P', 'S'] if self.type.currentIndex() == 2 else [self.type.currentText()]
+        opts = self.options('')
+        opts.pop('checkpoint')
+        opts.pop('resume')
+        opts.pop('result')
+        opts.pop('budget')
+        opts.pop('levels')
+        opts.pop('lscale')
+        opts.pop('minhits')
+        opts.pop('depth')
+        for phase in phases:
+            x, y, z, table, models = lcurve(self.line_evtdat.text(), self.line_statdat.text(), self.line_veldat.text(),
+                                            float(self.deg2km.text()), int(self.nx.text()),
+                                            int(self.ny.text()), int(self.nz.text()), normds, gradds,
+                                            int(self.split.text()), int(self.biter.text()), int(self.cacah.text()),
+                                            progress_callback, phase=phase, **opts)
+            # every candidate model, and the trade-off table
+            path = self.output('lcurve-' + phase)
+            rt.write(path + '.npz', dict(opts, phase=phase), x=x, y=y, z=z, table=table, models=models)
+            file = open(path + '.txt', 'w')
+            file.write('Norm Value' + '\t' + 'Gradient Value' + '\t' + 'Misfit' + '\t' + 'Roughness' + '\t' + 'Model Norm' + '\n')
+            for i in range(len(table)):
+                file.write('\t'.join([str(a) for a in table[i]]) + '\n')
+            file.close()
+        self.timing = progress_callback.summary()
+        elt = tac()
+        return elt
+
+    def btn_lcurve_clicked_complete(self):
+        self.labstat.setText('Status: Finished' + ('' if self.timing == '' else ' (' + self.timing + ')'))
+
+    def progress_btn_lcurve_clicked(self, n):
+        self.labstat.setText(n)
+
+    def btn_lcurve_clicked_error(self):
+        self.message = MessageBox()
+        self.message.show()
+
+    def btn_lcurve_clicked(self):
+        # Pass the function to execute
+        worker = Worker(self.execute_this_btn_lcurve_clicked)
+        worker.signals.error.connect(self.btn_lcurve_clicked_error)
+        worker.signals.finished.connect(self.btn_lcurve_clicked_complete)
+        worker.signals.progress.connect(self.progress_btn_lcurve_clicked)
+
+        # Execute
+        self.threadpool.start(worker)
+
+    def execute_this_btn_resolution_clicked(self, progress_callback):
+        self.labstat.setText('Status: Processing . . .')
+        tic()
+        # stage timing of the whole run, shown when it finishes
+        progress_callback = monitor(progress_callback)
+        self.timing = ''
+        sizes = [int(a) for a in self.sizes.text().split(',')]
+        perts = [float(a) for a in self.pert.text().split(',')]
+        phases = ['P', 'S'] if self.type.currentIndex() == 2 else [self.type.currentText()]
+        opts = self.options('')
+        opts.pop('checkpoint')
+        opts.pop('resume')
+        opts.pop('result')
+        opts.pop('budget')
+        opts.pop('levels')
+        opts.pop('lscale')
+        opts.pop('minhits')
+        opts.pop('depth')
+        for phase in phases:
+            x, y, z, vxyz, cases, velr, rec, hits, weight, rdiag = \
+                resolution(self.line_evtdat.text(), self.line_statdat.text(), self.line_veldat.text(),
+                           float(self.deg2km.text()), int(self.nx.text()), int(self.ny.text()), int(self.nz.text()),
+                           float(self.normd.text()), float(self.gradd.text()), int(self.iter.text()),
+                           int(self.split.text()), int(self.biter.text()), int(self.cacah.text()), sizes, perts,
+                           progress_callback, phase=phase, diag=self.rdiag.isChecked(), **opts)
+            # checkerboards, recovered models and coverage
+            path = self.output('resolution-' + phase)
+            rt.write(path + '.npz', dict(opts, phase=phase), x=x, y=y, z=z, vel=vxyz, cases=cases, velr=velr, rec=rec,
+                     hits=hits, dws=weight, diag=rdiag)
+            file = open(path + '.txt', 'w')
+            file.write('Checkerboard Size' + '\t' + 'Perturbation' + '\t' + 'Correlation' + '\n')
+            for i in range(len(cases)):
+                file.write('\t'.join([str(a) for a in cases[i]]) + '\n')
+            file.close()
+        self.timing = progress_callback.summary()
+        elt = tac()
+        return elt
+
+    def btn_resolution_clicked(self):
+        # Pass the function to execute
+        worker = Worker(self.execute_this_btn_resolution_clicked)
+        worker.signals.error.connect(self.btn_lcurve_clicked_error)
+        worker.signals.finished.connect(self.btn_lcurve_clicked_complete)
+        worker.signals.progress.connect(self.progress_btn_lcurve_clicked)
+
+        # Execute
+        self.threadpool.start(worker)
+
     def btn_search_evtdat_clicked(self):
         open = QtGui.QFileDialog()
         filepath = open.getOpenFileName(self, 'Open event (*.evt) file', '/', "Format File (*.evt)")
@@ -931,7 +1226,9 @@ class MainWindow(LMainWindow):
 
         if filepath[0] != '':
             evtdat, statdat, veldat, xout, yout, zout, velog, velobsout, velcalout, velpout, velsout, velpsout, type, \
-            deg2km, nx, ny, nz, normd, gradd, iter, cacah, biter, split, pert = read_log(filepath[0])
+            deg2km, nx, ny, nz, normd, gradd, iter, cacah, biter, split, pert, solver, tol, maxiter, nproc, ttol, engine, \
+            budget, levels, lscale, minhits, depth, linear = \
+                read_log(filepath[0])
             self.line_evtdat.setText(evtdat)
             self.line_statdat.setText(statdat)
             self.line_veldat.setText(veldat)
@@ -956,6 +1253,18 @@ class MainWindow(LMainWindow):
             self.biter.setText(biter)
             self.split.setText(split)
             self.pert.setText(pert)
+            self.solver.setCurrentText(solver)
+            self.tol.setText(tol)
+            self.maxiter.setText(maxiter)
+            self.nproc.setText(nproc)
+            self.ttol.setText(ttol)
+            self.engine.setCurrentText(engine)
+            self.budget.setText(budget)
+            self.levels.setText(levels)
+            self.lscale.setText(lscale)
+            self.minhits.setText(minhits)
+            self.depth.setText(depth)
+            self.linear.setChecked(linear == '1')
 
     def act_analyze2d(self):
         icon_tab_tg = QtGui.QIcon()
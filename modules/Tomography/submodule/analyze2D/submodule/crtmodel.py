@@ -148,9 +148,11 @@ class MainWindow(QMainWindow):
         self.cacah.setText('20')
 
         lb_split = QLabel()
-        lb_split.setText('Number of Splitting Ray Resolution')
+        lb_split.setText('Number of Splitting Ray Resolution (deprecated)')
+        lb_split.setToolTip('Deprecated: rays are traversed exactly through the blocks, this value is ignored')
         self.split = QLineEdit()
         self.split.setText('100')
+        self.split.setEnabled(False)
 
         lb_pert = QLabel()
         lb_pert.setText('Value of Perturbation Test')
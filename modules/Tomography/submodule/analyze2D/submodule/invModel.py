@@ -163,10 +163,12 @@ class MainWindow(QMainWindow):
         self.biter.setText('100')
 
         lb_split = QLabel()
-        lb_split.setText('Number of Splitting Ray Resolution')
+        lb_split.setText('Number of Splitting Ray Resolution (deprecated)')
+        lb_split.setToolTip('Deprecated: rays are traversed exactly through the blocks, this value is ignored')
         # lb_split.setToolTip('Index of cluster to be relocated (0 = all)')
         self.split = QLineEdit()
         self.split.setText('100')
+        self.split.setEnabled(False)
 
         lb_pert = QLabel()
         lb_pert.setText('Value of Perturbation Test')
@@ -3,6 +3,8 @@ import shutil
 import os
 import modules.Tomography.submodule.analyze2D.submodule.subroutine.basic as bs
 import modules.Tomography.submodule.analyze2D.submodule.subroutine.actRay as ray
+import modules.Tomography.subroutine.traversal as tv
+import modules.Tomography.subroutine.progress as pg
 from tempfile import mkdtemp
 
 
@@ -74,6 +76,7 @@ def iterbending(niter,cacah,x,y,vxyz,xs,ys,xr,yr,dvx,dvy):
     return xi,yi
 
 def fwdModel(srcfile,statfile,velfile,evtfile,rayfile,gr,biter,cacah,progress_callback):
+    progress_callback = pg.wrap(progress_callback)
     progress_callback.emit('load data')
     tempdir = mkdtemp()
     nsrc = 0
@@ -118,29 +121,17 @@ def fwdModel(srcfile,statfile,velfile,evtfile,rayfile,gr,biter,cacah,progress_ca
         j = 0
         while j < len(station) and station[j] != []:
             temp2d = np.zeros(ray2d.shape)
-            tobs = 0
             progress_callback.emit(
                 'creating t obs -> ' + 'event i-th: ' + str(
                     i + 1) + ', event ID: ' + str(source[i][0])
-                + ', station ID: ' + str(station[j][0]))
+                + ', station ID: ' + str(station[j][0]), False)
             xr = float(station[j][1])
             yr = float(station[j][2])
             xi, yi = iterbending(biter, cacah, x, y, vel, xs, ys, xr, yr, dvx, dvy)
             raypath[i*(nstat)+j,:,:] = np.array([xi,yi])
-            for g in range(len(xi) - 1):
-                o1, p1 = bs.index(x, y, xi[g], yi[g])
-                o2, p2 = bs.index(x, y, xi[g + 1], yi[g + 1])
-                ngr = np.abs(o2 - o1) + np.abs(p2 - p1) + 1
-                lgr = gr * ngr
-                xsp = np.linspace(xi[g], xi[g + 1], int(lgr))
-                ysp = np.linspace(yi[g], yi[g + 1], int(lgr))
-                for ii in range(lgr - 1):
-                    l = np.sqrt(
-                        pow(xsp[ii] - xsp[ii + 1], 2) + pow(ysp[ii] - ysp[ii + 1], 2))
-                    oi, pi = bs.index(x, y, xsp[ii], ysp[ii])
-                    temp2d[pi, oi] = 1
-                    dtc = l / vel[pi, oi]
-                    tobs = tobs + dtc
+            nb, l = tv.traverse((x, y), np.transpose([xi, yi]))
+            temp2d[nb // len(x), nb % len(x)] = 1
+            tobs = np.sum(l / vel[nb // len(x), nb % len(x)])
             ray2d = ray2d + temp2d
             file.write(station[j][0]+'\t'+str(tobs)+'\n')
             j = j + 1
@@ -3,6 +3,7 @@ import shutil
 import os
 import modules.Tomography.submodule.analyze2D.submodule.subroutine.basic as bs
 import modules.Tomography.submodule.analyze2D.submodule.subroutine.actRay as ray
+import modules.Tomography.subroutine.traversal as tv
 from tempfile import mkdtemp
 
 
@@ -121,7 +122,6 @@ def fwdModel(srcfile,statfile,velfile,gr,biter,cacah):
         j = 0
         while j < len(station) and station[j] != []:
             temp2d = np.zeros(ray2d.shape)
-            tobs = 0
             print(
                 'creating t obs -> ' + 'event i-th: ' + str(
                     i + 1) + ', event ID: ' + str(source[i][0])
@@ -130,20 +130,9 @@ def fwdModel(srcfile,statfile,velfile,gr,biter,cacah):
             yr = float(station[j][2])
             xi, yi = iterbending(biter, cacah, x, y, vel, xs, ys, xr, yr, dvx, dvy)
             raypath[i*(nstat)+j,:,:] = np.array([xi,yi])
-            for g in range(len(xi) - 1):
-                o1, p1 = bs.index(x, y, xi[g], yi[g])
-                o2, p2 = bs.index(x, y, xi[g + 1], yi[g + 1])
-                ngr = np.abs(o2 - o1) + np.abs(p2 - p1) + 1
-                lgr = gr * ngr
-                xsp = np.linspace(xi[g], xi[g + 1], int(lgr))
-                ysp = np.linspace(yi[g], yi[g + 1], int(lgr))
-                for ii in range(lgr - 1):
-                    l = np.sqrt(
-                        pow(xsp[ii] - xsp[ii + 1], 2) + pow(ysp[ii] - ysp[ii + 1], 2))
-                    oi, pi = bs.index(x, y, xsp[ii], ysp[ii])
-                    temp2d[pi, oi] = 1
-                    dtc = l / vel[pi, oi]
-                    tobs = tobs + dtc
+            nb, l = tv.traverse((x, y), np.transpose([xi, yi]))
+            temp2d[nb // len(x), nb % len(x)] = 1
+            tobs = np.sum(l / vel[nb // len(x), nb % len(x)])
             ray2d = ray2d + temp2d
             # file.write(station[j][0]+'\t'+str(tobs)+'\n')
             j = j + 1
@@ -3,6 +3,11 @@ import shutil
 import os
 import modules.Tomography.submodule.analyze2D.submodule.subroutine.basic as bs
 import modules.Tomography.submodule.analyze2D.submodule.subroutine.actRay as ray
+import modules.Tomography.subroutine.block as blk
+import modules.Tomography.subroutine.smoothing as sm
+import modules.Tomography.subroutine.traversal as tv
+import modules.Tomography.subroutine.progress as pg
+import modules.Tomography.subroutine.station as st
 from tempfile import mkdtemp
 from scipy.linalg import inv
 
@@ -76,6 +81,7 @@ def iterbending(niter,cacah,x,y,vxyz,xs,ys,xr,yr,dvx,dvy):
 
 def inversion(evtfile,statfile,velfile,rayfile,veloutfile,normd,gradd,iter,gr,biter,cacah,noise,progress_callback):
 # def inversion(evtfile, statfile, velfile, rayfile, veloutfile, normd, gradd, iter, gr, biter, cacah, noise):
+    progress_callback = pg.wrap(progress_callback)
     progress_callback.emit('load data')
     tempdir = mkdtemp()
     file = open(evtfile, 'r')
@@ -89,6 +95,8 @@ def inversion(evtfile,statfile,velfile,rayfile,veloutfile,normd,gradd,iter,gr,bi
     for i in range(len(station)):
         station[i] = station[i].split()
     file.close()
+    station = st.registry(station)
+    st.report(st.unknown(event, station), progress_callback)
 
     tempvel = os.path.join(tempdir, 'vel.npz')
     shutil.copyfile(velfile, tempvel)
@@ -106,14 +114,15 @@ def inversion(evtfile,statfile,velfile,rayfile,veloutfile,normd,gradd,iter,gr,bi
     raypath = np.array([])
 
     rms = np.zeros(iter)
+    grad = (np.zeros(vel.shape), np.zeros(vel.shape))
     for niter in range(iter):
-        dvx, dvy = bs.velDiff(vel, x, y)
+        dvx, dvy = bs.velDiff(vel, x, y, grad)
         ray2d = np.zeros(vel.shape)
 
         # membuat kernel
         ntr = 0
         for i in range(len(event)):
-            if event[i] != [] and event[i][0] != '#':
+            if event[i] != [] and event[i][0] != '#' and event[i][0] in station:
                 ntr = ntr + 1
 
         raypath = np.zeros((ntr, 2, cacah + 1))
@@ -130,41 +139,25 @@ def inversion(evtfile,statfile,velfile,rayfile,veloutfile,normd,gradd,iter,gr,bi
                     progress_callback.emit(
                     # print(
                         'iteration i-th: ' + str(niter + 1) + ', forward modelling -> ' + 'event i-th: ' + str(
-                            evi + 1) + ', event ID: ' + str(event[i][1]))
+                            evi + 1) + ', event ID: ' + str(event[i][1]), False)
                     xs = float(event[i][2])
                     ys = float(event[i][3])
                     r = i + 1
                     if r < len(event):
                         while r < len(event) and event[r][0] != '#':
                             # print(event[r])
-                            tobs[tri, 0] = float(event[r][1])
-                            j = 0
-                            while j < len(station):
-                                if event[r][0] == station[j][0]:
-                                    temp2d = np.zeros(ray2d.shape)
-                                    xr = float(station[j][1])
-                                    yr = float(station[j][2])
-                                    xi, yi = iterbending(biter, cacah, x, y, vel, xs, ys, xr, yr, dvx, dvy)
-                                    raypath[tri, :, :] = np.array([xi, yi])
-                                    for g in range(len(xi) - 1):
-                                        o1, p1 = bs.index(x, y, xi[g], yi[g])
-                                        o2, p2 = bs.index(x, y, xi[g + 1], yi[g + 1])
-                                        ngr = np.abs(o2 - o1) + np.abs(p2 - p1) + 1
-                                        lgr = gr * ngr
-                                        xsp = np.linspace(xi[g], xi[g + 1], int(lgr))
-                                        ysp = np.linspace(yi[g], yi[g + 1], int(lgr))
-                                        for ii in range(lgr - 1):
-                                            l = np.sqrt(
-                                                pow(xsp[ii] - xsp[ii + 1], 2) + pow(ysp[ii] - ysp[ii + 1], 2))
-                                            oi, pi = bs.index(x, y, xsp[ii], ysp[ii])
-                                            temp2d[pi, oi] = 1
-                                            dtc = l / vel[pi, oi]
-                                            nb = bs.noblok(oi, pi, nx)
-                                            k[tri, nb] = k[tri, nb] + l
-                                            tcal[tri, 0] = tcal[tri, 0] + dtc
-                                    ray2d = ray2d + temp2d
-                                j = j + 1
-                            tri = tri + 1
+                            if event[r][0] in station:
+                                tobs[tri, 0] = float(event[r][1])
+                                temp2d = np.zeros(ray2d.shape)
+                                xr, yr = station[event[r][0]][2:]
+                                xi, yi = iterbending(biter, cacah, x, y, vel, xs, ys, xr, yr, dvx, dvy)
+                                raypath[tri, :, :] = np.array([xi, yi])
+                                nb, l = tv.traverse((x, y), np.transpose([xi, yi]))
+                                temp2d[nb // nx, nb % nx] = 1
+                                k[tri, nb] = l
+                                tcal[tri, 0] = np.sum(l / vel[nb // nx, nb % nx])
+                                ray2d = ray2d + temp2d
+                                tri = tri + 1
                             r = r + 1
                     evi = evi + 1
             i = i + 1
@@ -188,59 +181,15 @@ def inversion(evtfile,statfile,velfile,rayfile,veloutfile,normd,gradd,iter,gr,bi
         iden = np.eye(vel.size)
         k[ntr:ntr + vel.size, 0::] = normd * iden
 
-        gamma = np.zeros((vel.size, vel.size))
-        n = 0
-        for i in range(nx):
-            for j in range(ny):
-                pem = 0
-                if i - 1 >= 0:
-                    nb = bs.noblok(i - 1, j, nx)
-                    gamma[n, nb] = -1
-                    pem = pem + 1
-                if i + 1 < nx:
-                    nb = bs.noblok(i + 1, j, nx)
-                    gamma[n, nb] = -1
-                    pem = pem + 1
-                if j - 1 >= 0:
-                    nb = bs.noblok(i, j - 1, nx)
-                    gamma[n, nb] = -1
-                    pem = pem + 1
-                if j + 1 < ny:
-                    nb = bs.noblok(i, j + 1, nx)
-                    gamma[n, nb] = -1
-                    pem = pem + 1
-                gamma[n, :] = gamma[n, :] / pem
-                nb = bs.noblok(i, j, nx)
-                gamma[n, nb] = 1
-                n = n + 1
-
-        k[(ntr + vel.size)::, 0::] = gradd * gamma
+        gamma = sm.gamma((nx, ny))
+        k[(ntr + vel.size)::, 0::] = gradd * gamma.toarray()
 
         # inversion
         ds = np.mat(inv(np.mat(k.transpose()) * np.mat(k))) * np.mat(k.transpose()) * np.mat(dtco)
-        dv = np.zeros(vel.size)
-
-        v0 = np.zeros(vel.size)
-        for i in range(nx):
-            for j in range(ny):
-                nb = bs.noblok(i, j, nx)
-                v0[nb] = vel[j, i]
-
-        for i in range(vel.size):
-            dv[i] = (-1 * ds[i] * (v0[i] ** 2)) / (1 + ds[i] * v0[i])
-
-        v1 = np.zeros(vel.size)
-        for jj in range(len(v1)):
-            v1[jj] = v0[jj] + dv[jj]
-
-        veln = np.zeros(vel.shape)
 
-        for ii in range(len(v1)):
-            for i in range(nx):
-                for j in range(ny):
-                    nb = bs.noblok(i, j, nx)
-                    if ii == nb:
-                        veln[j, i] = v1[ii]
+        # vel is stored as [y, x], the block layer works on [x, y]
+        v0 = blk.flatten(vel.T)
+        veln = blk.scatter(blk.update(v0, np.asarray(ds).ravel()), (nx, ny)).T
         if veln.min() >= 0:
             vel = veln
         else:
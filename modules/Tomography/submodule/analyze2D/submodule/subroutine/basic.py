@@ -1,4 +1,5 @@
 import numpy as np
+import modules.Tomography.subroutine.gradient as gd
 
 
 # def diff(x, y):
@@ -34,13 +35,11 @@ def mid(x1, x2):
     return xmid
 
 
-def velDiff(vxyz, x, y):
-    dvx = np.zeros(vxyz.shape)
-    for i in range(vxyz.shape[0]):
-        dvx[i, :] = diff(x, vxyz[i, :])
-    dvy = np.zeros(vxyz.shape)
-    for i in range(vxyz.shape[1]):
-        dvy[:, i] = diff(y, vxyz[:, i])
+def velDiff(vxyz, x, y, out=None, mode='forward'):
+    # vxyz is stored as [y, x]; out: (dvx, dvy) of a previous call, filled in place
+    if out is not None:
+        out = (out[1], out[0])
+    dvy, dvx = gd.gradient(vxyz, (y, x), out, mode)
     return dvx, dvy
 
 def index(x, y, xi, yi):
@@ -0,0 +1,44 @@
+import numpy as np
+import scipy.sparse as sp
+import modules.Tomography.subroutine.block as blk
+
+# irregular parameterization on top of the regular grid. Blocks crossed by fewer than
+# minhits rays are merged with the other poorly sampled blocks of their octant, then of
+# the octant one level up, ... (an octree over the block indices), so the unknowns are
+# the cells and not the blocks. A cell perturbation applies to all its blocks, and the
+# model itself stays on the regular cube for ray tracing, output and display.
+
+
+def cells(hits, minhits, depth=3):
+    # cell number of every block (block numbering), cells numbered 0 .. ncell-1
+    h = blk.flatten(hits)
+    index = [blk.flatten(a) for a in np.indices(hits.shape)]
+    label = np.arange(h.size)
+    merge = np.nonzero(h < minhits)[0]
+    for level in range(1, depth + 1):
+        if merge.size == 0:
+            break
+        key = np.stack([index[n][merge] >> level for n in range(hits.ndim)], axis=1)
+        inverse = np.unique(key, axis=0, return_inverse=True)[1].ravel()
+        # labels of every level kept apart from the block numbers and the other levels
+        label[merge] = level * h.size + inverse
+        total = np.bincount(inverse, weights=h[merge])
+        merge = merge[total[inverse] < minhits]
+    return np.unique(label, return_inverse=True)[1].ravel()
+
+
+def projection(cell):
+    # sparse P (nblock x ncell), block perturbation = P * cell perturbation
+    n = cell.size
+    return sp.csr_matrix((np.ones(n), (np.arange(n), cell)), shape=(n, cell.max() + 1))
+
+
+def expand(c, cell, shape):
+    # regular cube of the cell values c
+    return blk.scatter(np.asarray(c)[cell], shape)
+
+
+def reduce(v, cell):
+    # mean value of the blocks of every cell
+    v = blk.flatten(v)
+    return np.bincount(cell, weights=v) / np.bincount(cell)
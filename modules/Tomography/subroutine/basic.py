@@ -1,4 +1,5 @@
 import numpy as np
+import modules.Tomography.subroutine.gradient as gd
 
 
 # def diff(x, y):
@@ -34,19 +35,9 @@ def mid(x1, x2):
     return xmid
 
 
-def diff_cube(vxyz, x, y, z):
-    dvx = np.zeros(vxyz.shape)
-    for i in range(vxyz.shape[2]):
-        for j in range(vxyz.shape[1]):
-            dvx[:, j, i] = diff(x, vxyz[:, j, i])
-    dvy = np.zeros(vxyz.shape)
-    for i in range(vxyz.shape[2]):
-        for j in range(vxyz.shape[0]):
-            dvy[j, :, i] = diff(y, vxyz[j, :, i])
-    dvz = np.zeros(vxyz.shape)
-    for i in range(vxyz.shape[0]):
-        for j in range(vxyz.shape[1]):
-            dvz[i, j, :] = diff(z, vxyz[i, j, :])
+def diff_cube(vxyz, x, y, z, out=None, mode='forward'):
+    # out: (dvx, dvy, dvz) of a previous call, filled in place
+    dvx, dvy, dvz = gd.gradient(vxyz, (x, y, z), out, mode)
     return dvx, dvy, dvz
 
 
@@ -0,0 +1,92 @@
+import numpy as np
+import modules.Tomography.subroutine.ray_tracing as ray
+import modules.Tomography.subroutine.lookup as lk
+
+
+def straight(src, rcv, cacah):
+    # initial paths from receiver to source, (nray, cacah+1, 3), node by node the np.linspace
+    # of iterbending, so nodes on block boundaries fall in the same block
+    i = np.arange(cacah + 1)[None, :, None]
+    p = i * ((src - rcv) / cacah)[:, None, :] + rcv[:, None, :]
+    p[:, -1, :] = src
+    return p
+
+
+def perturb(x, y, z, vxyz, dvx, dvy, dvz, p, node, linear=False):
+    # pseudo-bending move of the given interior nodes of all paths p; velocity and gradient
+    # of the blocks, or trilinear between the grid nodes with linear=True. A node may move
+    # anywhere in the blocks, also in the last block beyond the last node, as in iterbending
+    p1 = p[:, node - 1, :]
+    p2 = p[:, node + 1, :]
+    pm = 0.5 * (p1 + p2)
+    axes = (x, y, z)
+    idx, in1, V1, (dvxi, dvyi, dvzi) = lk.sample(axes, vxyz, p1, (dvx, dvy, dvz), linear, True)
+    in2, V2 = lk.sample(axes, vxyz, p2, None, linear, True)[1:3]
+    idx, inm, Vmid, (dvxm, dvym, dvzm) = lk.sample(axes, vxyz, pm, (dvx, dvy, dvz), linear, True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        xn, yn, zn = ray.ray_bending(p1[..., 0], p1[..., 1], p1[..., 2], p2[..., 0], p2[..., 1], p2[..., 2],
+                                     dvxi, dvyi, dvzi, pm[..., 0], pm[..., 1], pm[..., 2], dvxm, dvym, dvzm,
+                                     Vmid, V1, V2)
+    pn = np.stack([xn, yn, zn], axis=-1)
+    ok = np.all(in1 & in2 & inm & lk.locate(axes, pn, True)[1], axis=1)
+    # rays that failed keep their nodes, so nothing invalid reaches the next lookup
+    pn[~ok] = p[~ok][:, node, :]
+    return pn, ok
+
+
+def traveltime(x, y, z, vxyz, p):
+    # travel time along the polylines p (nray, npts, 3), block slowness at the nodes
+    (o, q, r), inside = lk.locate((x, y, z), p)
+    s = 1 / vxyz[o, q, r]
+    seg = np.sqrt(np.sum(np.diff(p, axis=1) ** 2, axis=2))
+    return np.sum(seg * 0.5 * (s[:, 1:] + s[:, :-1]), axis=1)
+
+
+def bend(x, y, z, vxyz, dvx, dvy, dvz, src, rcv, niter, cacah, eps=1e-6, start=None, ttol=0, linear=False):
+    # pseudo-bending of all rays at once; src and rcv are (nray, 3), paths run
+    # from receiver to source. The nodes are moved in the order of iterbending:
+    # the first pass moves every interior node from the path before it, later
+    # passes run from receiver to source in place, so a node already sees the
+    # moved node before it. A ray drops out when a move would leave the grid
+    # (it keeps the nodes moved so far, as iterbending did), when no node moves
+    # more than eps in a pass, or when ttol > 0 and its travel time changes by
+    # no more than ttol. As iterbending, a first pass that takes a ray above or
+    # below the depth range of its path before is dropped and the ray stops.
+    # start, e.g. the paths of the previous tomography iteration, replaces the
+    # straight initial paths. linear=True bends through the trilinear velocity
+    # field instead of the block values.
+    if start is None:
+        p = straight(np.asarray(src, dtype=float), np.asarray(rcv, dtype=float), cacah)
+    else:
+        p = np.array(start, dtype=float)
+    if cacah < 2:
+        return p
+    if ttol > 0:
+        t = traveltime(x, y, z, vxyz, p)
+    active = np.ones(len(p), dtype=bool)
+    for j in range(niter):
+        a = np.nonzero(active)[0]
+        if a.size == 0:
+            break
+        pa = p[a]
+        pn = pa.copy()
+        if j == 0:
+            node = np.arange(1, cacah)
+            pn[:, node, :], ok = perturb(x, y, z, vxyz, dvx, dvy, dvz, pa, node, linear)
+            ok = ok & (pn[..., 2].min(axis=1) >= pa[..., 2].min(axis=1)) & \
+                (pn[..., 2].max(axis=1) <= pa[..., 2].max(axis=1))
+            pn[~ok] = pa[~ok]
+        else:
+            ok = np.ones(a.size, dtype=bool)
+            for i in range(1, cacah):
+                new, good = perturb(x, y, z, vxyz, dvx, dvy, dvz, pn, np.array([i]), linear)
+                ok = ok & good
+                pn[ok, i, :] = new[ok, 0, :]
+        shift = np.max(np.abs(pn - pa), axis=(1, 2))
+        p[a] = pn
+        active[a] = ok & (shift > eps)
+        if ttol > 0:
+            ta = traveltime(x, y, z, vxyz, pn)
+            active[a] = active[a] & (np.abs(ta - t[a]) > ttol)
+            t[a] = ta
+    return p
@@ -0,0 +1,18 @@
+import numpy as np
+
+# block number of cell (i, j, k) is bs.noblok(i, j, k, nx, ny) = k*nx*ny + j*nx + i,
+# i.e. the first grid axis runs fastest (Fortran order)
+
+
+def flatten(v):
+    return np.ravel(v, order='F')
+
+
+def scatter(m, shape):
+    return np.reshape(m, shape, order='F')
+
+
+def update(v0, ds):
+    # velocity after a slowness perturbation ds, v1 = v0 + dv
+    dv = (-1 * ds * (v0 ** 2)) / (1 + ds * v0)
+    return v0 + dv
@@ -0,0 +1,82 @@
+import numpy as np
+import modules.Tomography.subroutine.parameterization as pr
+
+# .evt file parsed once into columns. Header line:
+#   # yr mo dy hr mn sc lat lon depth ... id
+# pick line:
+#   STA tt weight phase
+# picks[offset[e]:offset[e+1]] are the picks of event e, in file order.
+
+event_dtype = [('id', 'U32'), ('origin', 'f8', (6,)), ('lat', 'f8'), ('lon', 'f8'),
+               ('x', 'f8'), ('y', 'f8'), ('z', 'f8')]
+pick_dtype = [('event', 'i8'), ('code', 'U16'), ('sta', 'i8'), ('phase', 'U8'),
+              ('tt', 'f8'), ('weight', 'f8')]
+station_dtype = [('code', 'U16'), ('lat', 'f8'), ('lon', 'f8'), ('x', 'f8'), ('y', 'f8')]
+
+
+class catalog(object):
+    def __init__(self, evtfile, station, deg2km):
+        # station is the registry from station.registry
+        self.station = np.array([(code,) + tuple(station[code]) for code in station], dtype=station_dtype)
+        index = {}
+        for i in range(len(self.station)):
+            index[self.station['code'][i]] = i
+
+        event = []
+        pick = []
+        file = open(evtfile, 'r')
+        for line in file:
+            line = line.split()
+            if line == []:
+                continue
+            if line[0] == '#':
+                lat = float(line[7])
+                lon = float(line[8])
+                colat, colon = pr.colatlon(lat, lon)
+                x, y = pr.colatlon2km(colat, colon, deg2km)
+                event.append((line[-1], [float(a) for a in line[1:7]], lat, lon, x, y, float(line[9])))
+            elif event != []:
+                weight = float(line[2]) if len(line) > 3 else 1.0
+                pick.append((len(event) - 1, line[0], index.get(line[0], -1), line[-1], float(line[1]), weight))
+        file.close()
+
+        self.event = np.array(event, dtype=event_dtype)
+        self.pick = np.array(pick, dtype=pick_dtype)
+        self.offset = self.offsets()
+
+    def unknown(self):
+        # station codes of picks missing from the registry, in order of first appearance
+        codes, first = np.unique(self.pick['code'][self.pick['sta'] < 0], return_index=True)
+        return list(codes[np.argsort(first)])
+
+    def select(self, phase):
+        # picks of the phase with a known station
+        return self.pick[(self.pick['phase'] == phase) & (self.pick['sta'] >= 0)]
+
+    def offsets(self, phase=None):
+        # rows offset[e]:offset[e+1] of event e, over all picks or over the rows of phase(phase);
+        # events without picks give an empty range
+        p = self.pick if phase is None else self.select(phase)
+        return np.concatenate([[0], np.cumsum(np.bincount(p['event'], minlength=len(self.event)))]).astype(int)
+
+    def phase(self, phase):
+        # source, receiver and observed travel time, one row per pick of the phase with a known station
+        p = self.select(phase)
+        e = self.event[p['event']]
+        s = self.station[p['sta']]
+        src = np.transpose([e['x'], e['y'], e['z']])
+        rcv = np.transpose([s['x'], s['y'], np.zeros(len(p))])
+        return src.reshape(-1, 3), rcv.reshape(-1, 3), p['tt'].copy()
+
+    def extent(self):
+        # projected x, y of all events and of the stations of their picks, and event depths
+        sta = self.pick['sta'][self.pick['sta'] >= 0]
+        x = np.concatenate([self.event['x'], self.station['x'][sta]])
+        y = np.concatenate([self.event['y'], self.station['y'][sta]])
+        return x, y, self.event['z']
+
+
+def window(offset, a, b):
+    # event offsets of the rows a:b, counted from a; an event cut by a or b keeps its part
+    o = np.asarray(offset)
+    return np.concatenate([[0], o[(o > a) & (o < b)] - a, [b - a]]).astype(int)
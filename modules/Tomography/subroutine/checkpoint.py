@@ -0,0 +1,34 @@
+import os
+import json
+import numpy as np
+
+# state of a tomography run after its last completed iteration. The file is written
+# to a temporary name and moved over the old one, so a reader (or a resumed run)
+# always sees a complete checkpoint.
+
+
+def save(path, niter, x, y, z, vxyz, rms, paths, params, stopped=False):
+    tmp = path + '.tmp.npz'
+    np.savez(tmp, niter=niter, x=x, y=y, z=z, vxyz=vxyz, rms=rms,
+             paths=np.zeros((0, 0, 3)) if paths is None else paths,
+             params=json.dumps(params, sort_keys=True), stopped=stopped)
+    os.replace(tmp, path)
+
+
+def load(path):
+    data = np.load(path)
+    state = {key: data[key] for key in data.files}
+    data.close()
+    state['niter'] = int(state['niter'])
+    state['stopped'] = bool(state['stopped'])
+    state['params'] = json.loads(str(state['params']))
+    if state['paths'].size == 0:
+        state['paths'] = None
+    return state
+
+
+def check(state, params):
+    # a checkpoint only resumes the run it was written for
+    diff = [key for key in params if state['params'].get(key) != params[key]]
+    if diff != []:
+        raise ValueError('checkpoint was written with different ' + ', '.join(diff))
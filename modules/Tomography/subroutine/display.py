@@ -10,6 +10,7 @@ from traitsui.api import View, Item, HGroup, Group
 from tvtk.pyface.scene_editor import SceneEditor
 from mayavi.tools.mlab_scene_model import MlabSceneModel
 import mayavi.mlab as mlab
+import modules.Tomography.subroutine.result as rt
 
 class Visualization(HasTraits):
     scene1 = Instance(MlabSceneModel, ())
@@ -18,44 +19,24 @@ class Visualization(HasTraits):
     button1 = Button('Redraw')
     button2 = Button('Redraw')
 
-    def __init__(self, x, y, z, vxyz, colormap, vmin, vmax, n):
+    def __init__(self, x, y, z, vxyz, colormap, vmin, vmax, n, index=None):
         HasTraits.__init__(self)
-        self.vxyz = vxyz
         self.color = colormap
         self.vmin = float(vmin)
         self.vmax = float(vmax)
         self.n = n
 
-        nx = len(x)
-        ny = len(y)
-        nz = len(z)
-
-        self.xx, self.yy, self.zz = np.mgrid[0:nx,0:ny,0:nz]
-
-        self.x = np.zeros(self.xx.shape)
-        self.y = np.zeros(self.yy.shape)
-        self.z = np.zeros(self.zz.shape)
-
-        for i in range(len(self.xx[:,0,0])):
-            for j in range(len(self.xx[0,:,0])):
-                for k in range(len(self.xx[0,0,:])):
-                    for l in range(nx):
-                        if self.xx[i,j,k] == l:
-                            self.x[i,j,k] = x[l]
-
-        for i in range(len(self.yy[:,0,0])):
-            for j in range(len(self.yy[0,:,0])):
-                for k in range(len(self.yy[0,0,:])):
-                    for l in range(ny):
-                        if self.yy[i,j,k] == l:
-                            self.y[i,j,k] = y[l]
-
-        for i in range(len(self.zz[:,0,0])):
-            for j in range(len(self.zz[0,:,0])):
-                for k in range(len(self.zz[0,0,:])):
-                    for l in range(nz):
-                        if self.zz[i,j,k] == l:
-                            self.z[i,j,k] = z[l]
+        # only the three displayed planes are read, a mapped cube stays on disk
+        self.index = bound(middle(vxyz.shape) if index is None else index, vxyz.shape)
+        self.planes = planes(vxyz, self.index)
+
+        self.x = np.asarray(x)
+        self.y = np.asarray(y)
+        self.z = np.asarray(z)
+
+        self.xx = np.arange(len(x))
+        self.yy = np.arange(len(y))
+        self.zz = np.arange(len(z))
 
     @on_trait_change('button1', 'scene.activated')
     def redraw_scene1(self):
@@ -66,63 +47,37 @@ class Visualization(HasTraits):
         self.redraw_scene3(self.scene2)
 
     def redraw_scene(self, scene):
-        # Notice how each mlab call points explicitely to the figure it
-        # applies to.
-        x = self.x
-        y = self.y
-        z = self.z
-        vxyz = self.vxyz
-        mlab.clf(figure=scene.mayavi_scene)
-        s = mlab.volume_slice(x, y, z, vxyz, plane_orientation='x_axes', colormap=self.color, vmin=self.vmin,
-                          vmax=self.vmax, figure=scene.mayavi_scene)
-        t = mlab.volume_slice(x, y, z, vxyz, plane_orientation='y_axes', colormap=self.color, vmin=self.vmin,
-                          vmax=self.vmax, figure=scene.mayavi_scene)
-        u = mlab.volume_slice(x, y, z, vxyz, plane_orientation='z_axes', colormap=self.color, vmin=self.vmin,
-                          vmax=self.vmax, figure=scene.mayavi_scene)
-        if self.n == 1:
-            lut = s.module_manager.scalar_lut_manager.lut.table.to_array()
-            ilut = lut[::-1]
-            s.module_manager.scalar_lut_manager.lut.table = ilut
-            lut = t.module_manager.scalar_lut_manager.lut.table.to_array()
-            ilut = lut[::-1]
-            t.module_manager.scalar_lut_manager.lut.table = ilut
-            lut = u.module_manager.scalar_lut_manager.lut.table.to_array()
-            ilut = lut[::-1]
-            u.module_manager.scalar_lut_manager.lut.table = ilut
-        scene.mlab.colorbar()
-        mlab.axes(ranges=[np.min(x), np.max(x), np.min(y), np.max(y), np.min(z), np.max(z)], figure=scene.mayavi_scene)
-        mlab.outline(figure=scene.mayavi_scene)
-        # mlab.title('Real View', figure=scene.mayavi_scene)
+        # Real View
+        self.draw(scene, self.x, self.y, self.z)
 
     def redraw_scene3(self, scene):
+        # Based on Block Number View
+        self.draw(scene, self.xx, self.yy, self.zz)
+
+    def draw(self, scene, x, y, z):
         # Notice how each mlab call points explicitely to the figure it
         # applies to.
-        xx = self.xx
-        yy = self.yy
-        zz = self.zz
-        vxyz = self.vxyz
+        i, j, k = self.index
+        vx, vy, vz = self.planes
         mlab.clf(figure=scene.mayavi_scene)
-        s = mlab.volume_slice(xx, yy, zz, vxyz, plane_orientation='x_axes', colormap=self.color, vmin=self.vmin,
-                          vmax=self.vmax, figure=scene.mayavi_scene)
-        t = mlab.volume_slice(xx, yy, zz, vxyz, plane_orientation='y_axes', colormap=self.color, vmin=self.vmin,
-                          vmax=self.vmax, figure=scene.mayavi_scene)
-        u = mlab.volume_slice(xx, yy, zz, vxyz, plane_orientation='z_axes', colormap=self.color, vmin=self.vmin,
-                          vmax=self.vmax, figure=scene.mayavi_scene)
+        yx, zx = np.meshgrid(y, z, indexing='ij')
+        xy, zy = np.meshgrid(x, z, indexing='ij')
+        xz, yz = np.meshgrid(x, y, indexing='ij')
+        s = mlab.mesh(np.full(yx.shape, x[i]), yx, zx, scalars=vx, colormap=self.color, vmin=self.vmin,
+                      vmax=self.vmax, figure=scene.mayavi_scene)
+        t = mlab.mesh(xy, np.full(xy.shape, y[j]), zy, scalars=vy, colormap=self.color, vmin=self.vmin,
+                      vmax=self.vmax, figure=scene.mayavi_scene)
+        u = mlab.mesh(xz, yz, np.full(xz.shape, z[k]), scalars=vz, colormap=self.color, vmin=self.vmin,
+                      vmax=self.vmax, figure=scene.mayavi_scene)
         if self.n == 1:
-            lut = s.module_manager.scalar_lut_manager.lut.table.to_array()
-            ilut = lut[::-1]
-            s.module_manager.scalar_lut_manager.lut.table = ilut
-            lut = t.module_manager.scalar_lut_manager.lut.table.to_array()
-            ilut = lut[::-1]
-            t.module_manager.scalar_lut_manager.lut.table = ilut
-            lut = u.module_manager.scalar_lut_manager.lut.table.to_array()
-            ilut = lut[::-1]
-            u.module_manager.scalar_lut_manager.lut.table = ilut
+            for m in [s, t, u]:
+                lut = m.module_manager.scalar_lut_manager.lut.table.to_array()
+                ilut = lut[::-1]
+                m.module_manager.scalar_lut_manager.lut.table = ilut
         scene.mlab.colorbar()
-        mlab.axes(ranges=[np.min(xx), np.max(xx), np.min(yy), np.max(yy), np.min(zz), np.max(zz)],
-                  figure=scene.mayavi_scene)
-        mlab.outline(figure=scene.mayavi_scene)
-        # mlab.title('Based on Block Number View', figure=scene.mayavi_scene)
+        mlab.axes(ranges=[np.min(x), np.max(x), np.min(y), np.max(y), np.min(z), np.max(z)], figure=scene.mayavi_scene)
+        mlab.outline(extent=[np.min(x), np.max(x), np.min(y), np.max(y), np.min(z), np.max(z)],
+                     figure=scene.mayavi_scene)
 
     # The layout of the dialog created
     view = View(HGroup(
@@ -145,27 +100,51 @@ class Visualization(HasTraits):
     )
 
 
+def middle(shape):
+    # planes shown first, through the middle of the cube
+    return tuple(n // 2 for n in shape)
+
+
+def bound(index, shape):
+    # plane numbers kept inside the cube
+    return tuple(min(max(int(n), 0), m - 1) for n, m in zip(index, shape))
+
+
+def planes(vxyz, index):
+    # the planes x = index[0], y = index[1] and z = index[2] of the cube as arrays in memory,
+    # read slice by slice when the cube is mapped from a result container
+    i, j, k = bound(index, vxyz.shape)
+    return np.array(vxyz[i, :, :]), np.array(vxyz[:, j, :]), np.array(vxyz[:, :, k])
+
+
 class MainWindow(QMainWindow):
-    def __init__(self, logdata, vdata, xdata, ydata, zdata, parent=None):
+    def __init__(self, logdata, vdata=None, xdata=None, ydata=None, zdata=None, parent=None):
         super(MainWindow, self).__init__(parent)
 
-        # data
-        file = open(logdata, 'r')
-        data = file.readlines()
-        for i in range(len(data)):
-            data[i] = data[i].split()
-        file.close()
+        # data, a result container (.npz) is mapped from disk; vdata then names the cube in it
+        if logdata.endswith('.npz'):
+            arrays, params = rt.load(logdata)
+            vxyz = arrays[vdata or 'vel']
+            x = arrays['x']
+            y = arrays['y']
+            z = arrays['z']
+        else:
+            file = open(logdata, 'r')
+            data = file.readlines()
+            for i in range(len(data)):
+                data[i] = data[i].split()
+            file.close()
 
-        nx = int(data[8][-1])
-        ny = int(data[9][-1])
-        nz = int(data[10][-1])
+            nx = int(data[8][-1])
+            ny = int(data[9][-1])
+            nz = int(data[10][-1])
 
-        vxyz = np.fromfile(vdata)
-        vxyz = vxyz.reshape((nx, ny, nz))
+            vxyz = np.fromfile(vdata)
+            vxyz = vxyz.reshape((nx, ny, nz))
 
-        x = np.fromfile(xdata)
-        y = np.fromfile(ydata)
-        z = np.fromfile(zdata)
+            x = np.fromfile(xdata)
+            y = np.fromfile(ydata)
+            z = np.fromfile(zdata)
 
         self.x = x
         self.y = y
@@ -202,15 +181,28 @@ class MainWindow(QMainWindow):
         lb_colormap.setText('Colormap List')
         lb_colormap.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
 
-        # adding vmin and vmax
+        # adding the displayed planes (block numbers)
+        self.slices = []
+        for name, i in zip(['X', 'Y', 'Z'], middle(vxyz.shape)):
+            lb_slice = QLabel()
+            lb_slice.setText(name + ' Slice')
+            lb_slice.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
+            line = QLineEdit()
+            line.setText(str(i))
+            laybutton.addWidget(lb_slice)
+            laybutton.addWidget(line)
+            self.slices.append(line)
+
+        # adding vmin and vmax, over the displayed planes only
+        shown = planes(vxyz, middle(vxyz.shape))
         self.vmin = QLineEdit()
-        self.vmin.setText(str(np.min(self.vxyz)))
+        self.vmin.setText(str(min(np.min(p) for p in shown)))
         lb_vmin = QLabel()
         lb_vmin.setText('Color Min')
         lb_vmin.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
 
         self.vmax = QLineEdit()
-        self.vmax.setText(str(np.max(self.vxyz)))
+        self.vmax.setText(str(max(np.max(p) for p in shown)))
         lb_vmax = QLabel()
         lb_vmax.setText('Color Max')
         lb_vmax.setSizePolicy(QSizePolicy.Fixed, QSizePolicy.Fixed)
@@ -245,8 +237,9 @@ class MainWindow(QMainWindow):
         self.vbl.removeWidget(self.ui)
         sip.delete(self.ui)
         self.ui = None
+        index = [int(line.text()) for line in self.slices]
         self.visualization = Visualization(self.x, self.y, self.z, self.vxyz, self.colormap.currentText(),
-                                           self.vmin.text(), self.vmax.text(), n)
+                                           self.vmin.text(), self.vmax.text(), n, index)
         self.ui = self.visualization.edit_traits().control
         self.vbl.addWidget(self.ui)
 
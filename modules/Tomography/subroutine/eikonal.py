@@ -0,0 +1,120 @@
+import numpy as np
+from functools import lru_cache
+import modules.Tomography.subroutine.gradient as gd
+import modules.Tomography.subroutine.lookup as lk
+
+# first-arrival travel times on the grid nodes by fast sweeping (Godunov upwind
+# scheme, Zhao 2005). In one sweep direction the nodes with equal i+j+k do not
+# depend on each other, so every such level is updated as one array operation.
+# By reciprocity one field per station serves all events recorded there; rays are
+# traced back from the source down the travel-time gradient.
+
+
+@lru_cache(maxsize=4)
+def plan(shape):
+    # node indices of every level, for the 8 sweep directions
+    i, j, k = [a.ravel() for a in np.indices(shape)]
+    level = i + j + k
+    order = np.argsort(level, kind='stable')
+    cut = np.searchsorted(level[order], np.arange(level.max() + 2))
+    sweeps = []
+    for sx in [1, -1]:
+        for sy in [1, -1]:
+            for sz in [1, -1]:
+                ii = i if sx > 0 else shape[0] - 1 - i
+                jj = j if sy > 0 else shape[1] - 1 - j
+                kk = k if sz > 0 else shape[2] - 1 - k
+                sweeps.append([(ii[order[cut[n]:cut[n + 1]]], jj[order[cut[n]:cut[n + 1]]],
+                                kk[order[cut[n]:cut[n + 1]]]) for n in range(len(cut) - 1)])
+    return sweeps
+
+
+def godunov(a, h, s):
+    # upwind solution of |grad T| = s from the smallest neighbour time per axis a (3, n)
+    order = np.argsort(a, axis=0)
+    a = np.take_along_axis(a, order, 0)
+    w = 1 / h[order] ** 2
+    t = a[0] + s / np.sqrt(w[0])
+    with np.errstate(invalid='ignore'):
+        for m in [2, 3]:
+            use = t > a[m - 1]
+            sw = np.sum(w[:m], axis=0)
+            swa = np.sum(w[:m] * a[:m], axis=0)
+            swa2 = np.sum(w[:m] * a[:m] ** 2, axis=0)
+            disc = np.maximum(swa ** 2 - sw * (swa2 - s ** 2), 0)
+            t = np.where(use, (swa + np.sqrt(disc)) / sw, t)
+    return t
+
+
+def solve(x, y, z, vxyz, rcv, tol=1e-6, maxsweep=10):
+    # travel time from the point rcv to every node of the grid
+    s = 1 / vxyz
+    h = np.array([x[1] - x[0], y[1] - y[0], z[1] - z[0]])
+    n = np.array(vxyz.shape)
+    # padded with a border of inf, node (i, j, k) is T[i+1, j+1, k+1]
+    T = np.full(n + 2, np.inf)
+
+    # nodes within two cells of rcv start from the straight-line time through the
+    # slowness at rcv, which removes most of the first-order source error
+    c = np.clip(np.floor((rcv - np.array([x[0], y[0], z[0]])) / h).astype(int), 0, n - 1)
+    lo = np.maximum(c - 2, 0)
+    hi = np.minimum(c + 3, n - 1)
+    i, j, k = np.meshgrid(np.arange(lo[0], hi[0] + 1), np.arange(lo[1], hi[1] + 1), np.arange(lo[2], hi[2] + 1),
+                          indexing='ij')
+    d = np.sqrt((x[i] - rcv[0]) ** 2 + (y[j] - rcv[1]) ** 2 + (z[k] - rcv[2]) ** 2)
+    T[i + 1, j + 1, k + 1] = d * s[c[0], c[1], c[2]]
+
+    for sweep in range(maxsweep):
+        told = T.copy()
+        for levels in plan(tuple(n)):
+            for i, j, k in levels:
+                a = np.array([np.minimum(T[i, j + 1, k + 1], T[i + 2, j + 1, k + 1]),
+                              np.minimum(T[i + 1, j, k + 1], T[i + 1, j + 2, k + 1]),
+                              np.minimum(T[i + 1, j + 1, k], T[i + 1, j + 1, k + 2])])
+                T[i + 1, j + 1, k + 1] = np.minimum(T[i + 1, j + 1, k + 1], godunov(a, h, s[i, j, k]))
+        f = np.isfinite(told)
+        if np.max(np.abs(T[f] - told[f]), initial=0) <= tol:
+            break
+    return T[1:-1, 1:-1, 1:-1]
+
+
+def trace(x, y, z, g, src, rcv, m, step, nmax, near):
+    # steepest descent from src through the gradient fields g[m] until the ray is within
+    # near (per axis) of rcv, where the field is the straight-line one and the ray goes
+    # straight to rcv; paths (nray, npts, 3). Finished rays repeat their last point,
+    # which adds no length in traversal.
+    lo = np.array([x[0], y[0], z[0]])
+    hi = np.array([x[-1], y[-1], z[-1]])
+    p = np.array(src, dtype=float)
+    path = [p.copy()]
+    done = np.all(np.abs(rcv - p) <= near, axis=1)
+    for n in range(nmax):
+        if np.all(done):
+            break
+        d = -lk.interp((x, y, z), g, p, m)
+        # no move through the grid boundary
+        d[((p <= lo) & (d < 0)) | ((p >= hi) & (d > 0))] = 0
+        norm = np.sqrt(np.sum(d ** 2, axis=1))
+        flat = ~(norm > 0)
+        d[flat] = (rcv - p)[flat]
+        norm[flat] = np.sqrt(np.sum(d[flat] ** 2, axis=1))
+        pn = np.clip(p + step * d / np.maximum(norm, 1e-12)[:, None], lo, hi)
+        p = np.where(done[:, None], p, pn)
+        path.append(p.copy())
+        done = done | np.all(np.abs(rcv - p) <= near, axis=1)
+    path.append(np.array(rcv, dtype=float))
+    return np.stack(path, axis=1)
+
+
+def forward(x, y, z, vxyz, src, rcv, tol=1e-6, maxsweep=10):
+    # ray paths of all picks, one eikonal solve per distinct receiver
+    sta, m = np.unique(rcv, axis=0, return_inverse=True)
+    m = m.ravel()
+    g = np.zeros((len(sta), 3) + vxyz.shape)
+    for n in range(len(sta)):
+        T = solve(x, y, z, vxyz, sta[n], tol, maxsweep)
+        gd.gradient(T, (x, y, z), tuple(g[n]), 'central')
+    h = np.array([x[1] - x[0], y[1] - y[0], z[1] - z[0]])
+    step = 0.5 * h.min()
+    nmax = int(np.ceil(4 * ((x[-1] - x[0]) + (y[-1] - y[0]) + (z[-1] - z[0])) / step))
+    return trace(x, y, z, g, src, rcv, m, step, nmax, 2 * h)
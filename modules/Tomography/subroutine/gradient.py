@@ -0,0 +1,38 @@
+import numpy as np
+
+# finite-difference velocity gradients along the grid axes, written into preallocated
+# arrays. 'forward' is basic.diff (backward difference at the last node), 'central'
+# uses centred differences inside and the one-sided ones at both ends.
+
+modes = ['forward', 'central']
+
+
+def along(v, a, n, out, mode='forward'):
+    # derivative of v along axis n with node coordinates a, into out
+    v = np.moveaxis(v, n, -1)
+    o = np.moveaxis(out, n, -1)
+    a = np.asarray(a, dtype=float)
+    if mode not in modes:
+        raise ValueError('unknown difference mode: ' + str(mode))
+    if v.shape[-1] < 2:
+        o[...] = 0
+    elif mode == 'forward':
+        np.subtract(v[..., 1:], v[..., :-1], out=o[..., :-1])
+        o[..., :-1] /= a[1:] - a[:-1]
+        o[..., -1] = o[..., -2]
+    else:
+        np.subtract(v[..., 2:], v[..., :-2], out=o[..., 1:-1])
+        o[..., 1:-1] /= a[2:] - a[:-2]
+        o[..., 0] = (v[..., 1] - v[..., 0]) / (a[1] - a[0])
+        o[..., -1] = (v[..., -1] - v[..., -2]) / (a[-1] - a[-2])
+    return out
+
+
+def gradient(v, axes, out=None, mode='forward'):
+    # one derivative array per axis of v; axes[n] holds the node coordinates of axis n.
+    # Pass the arrays of a previous call as out to reuse them.
+    if out is None:
+        out = tuple(np.zeros(v.shape) for n in range(v.ndim))
+    for n in range(v.ndim):
+        along(v, axes[n], n, out[n], mode)
+    return out
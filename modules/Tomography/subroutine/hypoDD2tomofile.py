@@ -15,14 +15,17 @@ def dd2tomo(relocfile, phasefile, evtfile):
         reloc[i] = reloc[i].split()
     file.close()
 
+    # event ID -> relocated lat, lon, depth
+    index = {}
+    for j in range(len(reloc)):
+        if reloc[j] != []:
+            index[reloc[j][0]] = reloc[j][1:4]
+
     for i in range(len(phase)):
         if phase[i] != []:
             if phase[i][0] == '#':
-                for j in range(len(reloc)):
-                    if phase[i][-1] == reloc[j][0]:
-                        phase[i][7] = reloc[j][1]
-                        phase[i][8] = reloc[j][2]
-                        phase[i][9] = reloc[j][3]
+                if phase[i][-1] in index:
+                    phase[i][7:10] = index[phase[i][-1]]
 
     file = open(evtfile,'w')
     for i in range(len(phase)):
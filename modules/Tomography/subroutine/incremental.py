@@ -0,0 +1,59 @@
+import os
+import json
+import numpy as np
+import scipy.sparse as sp
+import modules.Tomography.subroutine.block as blk
+
+# normal equations of a finished run, kept to add new events without tracing the old
+# rays again. The kernel of the old rays is frozen at the model of their last forward
+# modelling (vlin); with the slowness change d = 1/v - 1/vlin their part becomes
+#   K^T dt  ->  K^T dt - K^T K d
+#   |dt|^2  ->  |dt|^2 - 2 d.K^T dt + d.K^T K d
+# so only the rays of new picks are traced, and the cost follows the new data.
+
+
+def save(path, x, y, z, vxyz, vlin, ata, atb, btb, hits, dws, paths, params, nray, tobs, cell=None):
+    # cell: adaptive cell of every block when the run merged blocks, the update solves on the same cells
+    tmp = path + '.tmp.npz'
+    ata = sp.csr_matrix(ata)
+    np.savez(tmp, x=x, y=y, z=z, vxyz=vxyz, vlin=vlin, data=ata.data, indices=ata.indices, indptr=ata.indptr,
+             atb=atb, btb=btb, hits=hits, dws=dws, paths=np.zeros((0, 0, 3)) if paths is None else paths,
+             params=json.dumps(params, sort_keys=True), nray=nray, tobs=tobs,
+             cell=np.zeros(0, dtype=int) if cell is None else cell)
+    os.replace(tmp, path)
+
+
+def load(path):
+    data = np.load(path)
+    state = {key: data[key] for key in data.files}
+    data.close()
+    n = state['vxyz'].size
+    state['ata'] = sp.csr_matrix((state.pop('data'), state.pop('indices'), state.pop('indptr')), shape=(n, n))
+    state['btb'] = float(state['btb'])
+    state['nray'] = int(state['nray'])
+    state['tobs'] = float(state['tobs'])
+    state['params'] = json.loads(str(state['params']))
+    if state['paths'].size == 0:
+        state['paths'] = None
+    if 'cell' not in state or state['cell'].size == 0:
+        state['cell'] = None
+    return state
+
+
+def check(state, params, tobs):
+    # the forward settings must be the ones of the frozen kernel, and the picks of the
+    # earlier run must come first and unchanged in the catalog
+    diff = [key for key in params if state['params'].get(key) != params[key]]
+    if diff != []:
+        raise ValueError('update state was written with different ' + ', '.join(diff))
+    if len(tobs) < state['nray'] or not np.isclose(np.sum(tobs[:state['nray']]), state['tobs']):
+        raise ValueError('picks of the earlier run changed, the catalog can only be appended')
+
+
+def shift(state, vxyz):
+    # right-hand side and squared residual of the old rays at model vxyz
+    d = 1 / blk.flatten(vxyz) - 1 / blk.flatten(state['vlin'])
+    ad = state['ata'].dot(d)
+    atb = state['atb'] - ad
+    btb = state['btb'] - 2 * d.dot(state['atb']) + d.dot(ad)
+    return atb, btb
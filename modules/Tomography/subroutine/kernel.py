@@ -0,0 +1,26 @@
+import numpy as np
+import scipy.sparse as sp
+
+
+def stack(a, dtype):
+    # row/col/val may be collected as scalars or as one array per ray
+    return np.hstack([np.zeros(0, dtype=dtype)] + list(a)).astype(dtype)
+
+
+def assemble(row, col, val, nrow, ncol):
+    # duplicate (row, col) entries, e.g. one ray crossing a block twice, are summed
+    return sp.coo_matrix((stack(val, float), (stack(row, int), stack(col, int))), shape=(nrow, ncol)).tocsr()
+
+
+def damped(kray, normd, gradd, gamma):
+    # stacked system [K; normd*I; gradd*gamma], all blocks kept sparse
+    nblok = kray.shape[1]
+    iden = sp.identity(nblok, format='csr')
+    return sp.vstack([kray, normd * iden, gradd * sp.csr_matrix(gamma)], format='csr')
+
+
+def normal(ata, normd, gradd, gamma):
+    # normal matrix of the stacked system from K^T K alone, the same as damped(...).T * damped(...)
+    nblok = ata.shape[1]
+    gamma = sp.csr_matrix(gamma)
+    return sp.csr_matrix(ata + normd ** 2 * sp.identity(nblok, format='csr') + gradd ** 2 * gamma.T.dot(gamma))
@@ -0,0 +1,46 @@
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import modules.Tomography.subroutine.kernel as kr
+import modules.Tomography.subroutine.solver as sv
+import modules.Tomography.subroutine.block as blk
+import modules.Tomography.subroutine.smoothing as sm
+
+# damping/smoothing trade-off on one ray kernel. Every (normd, gradd) pair is one
+# damped solve of the same kernel and residuals; the kernel reaches each worker
+# process once, through the pool initializer.
+
+state = {}
+
+
+def attach(kray, dtco, vxyz, opts):
+    state.update(kray=kray, dtco=dtco, vxyz=vxyz, opts=opts)
+
+
+def candidate(pair):
+    # model of one pair, with linearised data misfit |K ds - dt|^2, roughness
+    # |gamma ds|^2 and norm |ds|^2 of the slowness update
+    normd, gradd = pair
+    kray, dtco, vxyz, opts = state['kray'], state['dtco'], state['vxyz'], state['opts']
+    gamma = sm.gamma(vxyz.shape, opts['smooth'], opts['wh'], opts['wv'])
+    k = kr.damped(kray, normd, gradd, gamma)
+    ds = sv.solve(k, dtco, opts['solver'], opts['tol'], opts['maxiter'])
+    misfit = np.sum((kray.dot(ds) - dtco) ** 2)
+    rough = np.sum(gamma.dot(ds) ** 2)
+    norm = np.sum(ds ** 2)
+    vxyzn = blk.scatter(blk.update(blk.flatten(vxyz), ds), vxyz.shape)
+    return vxyzn, misfit, rough, norm
+
+
+def sweep(kray, dtco, vxyz, pairs, solver='INV', tol=1e-6, maxiter=None, smooth=2, wh=1.0, wv=1.0, nproc=1):
+    # table rows are normd, gradd, misfit, roughness, norm; models follow the order of pairs
+    opts = dict(solver=solver, tol=tol, maxiter=maxiter, smooth=smooth, wh=wh, wv=wv)
+    if nproc > 1 and len(pairs) > 1:
+        with ProcessPoolExecutor(nproc, initializer=attach, initargs=(kray, dtco, vxyz, opts)) as pool:
+            out = list(pool.map(candidate, pairs))
+    else:
+        attach(kray, dtco, vxyz, opts)
+        out = [candidate(pair) for pair in pairs]
+        state.clear()
+    table = np.array([[pairs[i][0], pairs[i][1], out[i][1], out[i][2], out[i][3]] for i in range(len(pairs))])
+    models = np.array([out[i][0] for i in range(len(pairs))])
+    return table.reshape(-1, 5), models
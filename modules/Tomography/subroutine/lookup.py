@@ -0,0 +1,84 @@
+import itertools
+import numpy as np
+
+# grid lookups of many points in one call, for 2D (x, y) and 3D (x, y, z) grids with
+# uniform axes. Points are arrays (..., ndim); cubes are indexed [i, j(, k)] along the
+# axes as given. Block lookups snap to the node at or below the point, as bs.index;
+# interp is the (bi/tri)linear interpolation between the nodes.
+
+
+def index(axes, p):
+    # node at or below every point along each axis, |fix((p - a[0]) / da)| as bs.index, not bounded
+    p = np.asarray(p, dtype=float)
+    return tuple(np.abs(np.fix((p[..., n] - a[0]) / (a[1] - a[0]))).astype(int) for n, a in enumerate(axes))
+
+
+def locate(axes, p, blocks=False):
+    # block indices of the points, clipped to the grid, and whether the points lie inside it;
+    # points outside (or not finite) get a valid index that callers mask out. The grid ends at
+    # the last node, or with blocks=True at the end of the last block, a[-1] + da, as the
+    # bs.index bound checks of iterbending
+    p = np.where(np.isfinite(p), p, np.inf)
+    inside = np.all(np.isfinite(p), axis=-1)
+    for n, a in enumerate(axes):
+        if blocks:
+            last = index((a,), np.where(inside, p[..., n], a[0])[..., None])[0] < len(a)
+        else:
+            last = p[..., n] <= a[-1]
+        inside = inside & (p[..., n] >= a[0]) & last
+    pc = np.where(inside[..., None], p, 0)
+    return tuple(np.clip(i, 0, len(a) - 1) for i, a in zip(index(axes, pc), axes)), inside
+
+
+def weights(axes, p):
+    # lower node and fractional position between it and the next node along each axis,
+    # points beyond the grid are clamped to its edge
+    i = []
+    t = []
+    for n, a in enumerate(axes):
+        u = np.clip((p[..., n] - a[0]) / (a[1] - a[0]), 0, len(a) - 1)
+        i0 = np.minimum(np.floor(u).astype(int), max(len(a) - 2, 0))
+        i.append(i0)
+        t.append(np.minimum(u - i0, 1))
+    return i, t
+
+
+def corners(axes, p):
+    # weight and node indices of the 2 ** ndim nodes around every point
+    i, t = weights(axes, p)
+    out = []
+    for corner in itertools.product([0, 1], repeat=len(axes)):
+        w = 1
+        idx = []
+        for n in range(len(axes)):
+            w = w * (t[n] if corner[n] else 1 - t[n])
+            idx.append(np.minimum(i[n] + corner[n], len(axes[n]) - 1))
+        out.append((w, tuple(idx)))
+    return out
+
+
+def interp(axes, f, p, m=None):
+    # (bi/tri)linear values of the cube f at the points p. With m (one per point of
+    # p (n, ndim)), f is a stack (nfield, ncomp, nx, ny(, nz)) and point n takes field
+    # m[n], giving (n, ncomp)
+    out = 0
+    for w, idx in corners(axes, p):
+        if m is None:
+            out = out + w * f[idx]
+        else:
+            out = out + w[:, None] * f[(m, slice(None)) + idx]
+    return out
+
+
+def sample(axes, v, p, grad=None, linear=False, blocks=False):
+    # everything ray tracing needs at the points p in one call: block indices, inside mask
+    # (locate), velocity and, with grad (one derivative cube per axis), the velocity gradient;
+    # the values of the blocks, or interpolated between the nodes with linear=True
+    idx, inside = locate(axes, p, blocks)
+    cubes = [v] + ([] if grad is None else list(grad))
+    if linear:
+        nodes = corners(axes, p)
+        values = [sum(w * c[node] for w, node in nodes) for c in cubes]
+    else:
+        values = [c[idx] for c in cubes]
+    return idx, inside, values[0], tuple(values[1:])
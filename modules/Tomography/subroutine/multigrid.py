@@ -0,0 +1,38 @@
+import numpy as np
+import modules.Tomography.subroutine.lookup as lk
+
+# coarse-to-fine schedule of an inversion. Every coarser level halves the number of
+# block intervals along each axis over the same extent; the model of one level is the
+# trilinear interpolation of the level before, so the fine grid starts from a model
+# that already fits the long wavelengths.
+
+
+def shapes(shape, levels):
+    # grid sizes from the coarsest to the given one, at least 2 nodes per axis
+    out = []
+    for level in range(levels - 1, -1, -1):
+        out.append(tuple(max((n - 1) // 2 ** level + 1, min(n, 2)) for n in shape))
+    return out
+
+
+def axes(x, y, z, shape):
+    return np.linspace(x[0], x[-1], shape[0]), np.linspace(y[0], y[-1], shape[1]), np.linspace(z[0], z[-1], shape[2])
+
+
+def resample(x, y, z, v, xn, yn, zn):
+    # trilinear values of the cube v on the grid xn, yn, zn (clamped at the edges)
+    p = np.stack(np.meshgrid(xn, yn, zn, indexing='ij'), axis=-1).reshape(-1, 3)
+    return lk.interp((x, y, z), v, p).reshape(len(xn), len(yn), len(zn))
+
+
+def iterations(iter, levels):
+    # iterations per level, split evenly with the remainder on the finest levels
+    n = [iter // levels] * levels
+    for i in range(iter % levels):
+        n[levels - 1 - i] += 1
+    return n
+
+
+def damping(normd, gradd, scale, levels):
+    # damping per level, a coarser level is damped scale times more than the next finer one
+    return [(normd * scale ** (levels - 1 - i), gradd * scale ** (levels - 1 - i)) for i in range(levels)]
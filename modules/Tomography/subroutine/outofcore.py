@@ -0,0 +1,51 @@
+import tempfile
+import numpy as np
+
+# kernel of a catalog too large to hold at once. Rays are traced in chunks of whole
+# events sized to a memory budget and every chunk only adds its K^T K and K^T dt to the
+# normal equations, so the kernel never exists as a whole. Ray paths kept for the next
+# iteration live in a memory-mapped temporary file.
+
+
+def perray(shape, cacah):
+    # rough bytes per ray while its chunk is traced and assembled: bending keeps a few
+    # copies of the path, the traversal one entry per crossed block and segment
+    return 8 * 3 * (cacah + 1) * 16 + 24 * 4 * (cacah + sum(shape))
+
+
+def fixed(shape, solver='INV'):
+    # bytes of the normal equations: dense matrix and inverse for INV, otherwise the
+    # sparse K^T K with a generous bound on its row length
+    n = int(np.prod(shape))
+    if solver.upper() == 'INV':
+        return 3 * 8 * n * n
+    return 12 * n * min(n, 512) + 8 * 8 * n
+
+
+def chunks(offset, budget, shape, cacah, solver='INV', normal=True):
+    # ray boundaries of chunks of whole events (rays offset[e]:offset[e+1] belong to event e,
+    # catalog.offsets), as many rays per chunk as the budget in bytes leaves after
+    # the normal equations (none when only travel times are wanted), and at least one event
+    need = fixed(shape, solver) if normal else 0
+    if budget <= need:
+        hint = ', or use the LSQR or LSMR solver' if solver.upper() == 'INV' else ''
+        raise ValueError('memory budget of %.3g MB is below the %.3g MB of the normal equations for %s blocks with '
+                         'solver %s; raise the budget%s' % (budget / 2 ** 20, need / 2 ** 20, 'x'.join(str(n) for n in shape),
+                                                           solver, hint))
+    nmax = max(int((budget - need) // perray(shape, cacah)), 1)
+    starts = list(np.unique(offset))
+    nray = starts[-1]
+    bounds = [0]
+    last = 0
+    for b in starts[1:]:
+        if b - bounds[-1] > nmax and last > bounds[-1]:
+            bounds.append(last)
+        last = b
+    if bounds[-1] != nray:
+        bounds.append(nray)
+    return np.array(bounds, dtype=int)
+
+
+def pathstore(nray, npts, ndim=3):
+    # paths of all rays in a temporary file, removed when the map is released
+    return np.memmap(tempfile.TemporaryFile(), dtype=float, mode='w+', shape=(nray, npts, ndim))
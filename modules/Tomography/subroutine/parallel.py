@@ -0,0 +1,101 @@
+import numpy as np
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import modules.Tomography.subroutine.bending as bd
+import modules.Tomography.subroutine.traversal as tv
+
+# forward modelling sharded by event over a process pool. One session (pool and shared
+# memory) serves all forward calls of an inversion: the velocity cube and its derivatives
+# are copied into the shared memory before every call and only read by the workers;
+# shards come back in submission order, so the merged kernel equals the serial one.
+
+cube = {}
+
+
+def attach(names, shape):
+    # the shared cubes in the worker, mapped again only when the session made new ones
+    if cube.get('names') != names:
+        for shm in cube.get('shm', []):
+            shm.close()
+        cube.clear()
+        cube.update(names=names, shm=[shared_memory.SharedMemory(name=name) for name in names])
+    return [np.ndarray(shape, dtype=float, buffer=shm.buf) for shm in cube['shm']]
+
+
+def shard(names, shape, x, y, z, src, rcv, biter, cacah, start, ttol, linear):
+    v, dvx, dvy, dvz = attach(names, shape)
+    paths = bd.bend(x, y, z, v, dvx, dvy, dvz, src, rcv, biter, cacah, start=start, ttol=ttol, linear=linear)
+    ray, nb, l = tv.traverse_all((x, y, z), paths)
+    return ray, nb, l, paths
+
+
+@contextmanager
+def session(nproc):
+    # process pool of one inversion, None without parallel forward modelling
+    if nproc <= 1:
+        yield None
+        return
+    pool = {'shm': []}
+    try:
+        with ProcessPoolExecutor(nproc) as executor:
+            pool['executor'] = executor
+            yield pool
+    finally:
+        release(pool)
+
+
+def share(pool, cubes):
+    # copies the cubes into the shared memory of the session, made anew when the grid grows
+    size = max(cubes[0].size * 8, 1)
+    if pool['shm'] == [] or pool['shm'][0].size < size:
+        release(pool)
+        pool['shm'] = [shared_memory.SharedMemory(create=True, size=size) for c in cubes]
+    for shm, c in zip(pool['shm'], cubes):
+        np.ndarray(c.shape, dtype=float, buffer=shm.buf)[...] = c
+    return tuple(shm.name for shm in pool['shm'])
+
+
+def release(pool):
+    for shm in pool['shm']:
+        shm.close()
+        shm.unlink()
+    pool['shm'] = []
+
+
+def split(offset, nshard):
+    # ray boundaries of at most nshard shards of whole events, balanced by ray count;
+    # rays offset[e]:offset[e+1] belong to event e (catalog.offsets)
+    start = np.unique(offset)
+    target = np.arange(1, nshard) * start[-1] / nshard
+    cut = start[np.searchsorted(start, target)]
+    return np.unique(np.concatenate([[0], cut, [start[-1]]])).astype(int)
+
+
+def forward(x, y, z, vxyz, dvx, dvy, dvz, src, rcv, biter, cacah, nproc, start=None, ttol=0, progress=None,
+            pool=None, linear=False, offset=None):
+    # same output as bd.bend followed by tv.traverse_all on all rays; progress is called with
+    # the number of rays done after every shard. Without a session one is made for this call.
+    # offset: event offsets of the rays, every ray is its own event without them
+    if pool is None:
+        with session(nproc) as pool:
+            return forward(x, y, z, vxyz, dvx, dvy, dvz, src, rcv, biter, cacah, nproc, start, ttol, progress, pool,
+                           linear, offset)
+    names = share(pool, [vxyz, dvx, dvy, dvz])
+
+    # a few shards per process keeps the pool busy when ray counts per event differ
+    bounds = split(np.arange(len(src) + 1) if offset is None else offset, 4 * nproc)
+    jobs = [pool['executor'].submit(shard, names, vxyz.shape, x, y, z, src[a:b], rcv[a:b], biter, cacah,
+                                    None if start is None else start[a:b], ttol, linear)
+            for a, b in zip(bounds[:-1], bounds[1:])]
+    out = []
+    for job, b in zip(jobs, bounds[1:]):
+        out.append(job.result())
+        if progress is not None:
+            progress(b)
+
+    ray = np.concatenate([np.zeros(0, dtype=int)] + [o[0] + a for o, a in zip(out, bounds[:-1])])
+    nb = np.concatenate([np.zeros(0, dtype=int)] + [o[1] for o in out])
+    l = np.concatenate([np.zeros(0)] + [o[2] for o in out])
+    paths = np.concatenate([np.zeros((0, cacah + 1, 3))] + [o[3] for o in out])
+    return ray, nb, l, paths
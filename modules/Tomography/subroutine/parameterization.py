@@ -13,25 +13,12 @@ def colatlon2km(colat,colon,deg2km):
     y = colat*deg2km
     return x,y
 
-def param(event, station, velocity, deg2km, nx, ny, nz):
+def param(cat, velocity, deg2km, nx, ny, nz):
     # define lat min-max, lon min-max, and depth max
-    lat = []
-    lon = []
-    depth = []
-    i = 0
-    while i < len(event):
-        if event[i][0] == '#' and event[i] != []:
-            lat.append(float(event[i][7]))
-            lon.append(float(event[i][8]))
-            depth.append(float(event[i][9]))
-        if event[i][0] != '#' and event[i] != []:
-            j = 0
-            while j < len(station):
-                if event[i][0] == station[j][0]:
-                    lat.append(float(station[j][1]))
-                    lon.append(float(station[j][2]))
-                j = j+1
-        i = i+1
+    sta = cat.pick['sta'][cat.pick['sta'] >= 0]
+    lat = np.concatenate([cat.event['lat'], cat.station['lat'][sta]])
+    lon = np.concatenate([cat.event['lon'], cat.station['lon'][sta]])
+    depth = cat.event['z']
 
     lat_min = min(lat)
     lat_max = max(lat)
@@ -65,38 +52,13 @@ def param(event, station, velocity, deg2km, nx, ny, nz):
 
     return x,y,z,v
 
-def param2(event, station, velocity, deg2km, nx, ny, nz):
-    # define lat min-max, lon min-max, and depth max
-    colat = []
-    colon = []
-    depth = []
-    i = 0
-    while i < len(event):
-        if event[i][0] == '#' and event[i] != []:
-            colatx, colonx = colatlon(float(event[i][7]), float(event[i][8]))
-            colat.append(colatx)
-            colon.append(colonx)
-            depth.append(float(event[i][9]))
-        if event[i][0] != '#' and event[i] != []:
-            j = 0
-            while j < len(station):
-                if event[i][0] == station[j][0]:
-                    colatx, colonx = colatlon(float(station[j][1]), float(station[j][2]))
-                    colat.append(colatx)
-                    colon.append(colonx)
-                j = j+1
-        i = i+1
-
-    colat_min = min(colat)
-    colat_max = max(colat)
-    colon_min = min(colon)
-    colon_max = max(colon)
-
+def param2(cat, velocity, deg2km, nx, ny, nz):
+    # define x, y min-max from the projected events and stations, and depth max
+    xa, ya, depth = cat.extent()
+    xmin, xmax = xa.min(), xa.max()
+    ymin, ymax = ya.min(), ya.max()
     depth_max = max(depth)
 
-    xmin,ymin = colatlon2km(colat_min,colon_min,deg2km)
-    xmax,ymax = colatlon2km(colat_max,colon_max,deg2km)
-
     x = np.linspace(xmin,xmax,nx)
     y = np.linspace(ymin,ymax,ny)
     z = np.linspace(0,depth_max,nz)
@@ -116,38 +78,13 @@ def param2(event, station, velocity, deg2km, nx, ny, nz):
 
     return x,y,z,v
 
-def paramS(event, station, velocity, deg2km, nx, ny, nz):
-    # define lat min-max, lon min-max, and depth max
-    colat = []
-    colon = []
-    depth = []
-    i = 0
-    while i < len(event):
-        if event[i][0] == '#' and event[i] != []:
-            colatx, colonx = colatlon(float(event[i][7]), float(event[i][8]))
-            colat.append(colatx)
-            colon.append(colonx)
-            depth.append(float(event[i][9]))
-        if event[i][0] != '#' and event[i] != []:
-            j = 0
-            while j < len(station):
-                if event[i][0] == station[j][0]:
-                    colatx, colonx = colatlon(float(station[j][1]), float(station[j][2]))
-                    colat.append(colatx)
-                    colon.append(colonx)
-                j = j+1
-        i = i+1
-
-    colat_min = min(colat)
-    colat_max = max(colat)
-    colon_min = min(colon)
-    colon_max = max(colon)
-
+def paramS(cat, velocity, deg2km, nx, ny, nz):
+    # define x, y min-max from the projected events and stations, and depth max
+    xa, ya, depth = cat.extent()
+    xmin, xmax = xa.min(), xa.max()
+    ymin, ymax = ya.min(), ya.max()
     depth_max = max(depth)
 
-    xmin,ymin = colatlon2km(colat_min,colon_min,deg2km)
-    xmax,ymax = colatlon2km(colat_max,colon_max,deg2km)
-
     x = np.linspace(xmin,xmax,nx)
     y = np.linspace(ymin,ymax,ny)
     z = np.linspace(0,depth_max,nz)
@@ -0,0 +1,56 @@
+import time
+from contextlib import contextmanager
+
+# progress messages and stage timing of a run, in front of the progress callback (the
+# Qt signal or anything with an emit method). Counted messages are passed on at most
+# once per interval, the first and the last of a stage always; the last event is kept
+# as a dict (stage, done, total, rate, eta) for callers without a text display.
+
+
+class monitor(object):
+    def __init__(self, callback=None, interval=0.5):
+        self.callback = callback
+        self.interval = interval
+        self.times = {}
+        self.started = {}
+        self.event = {}
+        self.last = -float('inf')
+
+    def emit(self, s, force=True):
+        now = time.time()
+        if force or now - self.last >= self.interval:
+            self.last = now
+            if self.callback is not None:
+                self.callback.emit(s)
+
+    def count(self, stage, done, total, unit='rays'):
+        # a count of zero marks the start of a stage that is not timed with stage()
+        now = time.time()
+        if done <= 0:
+            self.started[stage] = now
+        elapsed = max(now - self.started.get(stage, now), 1e-9)
+        rate = done / elapsed
+        eta = (total - done) / rate if rate > 0 else 0.0
+        self.event = dict(stage=stage, done=done, total=total, rate=rate, eta=eta)
+        self.emit(stage + ' -> ' + str(done) + '/' + str(total) + ' ' + unit + ', ' + '%.0f' % rate + ' ' + unit +
+                  '/s, ETA ' + '%.0f' % eta + ' s', done <= 0 or done >= total)
+
+    @contextmanager
+    def stage(self, name):
+        # seconds spent in every stage, summed over iterations
+        start = time.time()
+        self.started[name] = start
+        try:
+            yield self
+        finally:
+            self.times[name] = self.times.get(name, 0.0) + time.time() - start
+
+    def summary(self):
+        return ', '.join(name + ' ' + '%.1f' % self.times[name] + ' s' for name in self.times)
+
+
+def wrap(callback, interval=0.5):
+    # one monitor per run, also when the callback is passed down again
+    if isinstance(callback, monitor):
+        return callback
+    return monitor(callback, interval)
@@ -0,0 +1,50 @@
+import numpy as np
+import modules.Tomography.subroutine.kernel as kr
+import modules.Tomography.subroutine.solver as sv
+import modules.Tomography.subroutine.block as blk
+import modules.Tomography.subroutine.smoothing as sm
+
+# resolution analysis on the kernel of a real inversion: checkerboard recovery with
+# synthetic residuals K (1/velr - 1/v0), ray coverage and the diagonal of the
+# resolution matrix, without tracing rays again.
+
+
+def checkerboard(v0, size, pert):
+    # v0 raised / lowered by pert in alternating boxes of size (int or one per axis) blocks
+    size = np.broadcast_to(size, (v0.ndim,))
+    idx = np.indices(v0.shape)
+    parity = np.mod(sum(idx[n] // size[n] for n in range(v0.ndim)), 2)
+    return np.where(parity == 0, v0 + v0 * pert, v0 - v0 * pert)
+
+
+def recover(kray, v0, velr, normd, gradd, solver='INV', tol=1e-6, maxiter=None, smooth=2, wh=1.0, wv=1.0):
+    # recovered model from the synthetic residuals of velr, and the correlation of the
+    # recovered with the true slowness perturbation
+    s0 = 1 / blk.flatten(v0)
+    dstrue = 1 / blk.flatten(velr) - s0
+    k = kr.damped(kray, normd, gradd, sm.gamma(v0.shape, smooth, wh, wv))
+    ds = sv.solve(k, kray.dot(dstrue), solver, tol, maxiter)
+    rec = blk.scatter(blk.update(blk.flatten(v0), ds), v0.shape)
+    if np.std(ds) > 0 and np.std(dstrue) > 0:
+        corr = np.corrcoef(ds, dstrue)[0, 1]
+    else:
+        corr = 0.0
+    return rec, corr
+
+
+def hitcount(kray, shape):
+    # number of rays through every block
+    return blk.scatter(np.bincount(kray.indices, minlength=kray.shape[1]).astype(float), shape)
+
+
+def dws(kray, shape):
+    # derivative weight sum, the ray length in every block summed over rays
+    return blk.scatter(np.asarray(kray.sum(axis=0)).ravel(), shape)
+
+
+def diagonal(kray, shape, normd, gradd, smooth=2, wh=1.0, wv=1.0):
+    # diagonal of R = (A^T A)^-1 K^T K, A the damped system; dense, for moderate grids
+    a = kr.damped(kray, normd, gradd, sm.gamma(shape, smooth, wh, wv))
+    ata = a.T.dot(a).toarray()
+    ktk = kray.T.dot(kray).toarray()
+    return blk.scatter(np.diag(np.linalg.solve(ata, ktk)).copy(), shape)
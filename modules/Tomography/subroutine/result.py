@@ -0,0 +1,41 @@
+import json
+import zipfile
+import numpy as np
+
+# one container per tomography run: an uncompressed .npz (axes, velocity cubes, rms
+# history, ray density, ...) with the run parameters as a json string. Every member
+# is a plain .npy file stored in the zip, so a reader can map it straight from the
+# file and only the slices it touches are read from disk.
+
+
+def write(path, params, **arrays):
+    # arrays given as None are left out
+    arrays = {key: arrays[key] for key in arrays if arrays[key] is not None}
+    np.savez(path, params=json.dumps(params, sort_keys=True), **arrays)
+
+
+def member(f, zf, info, mmap):
+    # array of one stored .npy member, mapped from the file when it is large enough
+    f.seek(info.header_offset)
+    head = f.read(30)
+    start = info.header_offset + 30 + int.from_bytes(head[26:28], 'little') + int.from_bytes(head[28:30], 'little')
+    f.seek(start)
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+    if not mmap or info.compress_type != zipfile.ZIP_STORED or dtype.hasobject or int(np.prod(shape)) < 1024:
+        return np.lib.format.read_array(zf.open(info.filename))
+    return np.memmap(f.name, dtype, 'r', f.tell(), shape, 'F' if fortran else 'C')
+
+
+def load(path, mmap=True):
+    # arrays by name and the run parameters
+    out = {}
+    with zipfile.ZipFile(path) as zf, open(path, 'rb') as f:
+        for info in zf.infolist():
+            if info.filename.endswith('.npy'):
+                out[info.filename[:-4]] = member(f, zf, info, mmap)
+    params = json.loads(str(out.pop('params'))) if 'params' in out else {}
+    return out, params
@@ -0,0 +1,136 @@
+import numpy as np
+import scipy.sparse as sp
+from functools import lru_cache
+from scipy.sparse.csgraph import dijkstra
+import modules.Tomography.subroutine.lookup as lk
+import modules.Tomography.subroutine.traversal as tv
+import modules.Tomography.subroutine.block as blk
+
+# shortest-path ray tracing (Moser 1991) with secondary nodes. Every block edge of
+# the grid is split into refine intervals and the nodes of this finer lattice that lie
+# on block faces are the graph nodes; all nodes on the boundary of one block are
+# linked to each other with the slowness of that block (an edge along a face shared by
+# two blocks takes the faster one), so a path is straight inside every block. Sources
+# and stations are extra nodes at their exact position, linked to the boundary nodes
+# of their own block. The edge pattern only depends on the grid, the refinement and
+# the points, so it is kept between iterations and only the weights are refreshed.
+# Blocks are the cells [x[i], x[i+1]) of bs.index / traversal, slowness 1/vxyz[i, j, k].
+
+cache = {}
+
+
+@lru_cache(maxsize=4)
+def template(refine):
+    # lattice offsets (u, v, w) of the nodes on the boundary of one block, and the
+    # index pairs of all links between them
+    u = np.array([o for o in np.ndindex(refine + 1, refine + 1, refine + 1)
+                  if min(o) == 0 or max(o) == refine])
+    a, b = np.triu_indices(len(u), 1)
+    return u, a, b
+
+
+def lattice(shape, refine):
+    # node number of every point of the refined lattice on a block face, -1 elsewhere
+    size = tuple((n - 1) * refine + 1 for n in shape)
+    idx = np.indices(size)
+    face = np.any([np.mod(idx[n], refine) == 0 for n in range(3)], axis=0)
+    number = np.full(size, -1)
+    number[face] = np.arange(np.count_nonzero(face))
+    return number
+
+
+def topology(x, y, z, pts, refine):
+    # graph nodes (lattice nodes, then the points pts), unique edges, the block of every
+    # candidate edge with its length, and how candidate edges collapse to unique ones;
+    # cached for the last grid and point set
+    shape = (len(x), len(y), len(z))
+    key = (shape, refine, pts.shape, pts.tobytes(), x[0], x[1], y[0], y[1], z[0], z[1])
+    if cache.get('key') == key:
+        return cache
+    h = np.array([x[1] - x[0], y[1] - y[0], z[1] - z[0]]) / refine
+    number = lattice(shape, refine)
+    u, pa, pb = template(refine)
+    cells = np.array(list(np.ndindex(*[n - 1 for n in shape])))
+    nblock = np.ravel_multi_index(tuple(cells.T), shape)
+
+    # links between the boundary nodes of every block
+    node = number[tuple((cells[:, None, :] * refine + u[None, :, :]).transpose(2, 0, 1))]
+    a = node[:, pa].ravel()
+    b = node[:, pb].ravel()
+    block = np.repeat(nblock, len(pa))
+    length = np.tile(np.sqrt(np.sum(((u[pa] - u[pb]) * h) ** 2, axis=1)), len(cells))
+
+    # every point to the boundary nodes of its block, at its exact position
+    nnode = number.max() + 1
+    (o, q, r), inside = lk.locate((x, y, z), pts)
+    own = np.transpose([np.minimum(o, shape[0] - 2), np.minimum(q, shape[1] - 2), np.minimum(r, shape[2] - 2)])
+    near = own[:, None, :] * refine + u[None, :, :]
+    xyz0 = np.array([x[0], y[0], z[0]])
+    a = np.concatenate([a, np.repeat(nnode + np.arange(len(pts)), len(u))])
+    b = np.concatenate([b, number[tuple(near.transpose(2, 0, 1))].ravel()])
+    block = np.concatenate([block, np.repeat(np.ravel_multi_index(tuple(own.T), shape), len(u))])
+    length = np.concatenate([length, np.sqrt(np.sum((pts[:, None, :] - xyz0 - near * h) ** 2, axis=2)).ravel()])
+
+    # a link along a shared face appears once per block, the faster block wins
+    lo = np.minimum(a, b)
+    hi = np.maximum(a, b)
+    pair, first, inverse = np.unique(lo * (nnode + len(pts)) + hi, return_index=True, return_inverse=True)
+    sort = np.argsort(inverse.ravel(), kind='stable')
+    starts = np.concatenate([[0], np.nonzero(np.diff(inverse.ravel()[sort]))[0] + 1])
+    n = nnode + len(pts)
+    g = sp.csr_matrix((np.arange(1, len(pair) + 1, dtype=float), (lo[first], hi[first])), shape=(n, n))
+
+    lattice_xyz = np.transpose(np.nonzero(number >= 0)) * h + xyz0
+    cache.clear()
+    cache.update(key=key, block=block, length=length, sort=sort, starts=starts, graph=g,
+                 order=g.data.astype(int) - 1, xyz=np.concatenate([lattice_xyz, pts]), nnode=nnode)
+    return cache
+
+
+def forward(x, y, z, vxyz, src, rcv, refine=2):
+    # first-arrival paths from every source to its station, (nray, npts, 3); a ray
+    # straight from source to station is taken instead when it is faster
+    src = np.asarray(src, dtype=float)
+    rcv = np.asarray(rcv, dtype=float)
+    sta, m = np.unique(rcv, axis=0, return_inverse=True)
+    m = m.ravel()
+    pts = np.concatenate([sta, src])
+    t = topology(x, y, z, pts, refine)
+
+    # blocks of the candidate edges are numbered as np.ravel_multi_index, last axis fastest
+    s = 1 / vxyz.ravel()
+    w = t['length'] * s[t['block']]
+    w = np.minimum.reduceat(w[t['sort']], t['starts'])
+    g = t['graph']
+    # a zero weight would read as a missing edge
+    g.data = np.maximum(w[t['order']], 1e-12)
+
+    n = t['nnode']
+    dist, pred = dijkstra(g, directed=False, indices=n + np.arange(len(sta)), return_predecessors=True)
+
+    # walk the predecessors of all rays together, from the source node to the station node
+    cur = n + len(sta) + np.arange(len(src))
+    path = [cur]
+    while True:
+        nxt = pred[m, cur]
+        nxt = np.where(nxt < 0, cur, nxt)
+        if np.all(nxt == cur):
+            break
+        cur = nxt
+        path.append(cur)
+    paths = t['xyz'][np.transpose(path)]
+
+    # straight rays, padded with the station as the graph paths are
+    line = np.repeat(rcv[:, None, :], paths.shape[1], axis=1)
+    line[:, 0, :] = src
+    axes = (x, y, z)
+    tg = traveltime(axes, vxyz, paths)
+    ts = traveltime(axes, vxyz, line)
+    paths[ts <= tg] = line[ts <= tg]
+    return paths
+
+
+def traveltime(axes, vxyz, paths):
+    # travel time along the polylines through the block model, as the kernel computes it
+    ray, nb, l = tv.traverse_all(axes, paths)
+    return np.bincount(ray, weights=l / blk.flatten(vxyz)[nb], minlength=len(paths))
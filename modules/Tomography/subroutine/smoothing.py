@@ -0,0 +1,43 @@
+from functools import lru_cache
+import numpy as np
+import scipy.sparse as sp
+
+
+def pairs(shape):
+    # face-adjacent block numbers (a, b) and the axis they are adjacent along,
+    # blocks are numbered like bs.noblok (first axis fastest)
+    idx = np.arange(np.prod(shape)).reshape(shape, order='F')
+    a = []
+    b = []
+    axis = []
+    for n in range(len(shape)):
+        a.append(np.take(idx, range(shape[n] - 1), axis=n).ravel())
+        b.append(np.take(idx, range(1, shape[n]), axis=n).ravel())
+        axis.append(np.full(a[-1].size, n))
+    return np.concatenate(a), np.concatenate(b), np.concatenate(axis)
+
+
+@lru_cache(maxsize=16)
+def gamma(shape, order=2, wh=1.0, wv=1.0):
+    # roughness operator of a (nx, ny[, nz]) grid, the last axis is the vertical one;
+    # order 2 is the block minus the weighted mean of its neighbours, order 1 the
+    # weighted first differences between neighbours. The cached matrix is shared,
+    # callers must not modify it in place.
+    nblok = int(np.prod(shape))
+    a, b, axis = pairs(shape)
+    w = np.where(axis == len(shape) - 1, wv, wh).astype(float)
+    if order == 1:
+        row = np.concatenate([np.arange(a.size), np.arange(a.size)])
+        col = np.concatenate([a, b])
+        val = np.concatenate([-w, w])
+        return sp.coo_matrix((val, (row, col)), shape=(a.size, nblok)).tocsr()
+    if order == 2:
+        row = np.concatenate([a, b])
+        col = np.concatenate([b, a])
+        w = np.concatenate([w, w])
+        wsum = np.bincount(row, weights=w, minlength=nblok)
+        row = np.concatenate([row, np.arange(nblok)])
+        col = np.concatenate([col, np.arange(nblok)])
+        val = np.concatenate([-w / wsum[row[:w.size]], np.ones(nblok)])
+        return sp.coo_matrix((val, (row, col)), shape=(nblok, nblok)).tocsr()
+    raise ValueError('smoothing order must be 1 or 2')
@@ -0,0 +1,86 @@
+import numpy as np
+from numpy.linalg import inv
+import scipy.sparse.linalg as spla
+
+# name of the solver as shown in the GUI and written to the log
+methods = ['INV', 'LSQR', 'LSMR', 'CGLS']
+
+
+def cgls(k, d, tol, maxiter):
+    # conjugate gradient on the normal equations without forming k.T*k
+    ds = np.zeros(k.shape[1])
+    r = d.copy()
+    s = k.T.dot(r)
+    p = s.copy()
+    gamma = s.dot(s)
+    stop = tol * np.sqrt(gamma)
+    for i in range(maxiter):
+        if np.sqrt(gamma) <= stop or gamma == 0:
+            break
+        q = k.dot(p)
+        alpha = gamma / q.dot(q)
+        ds = ds + alpha * p
+        r = r - alpha * q
+        s = k.T.dot(r)
+        gamman = s.dot(s)
+        p = s + (gamman / gamma) * p
+        gamma = gamman
+    return ds
+
+
+def solve(k, d, method='INV', tol=1e-6, maxiter=None):
+    # damped least-squares update ds of k*ds = d, k is the stacked sparse kernel
+    method = method.upper()
+    d = np.asarray(d, dtype=float).ravel()
+    if d.size < k.shape[0]:
+        # the damping and smoothing rows have a zero right-hand side
+        d = np.concatenate([d, np.zeros(k.shape[0] - d.size)])
+    if maxiter is not None and maxiter <= 0:
+        maxiter = None
+    if method == 'INV':
+        return inv(k.T.dot(k).toarray()).dot(k.T.dot(d))
+    if method == 'LSQR':
+        return spla.lsqr(k, d, atol=tol, btol=tol, iter_lim=maxiter)[0]
+    if method == 'LSMR':
+        return spla.lsmr(k, d, atol=tol, btol=tol, maxiter=maxiter)[0]
+    if method == 'CGLS':
+        if maxiter is None:
+            maxiter = 2 * k.shape[1]
+        return cgls(k, d, tol, maxiter)
+    raise ValueError('unknown solver: ' + method)
+
+
+def cgnormal(ata, atb, tol, maxiter):
+    # conjugate gradient on the assembled normal equations ata*ds = atb
+    ds = np.zeros(ata.shape[1])
+    r = atb.copy()
+    p = r.copy()
+    gamma = r.dot(r)
+    stop = tol * np.sqrt(gamma)
+    for i in range(maxiter):
+        if np.sqrt(gamma) <= stop or gamma == 0:
+            break
+        q = ata.dot(p)
+        alpha = gamma / p.dot(q)
+        ds = ds + alpha * p
+        r = r - alpha * q
+        gamman = r.dot(r)
+        p = r + (gamman / gamma) * p
+        gamma = gamman
+    return ds
+
+
+def solve_normal(ata, atb, method='INV', tol=1e-6, maxiter=None):
+    # same update as solve, from the normal equations of the stacked kernel; every
+    # iterative method becomes conjugate gradient here, ata is symmetric positive definite
+    method = method.upper()
+    if method not in methods:
+        raise ValueError('unknown solver: ' + method)
+    if maxiter is not None and maxiter <= 0:
+        maxiter = None
+    atb = np.asarray(atb, dtype=float).ravel()
+    if method == 'INV':
+        return inv(ata.toarray()).dot(atb)
+    if maxiter is None:
+        maxiter = 2 * ata.shape[1]
+    return cgnormal(ata, atb, tol, maxiter)
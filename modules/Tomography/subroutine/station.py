@@ -0,0 +1,35 @@
+import modules.Tomography.subroutine.parameterization as pr
+
+
+def registry(station, deg2km=None):
+    # station code -> (lat, lon, x, y), built once from the split station file.
+    # Without deg2km the two columns are already x, y (2D model files).
+    # A code listed twice keeps its first entry.
+    reg = {}
+    for i in range(len(station)):
+        if station[i] == [] or station[i][0] in reg:
+            continue
+        a = float(station[i][1])
+        b = float(station[i][2])
+        if deg2km is None:
+            reg[station[i][0]] = (a, b, a, b)
+        else:
+            colat, colon = pr.colatlon(a, b)
+            x, y = pr.colatlon2km(colat, colon, deg2km)
+            reg[station[i][0]] = (a, b, x, y)
+    return reg
+
+
+def unknown(event, reg):
+    # codes of picks whose station is not in the registry, in order of first appearance
+    codes = {}
+    for i in range(len(event)):
+        if event[i] != [] and event[i][0] != '#' and event[i][0] not in reg:
+            codes[event[i][0]] = None
+    return list(codes)
+
+
+def report(codes, progress_callback):
+    if codes != []:
+        progress_callback.emit('unknown station, picks skipped: ' + ', '.join(codes))
+    return codes
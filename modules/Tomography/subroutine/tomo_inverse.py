@@ -1,9 +1,32 @@
+import os
 import numpy as np
-# from scipy.linalg import inv
-from numpy.linalg import inv
+import scipy.sparse as sp
 import modules.Tomography.subroutine.parameterization as pr
 import modules.Tomography.subroutine.basic as bs
 import modules.Tomography.subroutine.ray_tracing as ray
+import modules.Tomography.subroutine.kernel as kr
+import modules.Tomography.subroutine.solver as sv
+import modules.Tomography.subroutine.block as blk
+import modules.Tomography.subroutine.smoothing as sm
+import modules.Tomography.subroutine.traversal as tv
+import modules.Tomography.subroutine.bending as bd
+import modules.Tomography.subroutine.parallel as pl
+import modules.Tomography.subroutine.station as st
+import modules.Tomography.subroutine.catalog as ct
+import modules.Tomography.subroutine.eikonal as ek
+import modules.Tomography.subroutine.shortestpath as spm
+import modules.Tomography.subroutine.checkpoint as cp
+import modules.Tomography.subroutine.lcurve as lc
+import modules.Tomography.subroutine.resolution as rs
+import modules.Tomography.subroutine.result as rt
+import modules.Tomography.subroutine.progress as pg
+import modules.Tomography.subroutine.outofcore as oc
+import modules.Tomography.subroutine.incremental as ic
+import modules.Tomography.subroutine.multigrid as mg
+import modules.Tomography.subroutine.adaptive as ad
+import modules.Tomography.subroutine.lookup as lk
+
+engines = ['BENDING','EIKONAL','SHORTEST-PATH']
 
 def iterbending(niter,cacah,x,y,z,vxyz,xs,ys,zs,xr,yr,dvx,dvy,dvz):
 
@@ -78,364 +101,366 @@ def iterbending(niter,cacah,x,y,z,vxyz,xs,ys,zs,xr,yr,dvx,dvy,dvz):
             return xi, yi, zi
     return xi,yi,zi
 
-def inversion(evtfile,statfile,velfile,deg2km,nx,ny,nz,normd,gradd,iter,gr,biter,cacah,progress_callback):
-    progress_callback.emit('load data')
-    file = open(evtfile,'r')
-    event = file.readlines()
-    for i in range(len(event)):
-        event[i] = event[i].split()
-    file.close()
-
+def load(evtfile,statfile,velfile,deg2km,progress_callback):
     file = open(statfile,'r')
     station = file.readlines()
     for i in range(len(station)):
         station[i] = station[i].split()
     file.close()
+    station = st.registry(station,deg2km)
+
+    cat = ct.catalog(evtfile,station,deg2km)
+    st.report(cat.unknown(),progress_callback)
 
     file = open(velfile,'r')
     velocity = file.readlines()
     for i in range(len(velocity)):
         velocity[i] = velocity[i].split()
     file.close()
-
-    progress_callback.emit('parameterization')
-    x,y,z,vxyz = pr.param2(event,station,velocity,deg2km,nx,ny,nz)
-
+    return cat,velocity
+
+def forward(x,y,z,vxyz,src,rcv,biter,cacah,nproc=1,start=None,ttol=0,grad=None,gmode='forward',engine='BENDING',
+            refine=2,progress_callback=None,pool=None,linear=False,dv=None,offset=None):
+    # semua sinar dibengkokkan bersama (atau ditelusuri dari medan eikonal / graf), lalu kernel dan waktu tempuh kalkulasi;
+    # dv: gradien kecepatan yang sudah dihitung untuk vxyz, offset: batas event tiap sinar (catalog.offsets)
+    mon = pg.wrap(progress_callback)
+    engine = engine.upper()
+    ray_ = None
+    with mon.stage('ray tracing'):
+        if engine == 'EIKONAL':
+            paths = ek.forward(x,y,z,vxyz,src,rcv)
+        elif engine == 'SHORTEST-PATH':
+            paths = spm.forward(x,y,z,vxyz,src,rcv,refine)
+        elif engine == 'BENDING':
+            dvx, dvy, dvz = dv if dv is not None else bs.diff_cube(vxyz,x,y,z,grad,gmode)
+            if nproc > 1 and len(src) > 1:
+                # jejak sinar sudah dihitung di tiap proses
+                ray_, nb, l, paths = pl.forward(x,y,z,vxyz,dvx,dvy,dvz,src,rcv,biter,cacah,nproc,start,ttol,
+                                                lambda done: mon.count('ray tracing',done,len(src)),pool,linear,
+                                                offset)
+            else:
+                paths = bd.bend(x,y,z,vxyz,dvx,dvy,dvz,src,rcv,biter,cacah,start=start,ttol=ttol,linear=linear)
+        else:
+            raise ValueError('unknown forward engine: ' + str(engine))
+        if ray_ is None:
+            mon.count('ray tracing',len(src),len(src))
+    with mon.stage('kernel'):
+        if ray_ is None:
+            ray_, nb, l = tv.traverse_all((x,y,z),paths)
+        tcal = np.bincount(ray_,weights=l/blk.flatten(vxyz)[nb],minlength=len(src))
+        kray = kr.assemble(ray_,nb,l,len(src),vxyz.size)
+    return kray,tcal,paths
+
+def step(kray,dtco,vxyz,normd,gradd,solver='INV',tol=1e-6,maxiter=None,smooth=2,wh=1.0,wv=1.0,proj=None):
+    gamma = sm.gamma(vxyz.shape,smooth,wh,wv)
+    if proj is not None:
+        # yang dicari perturbasi tiap sel grid adaptif, semua blok dalam satu sel berubah sama
+        kray = kray.dot(proj)
+        gamma = sp.csr_matrix(gamma).dot(proj)
+    k = kr.damped(kray,normd,gradd,gamma)
+    ds = sv.solve(k,dtco,solver,tol,maxiter)
+    if proj is not None:
+        ds = proj.dot(ds)
+    v0 = blk.flatten(vxyz)
+    return blk.scatter(blk.update(v0,ds),vxyz.shape)
+
+def stream(x,y,z,vxyz,src,rcv,tobs,biter,cacah,budget,nproc=1,start=None,ttol=0,grad=None,gmode='forward',
+           engine='BENDING',refine=2,solver='INV',progress_callback=None,pool=None,linear=False,offset=None):
+    # sinar ditelusuri per potongan event sesuai batas memori; tiap potongan hanya menambah K^T K dan K^T dt
+    # (tanpa tobs hanya waktu tempuh kalkulasi), jadi kernel utuh tidak pernah dibentuk
+    mon = pg.wrap(progress_callback)
+    n = vxyz.size
+    if offset is None:
+        offset = np.arange(len(src) + 1)
+    bounds = oc.chunks(offset,budget,vxyz.shape,cacah,solver,tobs is not None)
+    ata = sp.csr_matrix((n,n))
+    atb = np.zeros(n)
+    tcal = np.zeros(len(src))
+    hits = np.zeros(n)
+    dws = np.zeros(n)
+    # hanya sinar pembengkokan dipakai lagi sebagai geometri awal
+    paths = None
+    dv = None
+    if engine.upper() == 'BENDING':
+        paths = start if start is not None else oc.pathstore(len(src),cacah + 1)
+        # gradien kecepatan cukup sekali untuk semua potongan
+        dv = bs.diff_cube(vxyz,x,y,z,grad,gmode)
+    mon.count('chunked forward modelling',0,len(src))
+    for a, b in zip(bounds[:-1],bounds[1:]):
+        k, tcal[a:b], p = forward(x,y,z,vxyz,src[a:b],rcv[a:b],biter,cacah,nproc,None if start is None else start[a:b],
+                                  ttol,grad,gmode,engine,refine,mon,pool,linear,dv,ct.window(offset,a,b))
+        with mon.stage('kernel'):
+            if tobs is not None:
+                ata = ata + k.T.dot(k)
+                atb = atb + k.T.dot(tobs[a:b] - tcal[a:b])
+            hits = hits + np.bincount(k.indices,minlength=n)
+            dws = dws + np.asarray(k.sum(axis=0)).ravel()
+        if paths is not None:
+            paths[a:b] = p
+        mon.count('chunked forward modelling',int(b),len(src))
+    return ata,atb,tcal,(blk.scatter(hits,vxyz.shape),blk.scatter(dws,vxyz.shape)),paths
+
+def traveltime(x,y,z,vxyz,src,rcv,biter,cacah,nproc=1,ttol=0,gmode='forward',engine='BENDING',refine=2,budget=None,
+               progress_callback=None,pool=None,linear=False,offset=None):
+    # waktu tempuh kalkulasi semua sinar, per potongan bila ada batas memori
+    if budget:
+        return stream(x,y,z,vxyz,src,rcv,None,biter,cacah,budget,nproc,None,ttol,None,gmode,engine,refine,
+                      progress_callback=progress_callback,pool=pool,linear=linear,offset=offset)[2]
+    return forward(x,y,z,vxyz,src,rcv,biter,cacah,nproc,ttol=ttol,gmode=gmode,engine=engine,refine=refine,
+                   progress_callback=progress_callback,pool=pool,linear=linear,offset=offset)[1]
+
+def step_normal(ata,atb,vxyz,normd,gradd,solver='INV',tol=1e-6,maxiter=None,smooth=2,wh=1.0,wv=1.0,proj=None):
+    gamma = sm.gamma(vxyz.shape,smooth,wh,wv)
+    if proj is not None:
+        ata = proj.T.dot(ata).dot(proj)
+        atb = proj.T.dot(atb)
+        gamma = sp.csr_matrix(gamma).dot(proj)
+    a = kr.normal(ata,normd,gradd,gamma)
+    ds = sv.solve_normal(a,atb,solver,tol,maxiter)
+    if proj is not None:
+        ds = proj.dot(ds)
+    v0 = blk.flatten(vxyz)
+    return blk.scatter(blk.update(v0,ds),vxyz.shape)
+
+def invert(x,y,z,vxyz,src,rcv,tobs,normd,gradd,iter,biter,cacah,progress_callback,solver='INV',tol=1e-6,maxiter=None,
+           smooth=2,wh=1.0,wv=1.0,nproc=1,ttol=0,gmode='forward',engine='BENDING',refine=2,checkpoint=None,resume=False,
+           result=None,velr=None,budget=None,state=None,minhits=0,depth=3,pool=None,linear=False,offset=None,levels=1):
+    progress_callback = pg.wrap(progress_callback)
     rms = np.zeros(iter)
-    for niter in range(iter):
-        dvx, dvy, dvz = bs.diff_cube(vxyz,x,y,z)
-
-        # membuat kernel
-        ntr = 0
-        for i in range(len(event)):
-            if event[i] != [] and event[i][0] != '#' and event[i][-1] == 'P':
-                ntr = ntr + 1
-
-        k = np.zeros((ntr+vxyz.size+vxyz.size,vxyz.size))
-        tcal = np.zeros((ntr+vxyz.size+vxyz.size,1))
-        tobs = np.zeros((ntr+vxyz.size+vxyz.size,1))
-
-        i = 0
-        tri = 0
-        evi = 0
-        while i < len(event):
-            if event[i] != []:
-                if event[i][0] == '#':
-                    progress_callback.emit('iteration i-th: ' + str(niter+1) + ', forward modelling -> ' +'event i-th: ' + str(evi+1) + ', event ID: ' + str(event[i][-1]))
-                    lats = float(event[i][7])
-                    lons = float(event[i][8])
-                    zs = float(event[i][9])
-                    colats, colons = pr.colatlon(lats, lons)
-                    xs, ys = pr.colatlon2km(colats, colons, deg2km)
-                    r = i + 1
-                    if r < len(event):
-                        while r <len(event) and event[r][0] != '#' and event[r][-1] == 'P':
-                            # print(event[r])
-                            tobs[tri,0] = float(event[r][1])
-                            j = 0
-                            while j < len(station):
-                                if event[r][0] == station[j][0]:
-                                    latr = float(station[j][1])
-                                    lonr = float(station[j][2])
-                                    colatr, colonr = pr.colatlon(latr, lonr)
-                                    xr, yr = pr.colatlon2km(colatr, colonr, deg2km)
-                                    xi,yi,zi = iterbending(biter,cacah,x,y,z,vxyz,xs,ys,zs,xr,yr,dvx,dvy,dvz)
-                                    #---------------------
-                                    for g in range(len(xi)-1):
-                                        o1, p1, q1 = bs.index(x, y, z, xi[g], yi[g], zi[g])
-                                        o2, p2, q2 = bs.index(x, y, z, xi[g+1], yi[g+1], zi[g+1])
-                                        ngr = np.abs(o2-o1)+np.abs(p2-p1)+np.abs(q2-q1)+1
-                                        lgr = gr*ngr
-                                        xsp = np.linspace(xi[g],xi[g+1],int(lgr))
-                                        ysp = np.linspace(yi[g],yi[g+1],int(lgr))
-                                        zsp = np.linspace(zi[g],zi[g+1],int(lgr))
-                                        for ii in range(lgr-1):
-                                            l = np.sqrt(
-                                                pow(xsp[ii] - xsp[ii+1], 2) + pow(ysp[ii] - ysp[ii+1], 2) + pow(zsp[ii] - zsp[ii+1], 2))
-                                            oi, pi, qi = bs.index(x, y, z, xsp[ii], ysp[ii], zsp[ii])
-                                            dtc = l/vxyz[oi,pi,qi]
-                                            nb = bs.noblok(oi, pi, qi, nx, ny)
-                                            k[tri, nb] = k[tri, nb] + l
-                                            tcal[tri,0] = tcal[tri,0] + dtc
-                                j = j + 1
-                            tri = tri + 1
-                            r = r + 1
-                    evi = evi + 1
-            i = i + 1
+    # sinar iterasi sebelumnya menjadi geometri awal pembengkokan berikutnya
+    paths = None
+    kray = None
+    cover = None
+    vlin = None
+    cell = None
+    proj = None
+    grad = (np.zeros(vxyz.shape),np.zeros(vxyz.shape),np.zeros(vxyz.shape))
+
+    # parameter yang harus sama untuk melanjutkan dari checkpoint (iter boleh ditambah)
+    params = dict(shape=list(vxyz.shape),normd=normd,gradd=gradd,biter=biter,cacah=cacah,solver=solver,tol=tol,
+                  maxiter=maxiter,smooth=smooth,wh=wh,wv=wv,ttol=ttol,gmode=gmode,engine=engine,refine=refine,
+                  nray=len(tobs),tobs=float(np.sum(tobs)),minhits=minhits,depth=depth,linear=linear,levels=levels)
+    first = 0
+    if resume and checkpoint is not None and os.path.exists(checkpoint):
+        ckpt = cp.load(checkpoint)
+        cp.check(ckpt,params)
+        first = ckpt['niter'] + 1
+        vxyz = ckpt['vxyz']
+        paths = ckpt['paths']
+        n = min(len(ckpt['rms']),iter)
+        rms[:n] = ckpt['rms'][:n]
+        progress_callback.emit('resume from checkpoint, ' + str(first) + ' iterations done')
+        if ckpt['stopped']:
+            store(result,params,x,y,z,vxyz,rms[:first],kray,velr,progress_callback,cover)
+            return vxyz,rms[:first]
+
+    for niter in range(first,iter):
+        progress_callback.emit('iteration i-th: ' + str(niter + 1) + ', forward modelling -> ' + str(len(tobs)) + ' rays')
+        vlin = vxyz
+        if budget:
+            ata, atb, tcal, cover, paths = stream(x,y,z,vxyz,src,rcv,tobs,biter,cacah,budget,nproc,paths,ttol,grad,
+                                                  gmode,engine,refine,solver,progress_callback,pool,linear,offset)
+        else:
+            kray, tcal, paths = forward(x,y,z,vxyz,src,rcv,biter,cacah,nproc,paths,ttol,grad,gmode,engine,refine,
+                                        progress_callback,pool,linear,offset=offset)
+
+        if minhits > 0 and cell is None:
+            # sel grid adaptif dari jumlah sinar forward pertama, tetap untuk iterasi berikutnya
+            cell = ad.cells(rs.hitcount(kray,vxyz.shape) if kray is not None else cover[0],minhits,depth)
+            proj = ad.projection(cell)
+            progress_callback.emit('adaptive grid -> ' + str(proj.shape[1]) + ' cells of ' + str(vxyz.size) +
+                                   ' blocks')
 
         progress_callback.emit('iteration i-th: ' + str(niter + 1) + ', inversion')
-        dtco = tobs-tcal
+        dtco = tobs - tcal
         rms[niter] = np.sum(np.power(dtco,2))
 
-        iden = np.eye(vxyz.size)
-        k[ntr:ntr+vxyz.size,0::] = normd*iden
-
-        gamma = np.zeros((vxyz.size,vxyz.size))
-        n = 0
-        for i in range(nx):
-            for j in range(ny):
-                for kk in range(nz):
-                    pem = 0
-                    if i - 1 >= 0:
-                        nb = bs.noblok(i-1, j, kk, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if i + 1 < nx:
-                        nb = bs.noblok(i+1, j, kk, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if j - 1 >= 0:
-                        nb = bs.noblok(i, j-1, kk, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if j + 1 < ny:
-                        nb = bs.noblok(i, j+1, kk, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if kk - 1 >= 0:
-                        nb = bs.noblok(i, j, kk-1, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if kk + 1 < nz:
-                        nb = bs.noblok(i, j, kk+1, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    gamma[n,:] = gamma[n,:]/pem
-                    nb = bs.noblok(i, j, kk, nx, ny)
-                    gamma[n, nb] = 1
-                    n = n + 1
-
-        k[(ntr+vxyz.size)::,0::] = gradd*gamma
-
-
-        # inversion
-        ds = np.mat(inv(np.mat(k.transpose())*np.mat(k)))*np.mat(k.transpose())*np.mat(dtco)
-        dv = np.zeros(vxyz.size)
-
-        v0 = np.zeros(vxyz.size)
-        for i in range(nx):
-            for j in range(ny):
-                for kk in range(nz):
-                    nb = bs.noblok(i, j, kk, nx, ny)
-                    v0[nb] = vxyz[i,j,kk]
-
-        for i in range(vxyz.size):
-            dv[i] = (-1*ds[i]*(v0[i]**2))/(1+ds[i]*v0[i])
-
-        v1 = np.zeros(vxyz.size)
-        for jj in range(len(v1)):
-            v1[jj] = v0[jj] + dv[jj]
-
-        vxyzn = np.zeros(vxyz.shape)
-
-        for ii in range(len(v1)):
-            for i in range(nx):
-                for j in range(ny):
-                    for kk in range(nz):
-                        nb = bs.noblok(i, j, kk, nx, ny)
-                        if ii == nb:
-                            vxyzn[i, j, kk] = v1[ii]
-        if vxyzn.min() >= 0:
+        with progress_callback.stage('solve'):
+            if budget:
+                vxyzn = step_normal(ata,atb,vxyz,normd,gradd,solver,tol,maxiter,smooth,wh,wv,proj)
+            else:
+                vxyzn = step(kray,dtco,vxyz,normd,gradd,solver,tol,maxiter,smooth,wh,wv,proj)
+        stopped = vxyzn.min() < 0
+        if not stopped:
             vxyz = vxyzn
-        else:
+        if checkpoint is not None:
+            with progress_callback.stage('write'):
+                cp.save(checkpoint,niter,x,y,z,vxyz,rms[:niter + 1],paths,params,stopped)
+        if stopped:
+            progress_callback.emit('iteration i-th: ' + str(niter + 1) + ', negative velocity -> stopped, ' +
+                                   ('starting model kept' if niter == 0 else 'model of iteration ' + str(niter) +
+                                    ' kept'))
             break
-
-    return x,y,z,vxyz,rms
-
-def inversionS(evtfile,statfile,velfile,deg2km,nx,ny,nz,normd,gradd,iter,gr,biter,cacah,progress_callback):
-    progress_callback.emit('load data')
-    file = open(evtfile,'r')
-    event = file.readlines()
-    for i in range(len(event)):
-        event[i] = event[i].split()
-    file.close()
-
-    file = open(statfile,'r')
-    station = file.readlines()
-    for i in range(len(station)):
-        station[i] = station[i].split()
-    file.close()
-
-    file = open(velfile,'r')
-    velocity = file.readlines()
-    for i in range(len(velocity)):
-        velocity[i] = velocity[i].split()
-    file.close()
-
-    progress_callback.emit('parameterization')
-    x,y,z,vxyz = pr.paramS(event,station,velocity,deg2km,nx,ny,nz)
+    store(result,params,x,y,z,vxyz,rms,kray,velr,progress_callback,cover,cell)
+    if state is not None and vlin is not None:
+        # persamaan normal forward terakhir disimpan untuk pembaruan dengan event baru
+        with progress_callback.stage('write'):
+            if not budget:
+                ata = kray.T.dot(kray)
+                atb = kray.T.dot(dtco)
+                cover = (rs.hitcount(kray,vxyz.shape),rs.dws(kray,vxyz.shape))
+            ic.save(state,x,y,z,vxyz,vlin,ata,atb,rms[niter],cover[0],cover[1],
+                    paths if engine.upper() == 'BENDING' else None,frozen(params),len(tobs),np.sum(tobs),cell)
+    return vxyz,rms
+
+def multilevel(x,y,z,vxyz,src,rcv,tobs,normd,gradd,iter,biter,cacah,progress_callback,solver='INV',tol=1e-6,
+               maxiter=None,smooth=2,wh=1.0,wv=1.0,nproc=1,ttol=0,gmode='forward',engine='BENDING',refine=2,
+               checkpoint=None,resume=False,result=None,velr=None,budget=None,state=None,levels=1,lscale=1.0,
+               minhits=0,depth=3,pool=None,linear=False,offset=None):
+    # iterasi awal pada grid kasar, model diinterpolasi trilinear ke grid berikutnya sampai grid x, y, z;
+    # checkpoint, hasil dan state hanya untuk grid akhir
+    progress_callback = pg.wrap(progress_callback)
+    levels = max(int(levels),1)
+    shapes = mg.shapes(vxyz.shape,levels)
+    niters = mg.iterations(iter,levels)
+    damps = mg.damping(normd,gradd,lscale,levels)
+    # run yang dilanjutkan dari checkpoint sudah berada di grid akhir
+    if resume and checkpoint is not None and os.path.exists(checkpoint):
+        niters[:-1] = [0] * (levels - 1)
+
+    rms = []
+    xl, yl, zl, vl = x, y, z, vxyz
+    for level in range(levels - 1):
+        if niters[level] == 0:
+            continue
+        xn, yn, zn = mg.axes(x,y,z,shapes[level])
+        vl = mg.resample(xl,yl,zl,vl,xn,yn,zn)
+        xl, yl, zl = xn, yn, zn
+        progress_callback.emit('grid level ' + str(level + 1) + '/' + str(levels) + ' -> ' +
+                               ' x '.join(str(n) for n in shapes[level]) + ' blocks, ' + str(niters[level]) +
+                               ' iterations')
+        vl, r = invert(xl,yl,zl,vl,src,rcv,tobs,damps[level][0],damps[level][1],niters[level],biter,cacah,
+                       progress_callback,solver,tol,maxiter,smooth,wh,wv,nproc,ttol,gmode,engine,refine,
+                       budget=budget,minhits=minhits,depth=depth,pool=pool,linear=linear,offset=offset)
+        rms.append(r)
+    if rms != []:
+        vxyz = mg.resample(xl,yl,zl,vl,x,y,z)
+        progress_callback.emit('grid level ' + str(levels) + '/' + str(levels) + ' -> ' +
+                               ' x '.join(str(n) for n in vxyz.shape) + ' blocks, ' + str(niters[-1]) + ' iterations')
+    vxyz, r = invert(x,y,z,vxyz,src,rcv,tobs,normd,gradd,niters[-1],biter,cacah,progress_callback,solver,tol,maxiter,
+                     smooth,wh,wv,nproc,ttol,gmode,engine,refine,checkpoint,resume,result,velr,budget,state,minhits,
+                     depth,pool,linear,offset,levels)
+    rms.append(r)
+    return vxyz,np.concatenate(rms)
+
+def workers(nproc,engine):
+    # jumlah proses pool: hanya pembengkokan yang dibagi ke banyak proses
+    return nproc if engine.upper() == 'BENDING' else 1
+
+def frozen(params):
+    # pengaturan forward yang menentukan kernel yang disimpan, dan grid (sel adaptif, tingkat grid) tempat ia diselesaikan
+    return {key: params[key] for key in ['shape','biter','cacah','ttol','gmode','engine','refine','linear',
+                                      'minhits','depth','levels']}
+
+def increment(state,src,rcv,tobs,normd,gradd,iter,biter,cacah,progress_callback,solver='INV',tol=1e-6,maxiter=None,
+              smooth=2,wh=1.0,wv=1.0,nproc=1,ttol=0,gmode='forward',engine='BENDING',refine=2,result=None,budget=None,
+              pool=None,linear=False,offset=None,levels=1,minhits=0,depth=3):
+    # hanya sinar dari pick baru yang ditelusuri; bagian sinar lama dari persamaan normal yang disimpan,
+    # dimulai dari model run sebelumnya (grid juga tetap grid run sebelumnya)
+    progress_callback = pg.wrap(progress_callback)
+    if iter < 1:
+        raise ValueError('an update needs at least one iteration')
+    with progress_callback.stage('load'):
+        old = ic.load(state)
+    x, y, z, vxyz = old['x'], old['y'], old['z'], old['vxyz']
+    params = dict(shape=list(vxyz.shape),normd=normd,gradd=gradd,biter=biter,cacah=cacah,solver=solver,tol=tol,
+                  maxiter=maxiter,smooth=smooth,wh=wh,wv=wv,ttol=ttol,gmode=gmode,engine=engine,refine=refine,
+                  nray=len(tobs),tobs=float(np.sum(tobs)),linear=linear,levels=levels,minhits=minhits,depth=depth)
+    ic.check(old,frozen(params),tobs)
+    n = old['nray']
+    if len(tobs) == n:
+        progress_callback.emit('update -> no new picks since the last run')
+        return x,y,z,vxyz,np.array([old['btb']])
+    srcn, rcvn, tobsn = src[n:], rcv[n:], tobs[n:]
+    offsetn = None if offset is None else ct.window(offset,n,len(tobs))
+    outside(x,y,z,srcn,rcvn,n,offset)
 
     rms = np.zeros(iter)
+    paths = None
+    grad = (np.zeros(vxyz.shape),np.zeros(vxyz.shape),np.zeros(vxyz.shape))
+    # sel grid adaptif run sebelumnya tetap dipakai
+    cell = old['cell']
+    proj = None if cell is None else ad.projection(cell)
     for niter in range(iter):
-        dvx, dvy, dvz = bs.diff_cube(vxyz,x,y,z)
-
-        # membuat kernel
-        ntr = 0
-        for i in range(len(event)):
-            if event[i] != [] and event[i][0] != '#' and event[i][-1] == 'S':
-                ntr = ntr + 1
-
-        k = np.zeros((ntr+vxyz.size+vxyz.size,vxyz.size))
-        tcal = np.zeros((ntr+vxyz.size+vxyz.size,1))
-        tobs = np.zeros((ntr+vxyz.size+vxyz.size,1))
-
-        i = 0
-        tri = 0
-        evi = 0
-        while i < len(event):
-            if event[i] != []:
-                if event[i][0] == '#':
-                    progress_callback.emit(
-                        'iteration i-th: ' + str(niter + 1) + ', forward modelling -> ' + 'event i-th: ' + str(
-                            evi + 1) + ', event ID: ' + str(event[i][-1]))
-                    lats = float(event[i][7])
-                    lons = float(event[i][8])
-                    zs = float(event[i][9])
-                    colats, colons = pr.colatlon(lats, lons)
-                    xs, ys = pr.colatlon2km(colats, colons, deg2km)
-                    r = i + 1
-                    if r < len(event):
-                        while r <len(event) and event[r][0] != '#' and event[r][-1] == 'S':
-                            tobs[tri,0] = float(event[r][1])
-                            j = 0
-                            while j < len(station):
-                                if event[r][0] == station[j][0]:
-                                    latr = float(station[j][1])
-                                    lonr = float(station[j][2])
-                                    colatr, colonr = pr.colatlon(latr, lonr)
-                                    xr, yr = pr.colatlon2km(colatr, colonr, deg2km)
-                                    xi,yi,zi = iterbending(biter,cacah,x,y,z,vxyz,xs,ys,zs,xr,yr,dvx,dvy,dvz)
-                                    #---------------------
-                                    for g in range(len(xi)-1):
-                                        o1, p1, q1 = bs.index(x, y, z, xi[g], yi[g], zi[g])
-                                        o2, p2, q2 = bs.index(x, y, z, xi[g+1], yi[g+1], zi[g+1])
-                                        ngr = np.abs(o2-o1)+np.abs(p2-p1)+np.abs(q2-q1)+1
-                                        lgr = gr*ngr
-                                        xsp = np.linspace(xi[g],xi[g+1],int(lgr))
-                                        ysp = np.linspace(yi[g],yi[g+1],int(lgr))
-                                        zsp = np.linspace(zi[g],zi[g+1],int(lgr))
-                                        for ii in range(lgr-1):
-                                            l = np.sqrt(
-                                                pow(xsp[ii] - xsp[ii+1], 2) + pow(ysp[ii] - ysp[ii+1], 2) + pow(zsp[ii] - zsp[ii+1], 2))
-                                            oi, pi, qi = bs.index(x, y, z, xsp[ii], ysp[ii], zsp[ii])
-                                            dtc = l/vxyz[oi,pi,qi]
-                                            nb = bs.noblok(oi, pi, qi, nx, ny)
-                                            k[tri, nb] = k[tri, nb] + l
-                                            tcal[tri,0] = tcal[tri,0] + dtc
-                                j = j + 1
-                            tri = tri + 1
-                            r = r + 1
-                    evi = evi + 1
-            i = i + 1
-
-        progress_callback.emit('iteration i-th: ' + str(niter + 1) + ', inversion')
-        dtco = tobs-tcal
-        rms[niter] = np.sum(np.power(dtco,2))
-
-        iden = np.eye(vxyz.size)
-        k[ntr:ntr+vxyz.size,0::] = normd*iden
-
-        gamma = np.zeros((vxyz.size,vxyz.size))
-        n = 0
-        for i in range(nx):
-            for j in range(ny):
-                for kk in range(nz):
-                    pem = 0
-                    if i - 1 >= 0:
-                        nb = bs.noblok(i-1, j, kk, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if i + 1 < nx:
-                        nb = bs.noblok(i+1, j, kk, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if j - 1 >= 0:
-                        nb = bs.noblok(i, j-1, kk, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if j + 1 < ny:
-                        nb = bs.noblok(i, j+1, kk, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if kk - 1 >= 0:
-                        nb = bs.noblok(i, j, kk-1, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if kk + 1 < nz:
-                        nb = bs.noblok(i, j, kk+1, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    gamma[n,:] = gamma[n,:]/pem
-                    nb = bs.noblok(i, j, kk, nx, ny)
-                    gamma[n, nb] = 1
-                    n = n + 1
-
-        k[(ntr+vxyz.size)::,0::] = gradd*gamma
-
-
-        # inversion
-        ds = np.mat(inv(np.mat(k.transpose())*np.mat(k)))*np.mat(k.transpose())*np.mat(dtco)
-        dv = np.zeros(vxyz.size)
-
-        v0 = np.zeros(vxyz.size)
-        for i in range(nx):
-            for j in range(ny):
-                for kk in range(nz):
-                    nb = bs.noblok(i, j, kk, nx, ny)
-                    v0[nb] = vxyz[i,j,kk]
-
-        for i in range(vxyz.size):
-            dv[i] = (-1*ds[i]*(v0[i]**2))/(1+ds[i]*v0[i])
-
-        v1 = np.zeros(vxyz.size)
-        for jj in range(len(v1)):
-            v1[jj] = v0[jj] + dv[jj]
-
-        vxyzn = np.zeros(vxyz.shape)
-
-        for ii in range(len(v1)):
-            for i in range(nx):
-                for j in range(ny):
-                    for kk in range(nz):
-                        nb = bs.noblok(i, j, kk, nx, ny)
-                        if ii == nb:
-                            vxyzn[i, j, kk] = v1[ii]
-        if vxyzn.min() >= 0:
-            vxyz = vxyzn
+        progress_callback.emit('update i-th: ' + str(niter + 1) + ', forward modelling -> ' + str(len(tobsn)) +
+                               ' new rays')
+        vlin = vxyz
+        if budget:
+            ata, atb, tcal, cover, paths = stream(x,y,z,vxyz,srcn,rcvn,tobsn,biter,cacah,budget,nproc,paths,ttol,grad,
+                                                  gmode,engine,refine,solver,progress_callback,pool,linear,offsetn)
         else:
+            kray, tcal, paths = forward(x,y,z,vxyz,srcn,rcvn,biter,cacah,nproc,paths,ttol,grad,gmode,engine,refine,
+                                        progress_callback,pool,linear,offset=offsetn)
+            ata = kray.T.dot(kray)
+            atb = kray.T.dot(tobsn - tcal)
+            cover = (rs.hitcount(kray,vxyz.shape),rs.dws(kray,vxyz.shape))
+
+        progress_callback.emit('update i-th: ' + str(niter + 1) + ', inversion')
+        atbo, btbo = ic.shift(old,vxyz)
+        ata = old['ata'] + ata
+        atb = atbo + atb
+        rms[niter] = btbo + np.sum(np.power(tobsn - tcal,2))
+
+        with progress_callback.stage('solve'):
+            vxyzn = step_normal(ata,atb,vxyz,normd,gradd,solver,tol,maxiter,smooth,wh,wv,proj)
+        stopped = vxyzn.min() < 0
+        if not stopped:
+            vxyz = vxyzn
+        if stopped:
+            progress_callback.emit('update i-th: ' + str(niter + 1) + ', negative velocity -> stopped, ' +
+                                   ('model of the earlier run kept' if niter == 0 else
+                                    'model of update ' + str(niter) + ' kept'))
             break
 
-    return x,y,z,vxyz,rms
-
-def inversion_test(evtfile,statfile,velfile,deg2km,nx,ny,nz,normd,gradd,iter,gr,biter,cacah,pert,progress_callback):
-    progress_callback.emit('load data')
-    file = open(evtfile,'r')
-    event = file.readlines()
-    for i in range(len(event)):
-        event[i] = event[i].split()
-    file.close()
-
-    file = open(statfile,'r')
-    station = file.readlines()
-    for i in range(len(station)):
-        station[i] = station[i].split()
-    file.close()
-
-    file = open(velfile,'r')
-    velocity = file.readlines()
-    for i in range(len(velocity)):
-        velocity[i] = velocity[i].split()
-    file.close()
-
-    progress_callback.emit('parameterization')
-    x,y,z,vxyz = pr.param2(event,station,velocity,deg2km,nx,ny,nz)
-
+    hits = old['hits'] + cover[0]
+    dws = old['dws'] + cover[1]
+    store(result,params,x,y,z,vxyz,rms[:niter + 1],None,None,progress_callback,(hits,dws),cell)
+    with progress_callback.stage('write'):
+        if engine.upper() == 'BENDING' and old['paths'] is not None:
+            paths = np.concatenate([old['paths'],paths])
+        else:
+            paths = None
+        ic.save(state,x,y,z,vxyz,vlin,ata,atb,rms[niter],hits,dws,paths,frozen(params),len(tobs),np.sum(tobs),cell)
+    return x,y,z,vxyz,rms[:niter + 1]
+
+def outside(x,y,z,src,rcv,first=0,offset=None):
+    # sinar baru harus berada di dalam grid yang disimpan; nomor event (urutan berkas) yang keluar grid dilaporkan
+    inside = lk.locate((x,y,z),src)[1] & lk.locate((x,y,z),rcv)[1]
+    if np.all(inside):
+        return
+    ray_ = first + np.nonzero(~inside)[0]
+    if offset is None:
+        name, number = 'pick', ray_ + 1
+    else:
+        name, number = 'event', np.unique(np.searchsorted(offset,ray_,side='right') - 1) + 1
+    raise ValueError('new ' + name + ('s ' if len(number) > 1 else ' ') + ', '.join(str(a) for a in number) +
+                     ' of the catalog outside the grid of the earlier run, an update can not cover them; '
+                     'run a full inversion instead')
+
+def store(result,params,x,y,z,vxyz,rms,kray,velr=None,progress_callback=None,cover=None,cell=None):
+    # hasil satu run dalam satu berkas, kerapatan sinar dari kernel forward terakhir, dengan waktu tiap tahap
+    if result is None:
+        return
+    mon = pg.wrap(progress_callback)
+    with mon.stage('write'):
+        arrays = dict(x=x,y=y,z=z,vel=vxyz,rms=rms)
+        if kray is not None:
+            arrays.update(hits=rs.hitcount(kray,vxyz.shape),dws=rs.dws(kray,vxyz.shape))
+        elif cover is not None:
+            arrays.update(hits=cover[0],dws=cover[1])
+        if velr is not None:
+            arrays.update(velr=velr)
+        if cell is not None:
+            # nomor sel tiap blok dan model rata-rata sel, resolusi parameterisasi adaptif
+            arrays.update(cell=blk.scatter(cell,vxyz.shape),vcell=ad.expand(ad.reduce(vxyz,cell),cell,vxyz.shape))
+        rt.write(result,dict(params,timing=mon.times),**arrays)
+
+def checkerboard(vxyz,pert):
     perturbation = pert
     vmean = np.ceil(np.mean(vxyz))
-    vel = np.ones(vxyz.shape)*vmean
-    vxyz = vel
+    nx, ny = vxyz.shape[0], vxyz.shape[1]
 
-    velr = np.zeros(vel.shape)
+    velr = np.zeros(vxyz.shape)
     for i in range(velr.shape[0]):
         for j in range(velr.shape[1]):
             for k in range(velr.shape[2]):
@@ -444,453 +469,184 @@ def inversion_test(evtfile,statfile,velfile,deg2km,nx,ny,nz,normd,gradd,iter,gr,
                     velr[i,j,k] = vmean + vmean*perturbation
                 else:
                     velr[i, j, k] = vmean - vmean * perturbation
+    return np.ones(vxyz.shape)*vmean,velr
 
-    dvxr, dvyr, dvzr = bs.diff_cube(velr, x, y, z)
-    # membuat kernel
-    ntr = 0
-    for i in range(len(event)):
-        if event[i] != [] and event[i][0] != '#' and event[i][-1] == 'P':
-            ntr = ntr + 1
-
-    k = np.zeros((ntr + vxyz.size + vxyz.size, vxyz.size))
-    tobs = np.zeros((ntr + vxyz.size + vxyz.size, 1))
-
-    i = 0
-    tri = 0
-    evi = 0
-    while i < len(event):
-        if event[i] != []:
-            if event[i][0] == '#':
-                progress_callback.emit(
-                    'creating t obs -> ' + 'event i-th: ' + str(
-                        evi + 1) + ', event ID: ' + str(event[i][-1]))
-                lats = float(event[i][7])
-                lons = float(event[i][8])
-                zs = float(event[i][9])
-                colats, colons = pr.colatlon(lats, lons)
-                xs, ys = pr.colatlon2km(colats, colons, deg2km)
-                r = i + 1
-                if r < len(event):
-                    while r < len(event) and event[r][0] != '#' and event[r][-1] == 'P':
-                        j = 0
-                        while j < len(station):
-                            if event[r][0] == station[j][0]:
-                                latr = float(station[j][1])
-                                lonr = float(station[j][2])
-                                colatr, colonr = pr.colatlon(latr, lonr)
-                                xr, yr = pr.colatlon2km(colatr, colonr, deg2km)
-                                xir, yir, zir = iterbending(biter, cacah, x, y, z, velr, xs, ys, zs, xr, yr, dvxr, dvyr,
-                                                            dvzr)
-                                # ---------------------
-                                for g in range(len(xir) - 1):
-                                    o1, p1, q1 = bs.index(x, y, z, xir[g], yir[g], zir[g])
-                                    o2, p2, q2 = bs.index(x, y, z, xir[g + 1], yir[g + 1], zir[g + 1])
-                                    ngr = np.abs(o2 - o1) + np.abs(p2 - p1) + np.abs(q2 - q1) + 1
-                                    lgr = gr * ngr
-                                    xsp = np.linspace(xir[g], xir[g + 1], int(lgr))
-                                    ysp = np.linspace(yir[g], yir[g + 1], int(lgr))
-                                    zsp = np.linspace(zir[g], zir[g + 1], int(lgr))
-                                    for ii in range(lgr - 1):
-                                        l = np.sqrt(
-                                            pow(xsp[ii] - xsp[ii + 1], 2) + pow(ysp[ii] - ysp[ii + 1], 2) + pow(
-                                                zsp[ii] - zsp[ii + 1], 2))
-                                        oi, pi, qi = bs.index(x, y, z, xsp[ii], ysp[ii], zsp[ii])
-                                        dtc = l / vxyz[oi, pi, qi]
-                                        nb = bs.noblok(oi, pi, qi, nx, ny)
-                                        k[tri, nb] = k[tri, nb] + l
-                                        tobs[tri, 0] = tobs[tri, 0] + dtc
-                            j = j + 1
-                        tri = tri + 1
-                        r = r + 1
-                evi = evi + 1
-        i = i + 1
-
-    rms = np.zeros(iter)
-    for niter in range(iter):
-        print(niter)
-        dvx, dvy, dvz = bs.diff_cube(vxyz,x,y,z)
-        # dvxr, dvyr, dvzr = bs.diff_cube(velr, x, y, z)
-
-        # membuat kernel
-        ntr = 0
-        for i in range(len(event)):
-            if event[i] != [] and event[i][0] != '#' and event[i][-1] == 'P':
-                ntr = ntr + 1
-
-        k = np.zeros((ntr+vxyz.size+vxyz.size,vxyz.size))
-        tcal = np.zeros((ntr+vxyz.size+vxyz.size,1))
-        # tobs = np.zeros((ntr+vxyz.size+vxyz.size,1))
-
-        i = 0
-        tri = 0
-        evi = 0
-        while i < len(event):
-            if event[i] != []:
-                if event[i][0] == '#':
-                    progress_callback.emit(
-                        'iteration i-th: ' + str(niter + 1) + ', forward modelling -> ' + 'event i-th: ' + str(
-                            evi + 1) + ', event ID: ' + str(event[i][-1]))
-                    lats = float(event[i][7])
-                    lons = float(event[i][8])
-                    zs = float(event[i][9])
-                    colats, colons = pr.colatlon(lats, lons)
-                    xs, ys = pr.colatlon2km(colats, colons, deg2km)
-                    r = i + 1
-                    if r < len(event):
-                        while r <len(event) and event[r][0] != '#' and event[r][-1] == 'P':
-                            # tobs[tri,0] = float(event[r][1])
-                            j = 0
-                            while j < len(station):
-                                if event[r][0] == station[j][0]:
-                                    latr = float(station[j][1])
-                                    lonr = float(station[j][2])
-                                    colatr, colonr = pr.colatlon(latr, lonr)
-                                    xr, yr = pr.colatlon2km(colatr, colonr, deg2km)
-                                    xir, yir, zir = iterbending(biter, cacah, x, y, z, velr, xs, ys, zs, xr, yr, dvxr, dvyr,
-                                                             dvzr)
-                                    xi,yi,zi = iterbending(biter,cacah,x,y,z,vxyz,xs,ys,zs,xr,yr,dvx,dvy,dvz)
-                                    #---------------------
-                                    for g in range(len(xi)-1):
-                                        o1, p1, q1 = bs.index(x, y, z, xi[g], yi[g], zi[g])
-                                        o2, p2, q2 = bs.index(x, y, z, xi[g+1], yi[g+1], zi[g+1])
-                                        ngr = np.abs(o2-o1)+np.abs(p2-p1)+np.abs(q2-q1)+1
-                                        lgr = gr*ngr
-                                        xsp = np.linspace(xi[g],xi[g+1],int(lgr))
-                                        ysp = np.linspace(yi[g],yi[g+1],int(lgr))
-                                        zsp = np.linspace(zi[g],zi[g+1],int(lgr))
-                                        for ii in range(lgr-1):
-                                            l = np.sqrt(
-                                                pow(xsp[ii] - xsp[ii+1], 2) + pow(ysp[ii] - ysp[ii+1], 2) + pow(zsp[ii] - zsp[ii+1], 2))
-                                            oi, pi, qi = bs.index(x, y, z, xsp[ii], ysp[ii], zsp[ii])
-                                            dtc = l/vxyz[oi,pi,qi]
-                                            nb = bs.noblok(oi, pi, qi, nx, ny)
-                                            k[tri, nb] = k[tri, nb] + l
-                                            tcal[tri,0] = tcal[tri,0] + dtc
-                                j = j + 1
-                            tri = tri + 1
-                            r = r + 1
-                    evi = evi + 1
-            i = i + 1
+def inversion(evtfile,statfile,velfile,deg2km,nx,ny,nz,normd,gradd,iter,gr,biter,cacah,progress_callback,solver='INV',tol=1e-6,maxiter=None,
+              smooth=2,wh=1.0,wv=1.0,nproc=1,ttol=0,gmode='forward',engine='BENDING',refine=2,
+              checkpoint=None,resume=False,result=None,budget=None,state=None,update=False,levels=1,lscale=1.0,
+              minhits=0,depth=3,linear=False):
+    progress_callback = pg.wrap(progress_callback)
+    progress_callback.emit('load data')
+    with progress_callback.stage('load'):
+        cat, velocity = load(evtfile,statfile,velfile,deg2km,progress_callback)
+
+    src, rcv, tobs = cat.phase('P')
+    offset = cat.offsets('P')
+
+    # satu pool proses untuk semua pemodelan ke depan run ini
+    with pl.session(workers(nproc,engine)) as pool:
+        if update and state is not None and os.path.exists(state):
+            # grid dan model dari state run sebelumnya, tanpa parameterisasi
+            return increment(state,src,rcv,tobs,normd,gradd,iter,biter,cacah,progress_callback,solver,tol,maxiter,
+                             smooth,wh,wv,nproc,ttol,gmode,engine,refine,result,budget,pool,linear,offset,levels,
+                             minhits,depth)
+        progress_callback.emit('parameterization')
+        with progress_callback.stage('parameterize'):
+            x,y,z,vxyz = pr.param2(cat,velocity,deg2km,nx,ny,nz)
+        vxyz, rms = multilevel(x,y,z,vxyz,src,rcv,tobs,normd,gradd,iter,biter,cacah,progress_callback,solver,tol,
+                               maxiter,smooth,wh,wv,nproc,ttol,gmode,engine,refine,checkpoint,resume,result,None,budget,
+                               state,levels,lscale,minhits,depth,pool,linear,offset)
+    return x,y,z,vxyz,rms
 
-        progress_callback.emit('iteration i-th: ' + str(niter + 1) + ', inversion')
-        dtco = tobs-tcal
-        rms[niter] = np.sum(np.power(dtco,2))
+def inversionS(evtfile,statfile,velfile,deg2km,nx,ny,nz,normd,gradd,iter,gr,biter,cacah,progress_callback,solver='INV',tol=1e-6,maxiter=None,
+               smooth=2,wh=1.0,wv=1.0,nproc=1,ttol=0,gmode='forward',engine='BENDING',refine=2,
+               checkpoint=None,resume=False,result=None,budget=None,state=None,update=False,levels=1,lscale=1.0,
+               minhits=0,depth=3,linear=False):
+    progress_callback = pg.wrap(progress_callback)
+    progress_callback.emit('load data')
+    with progress_callback.stage('load'):
+        cat, velocity = load(evtfile,statfile,velfile,deg2km,progress_callback)
+
+    src, rcv, tobs = cat.phase('S')
+    offset = cat.offsets('S')
+
+    # satu pool proses untuk semua pemodelan ke depan run ini
+    with pl.session(workers(nproc,engine)) as pool:
+        if update and state is not None and os.path.exists(state):
+            # grid dan model dari state run sebelumnya, tanpa parameterisasi
+            return increment(state,src,rcv,tobs,normd,gradd,iter,biter,cacah,progress_callback,solver,tol,maxiter,
+                             smooth,wh,wv,nproc,ttol,gmode,engine,refine,result,budget,pool,linear,offset,levels,
+                             minhits,depth)
+        progress_callback.emit('parameterization')
+        with progress_callback.stage('parameterize'):
+            x,y,z,vxyz = pr.paramS(cat,velocity,deg2km,nx,ny,nz)
+        vxyz, rms = multilevel(x,y,z,vxyz,src,rcv,tobs,normd,gradd,iter,biter,cacah,progress_callback,solver,tol,
+                               maxiter,smooth,wh,wv,nproc,ttol,gmode,engine,refine,checkpoint,resume,result,None,budget,
+                               state,levels,lscale,minhits,depth,pool,linear,offset)
+    return x,y,z,vxyz,rms
 
-        iden = np.eye(vxyz.size)
-        k[ntr:ntr+vxyz.size,0::] = normd*iden
-
-        gamma = np.zeros((vxyz.size,vxyz.size))
-        n = 0
-        for i in range(nx):
-            for j in range(ny):
-                for kk in range(nz):
-                    pem = 0
-                    if i - 1 >= 0:
-                        nb = bs.noblok(i-1, j, kk, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if i + 1 < nx:
-                        nb = bs.noblok(i+1, j, kk, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if j - 1 >= 0:
-                        nb = bs.noblok(i, j-1, kk, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if j + 1 < ny:
-                        nb = bs.noblok(i, j+1, kk, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if kk - 1 >= 0:
-                        nb = bs.noblok(i, j, kk-1, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if kk + 1 < nz:
-                        nb = bs.noblok(i, j, kk+1, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    gamma[n,:] = gamma[n,:]/pem
-                    nb = bs.noblok(i, j, kk, nx, ny)
-                    gamma[n, nb] = 1
-                    n = n + 1
-
-        k[(ntr+vxyz.size)::,0::] = gradd*gamma
-
-
-        # inversion
-        ds = np.mat(inv(np.mat(k.transpose())*np.mat(k)))*np.mat(k.transpose())*np.mat(dtco)
-        dv = np.zeros(vxyz.size)
-
-        v0 = np.zeros(vxyz.size)
-        for i in range(nx):
-            for j in range(ny):
-                for kk in range(nz):
-                    nb = bs.noblok(i, j, kk, nx, ny)
-                    v0[nb] = vxyz[i,j,kk]
-
-        for i in range(vxyz.size):
-            dv[i] = (-1*ds[i]*(v0[i]**2))/(1+ds[i]*v0[i])
-
-        v1 = np.zeros(vxyz.size)
-        for jj in range(len(v1)):
-            v1[jj] = v0[jj] + dv[jj]
-
-        vxyzn = np.zeros(vxyz.shape)
-
-        for ii in range(len(v1)):
-            for i in range(nx):
-                for j in range(ny):
-                    for kk in range(nz):
-                        nb = bs.noblok(i, j, kk, nx, ny)
-                        if ii == nb:
-                            vxyzn[i, j, kk] = v1[ii]
-        if vxyzn.min() >= 0:
-            vxyz = vxyzn
-        else:
-            break
+def inversion_test(evtfile,statfile,velfile,deg2km,nx,ny,nz,normd,gradd,iter,gr,biter,cacah,pert,progress_callback,solver='INV',tol=1e-6,maxiter=None,
+                   smooth=2,wh=1.0,wv=1.0,nproc=1,ttol=0,gmode='forward',engine='BENDING',refine=2,
+                   checkpoint=None,resume=False,result=None,budget=None,levels=1,lscale=1.0,
+                   minhits=0,depth=3,linear=False):
+    progress_callback = pg.wrap(progress_callback)
+    progress_callback.emit('load data')
+    with progress_callback.stage('load'):
+        cat, velocity = load(evtfile,statfile,velfile,deg2km,progress_callback)
 
+    progress_callback.emit('parameterization')
+    with progress_callback.stage('parameterize'):
+        x,y,z,vxyz = pr.param2(cat,velocity,deg2km,nx,ny,nz)
+        vxyz, velr = checkerboard(vxyz,pert)
+        src, rcv, tobs = cat.phase('P')
+        offset = cat.offsets('P')
+
+    with pl.session(workers(nproc,engine)) as pool:
+        progress_callback.emit('creating t obs -> ' + str(len(tobs)) + ' rays')
+        tobs = traveltime(x,y,z,velr,src,rcv,biter,cacah,nproc,ttol,gmode,engine,refine,budget,progress_callback,pool,
+                          linear,offset)
+
+        vxyz, rms = multilevel(x,y,z,vxyz,src,rcv,tobs,normd,gradd,iter,biter,cacah,progress_callback,solver,tol,
+                               maxiter,smooth,wh,wv,nproc,ttol,gmode,engine,refine,checkpoint,resume,result,velr,budget,
+                               None,levels,lscale,minhits,depth,pool,linear,offset)
     return x,y,z,vxyz,velr,rms
 
-def inversion_testS(evtfile,statfile,velfile,deg2km,nx,ny,nz,normd,gradd,iter,gr,biter,cacah,pert,progress_callback):
+def inversion_testS(evtfile,statfile,velfile,deg2km,nx,ny,nz,normd,gradd,iter,gr,biter,cacah,pert,progress_callback,solver='INV',tol=1e-6,maxiter=None,
+                    smooth=2,wh=1.0,wv=1.0,nproc=1,ttol=0,gmode='forward',engine='BENDING',refine=2,
+                    checkpoint=None,resume=False,result=None,budget=None,levels=1,lscale=1.0,
+                    minhits=0,depth=3,linear=False):
+    progress_callback = pg.wrap(progress_callback)
     progress_callback.emit('load data')
-    file = open(evtfile,'r')
-    event = file.readlines()
-    for i in range(len(event)):
-        event[i] = event[i].split()
-    file.close()
-
-    file = open(statfile,'r')
-    station = file.readlines()
-    for i in range(len(station)):
-        station[i] = station[i].split()
-    file.close()
-
-    file = open(velfile,'r')
-    velocity = file.readlines()
-    for i in range(len(velocity)):
-        velocity[i] = velocity[i].split()
-    file.close()
+    with progress_callback.stage('load'):
+        cat, velocity = load(evtfile,statfile,velfile,deg2km,progress_callback)
 
     progress_callback.emit('parameterization')
-    x,y,z,vxyz = pr.paramS(event,station,velocity,deg2km,nx,ny,nz)
-
-    perturbation = pert
-    vmean = np.ceil(np.mean(vxyz))
-    vel = np.ones(vxyz.shape)*vmean
-    vxyz = vel
-
-    velr = np.zeros(vel.shape)
-    for i in range(velr.shape[0]):
-        for j in range(velr.shape[1]):
-            for k in range(velr.shape[2]):
-                nb = bs.noblok(i, j, k, nx, ny)
-                if np.mod(nb,2) == 0:
-                    velr[i,j,k] = vmean + vmean*perturbation
-                else:
-                    velr[i, j, k] = vmean - vmean * perturbation
-
-    dvxr, dvyr, dvzr = bs.diff_cube(velr, x, y, z)
-    # membuat kernel
-    ntr = 0
-    for i in range(len(event)):
-        if event[i] != [] and event[i][0] != '#' and event[i][-1] == 'S':
-            ntr = ntr + 1
-
-    k = np.zeros((ntr + vxyz.size + vxyz.size, vxyz.size))
-    tobs = np.zeros((ntr + vxyz.size + vxyz.size, 1))
-
-    i = 0
-    tri = 0
-    evi = 0
-    while i < len(event):
-        if event[i] != []:
-            if event[i][0] == '#':
-                progress_callback.emit(
-                    'creating t obs -> ' + 'event i-th: ' + str(
-                        evi + 1) + ', event ID: ' + str(event[i][-1]))
-                lats = float(event[i][7])
-                lons = float(event[i][8])
-                zs = float(event[i][9])
-                colats, colons = pr.colatlon(lats, lons)
-                xs, ys = pr.colatlon2km(colats, colons, deg2km)
-                r = i + 1
-                if r < len(event):
-                    while r < len(event) and event[r][0] != '#' and event[r][-1] == 'S':
-                        j = 0
-                        while j < len(station):
-                            if event[r][0] == station[j][0]:
-                                latr = float(station[j][1])
-                                lonr = float(station[j][2])
-                                colatr, colonr = pr.colatlon(latr, lonr)
-                                xr, yr = pr.colatlon2km(colatr, colonr, deg2km)
-                                xir, yir, zir = iterbending(biter, cacah, x, y, z, velr, xs, ys, zs, xr, yr, dvxr, dvyr,
-                                                            dvzr)
-                                # ---------------------
-                                for g in range(len(xir) - 1):
-                                    o1, p1, q1 = bs.index(x, y, z, xir[g], yir[g], zir[g])
-                                    o2, p2, q2 = bs.index(x, y, z, xir[g + 1], yir[g + 1], zir[g + 1])
-                                    ngr = np.abs(o2 - o1) + np.abs(p2 - p1) + np.abs(q2 - q1) + 1
-                                    lgr = gr * ngr
-                                    xsp = np.linspace(xir[g], xir[g + 1], int(lgr))
-                                    ysp = np.linspace(yir[g], yir[g + 1], int(lgr))
-                                    zsp = np.linspace(zir[g], zir[g + 1], int(lgr))
-                                    for ii in range(lgr - 1):
-                                        l = np.sqrt(
-                                            pow(xsp[ii] - xsp[ii + 1], 2) + pow(ysp[ii] - ysp[ii + 1], 2) + pow(
-                                                zsp[ii] - zsp[ii + 1], 2))
-                                        oi, pi, qi = bs.index(x, y, z, xsp[ii], ysp[ii], zsp[ii])
-                                        dtc = l / vxyz[oi, pi, qi]
-                                        nb = bs.noblok(oi, pi, qi, nx, ny)
-                                        k[tri, nb] = k[tri, nb] + l
-                                        tobs[tri, 0] = tobs[tri, 0] + dtc
-                            j = j + 1
-                        tri = tri + 1
-                        r = r + 1
-                evi = evi + 1
-        i = i + 1
-
-    rms = np.zeros(iter)
-    for niter in range(iter):
-        print(niter)
-        dvx, dvy, dvz = bs.diff_cube(vxyz,x,y,z)
-        # dvxr, dvyr, dvzr = bs.diff_cube(velr, x, y, z)
-
-        # membuat kernel
-        ntr = 0
-        for i in range(len(event)):
-            if event[i] != [] and event[i][0] != '#' and event[i][-1] == 'S':
-                ntr = ntr + 1
-
-        k = np.zeros((ntr+vxyz.size+vxyz.size,vxyz.size))
-        tcal = np.zeros((ntr+vxyz.size+vxyz.size,1))
-        # tobs = np.zeros((ntr+vxyz.size+vxyz.size,1))
-
-        i = 0
-        tri = 0
-        evi = 0
-        while i < len(event):
-            if event[i] != []:
-                if event[i][0] == '#':
-                    progress_callback.emit(
-                        'iteration i-th: ' + str(niter + 1) + ', forward modelling -> ' + 'event i-th: ' + str(
-                            evi + 1) + ', event ID: ' + str(event[i][-1]))
-                    lats = float(event[i][7])
-                    lons = float(event[i][8])
-                    zs = float(event[i][9])
-                    colats, colons = pr.colatlon(lats, lons)
-                    xs, ys = pr.colatlon2km(colats, colons, deg2km)
-                    r = i + 1
-                    if r < len(event):
-                        while r <len(event) and event[r][0] != '#' and event[r][-1] == 'S':
-                            # tobs[tri,0] = float(event[r][1])
-                            j = 0
-                            while j < len(station):
-                                if event[r][0] == station[j][0]:
-                                    latr = float(station[j][1])
-                                    lonr = float(station[j][2])
-                                    colatr, colonr = pr.colatlon(latr, lonr)
-                                    xr, yr = pr.colatlon2km(colatr, colonr, deg2km)
-                                    xir, yir, zir = iterbending(biter, cacah, x, y, z, velr, xs, ys, zs, xr, yr, dvxr, dvyr,
-                                                             dvzr)
-                                    xi,yi,zi = iterbending(biter,cacah,x,y,z,vxyz,xs,ys,zs,xr,yr,dvx,dvy,dvz)
-                                    #---------------------
-                                    for g in range(len(xi)-1):
-                                        o1, p1, q1 = bs.index(x, y, z, xi[g], yi[g], zi[g])
-                                        o2, p2, q2 = bs.index(x, y, z, xi[g+1], yi[g+1], zi[g+1])
-                                        ngr = np.abs(o2-o1)+np.abs(p2-p1)+np.abs(q2-q1)+1
-                                        lgr = gr*ngr
-                                        xsp = np.linspace(xi[g],xi[g+1],int(lgr))
-                                        ysp = np.linspace(yi[g],yi[g+1],int(lgr))
-                                        zsp = np.linspace(zi[g],zi[g+1],int(lgr))
-                                        for ii in range(lgr-1):
-                                            l = np.sqrt(
-                                                pow(xsp[ii] - xsp[ii+1], 2) + pow(ysp[ii] - ysp[ii+1], 2) + pow(zsp[ii] - zsp[ii+1], 2))
-                                            oi, pi, qi = bs.index(x, y, z, xsp[ii], ysp[ii], zsp[ii])
-                                            dtc = l/vxyz[oi,pi,qi]
-                                            nb = bs.noblok(oi, pi, qi, nx, ny)
-                                            k[tri, nb] = k[tri, nb] + l
-                                            tcal[tri,0] = tcal[tri,0] + dtc
-                                j = j + 1
-                            tri = tri + 1
-                            r = r + 1
-                    evi = evi + 1
-            i = i + 1
+    with progress_callback.stage('parameterize'):
+        x,y,z,vxyz = pr.paramS(cat,velocity,deg2km,nx,ny,nz)
+        vxyz, velr = checkerboard(vxyz,pert)
+        src, rcv, tobs = cat.phase('S')
+        offset = cat.offsets('S')
+
+    with pl.session(workers(nproc,engine)) as pool:
+        progress_callback.emit('creating t obs -> ' + str(len(tobs)) + ' rays')
+        tobs = traveltime(x,y,z,velr,src,rcv,biter,cacah,nproc,ttol,gmode,engine,refine,budget,progress_callback,pool,
+                          linear,offset)
+
+        vxyz, rms = multilevel(x,y,z,vxyz,src,rcv,tobs,normd,gradd,iter,biter,cacah,progress_callback,solver,tol,
+                               maxiter,smooth,wh,wv,nproc,ttol,gmode,engine,refine,checkpoint,resume,result,velr,budget,
+                               None,levels,lscale,minhits,depth,pool,linear,offset)
+    return x,y,z,vxyz,velr,rms
 
-        progress_callback.emit('iteration i-th: ' + str(niter + 1) + ', inversion')
-        dtco = tobs-tcal
-        rms[niter] = np.sum(np.power(dtco,2))
+def lcurve(evtfile,statfile,velfile,deg2km,nx,ny,nz,normds,gradds,gr,biter,cacah,progress_callback,phase='P',solver='INV',
+           tol=1e-6,maxiter=None,smooth=2,wh=1.0,wv=1.0,nproc=1,ttol=0,gmode='forward',engine='BENDING',refine=2,
+           linear=False):
+    # satu kali pemodelan ke depan pada model awal, lalu satu inversi per pasangan (normd, gradd)
+    progress_callback = pg.wrap(progress_callback)
+    progress_callback.emit('load data')
+    with progress_callback.stage('load'):
+        cat, velocity = load(evtfile,statfile,velfile,deg2km,progress_callback)
 
-        iden = np.eye(vxyz.size)
-        k[ntr:ntr+vxyz.size,0::] = normd*iden
-
-        gamma = np.zeros((vxyz.size,vxyz.size))
-        n = 0
-        for i in range(nx):
-            for j in range(ny):
-                for kk in range(nz):
-                    pem = 0
-                    if i - 1 >= 0:
-                        nb = bs.noblok(i-1, j, kk, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if i + 1 < nx:
-                        nb = bs.noblok(i+1, j, kk, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if j - 1 >= 0:
-                        nb = bs.noblok(i, j-1, kk, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if j + 1 < ny:
-                        nb = bs.noblok(i, j+1, kk, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if kk - 1 >= 0:
-                        nb = bs.noblok(i, j, kk-1, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    if kk + 1 < nz:
-                        nb = bs.noblok(i, j, kk+1, nx, ny)
-                        gamma[n, nb] = -1
-                        pem = pem + 1
-                    gamma[n,:] = gamma[n,:]/pem
-                    nb = bs.noblok(i, j, kk, nx, ny)
-                    gamma[n, nb] = 1
-                    n = n + 1
-
-        k[(ntr+vxyz.size)::,0::] = gradd*gamma
-
-
-        # inversion
-        ds = np.mat(inv(np.mat(k.transpose())*np.mat(k)))*np.mat(k.transpose())*np.mat(dtco)
-        dv = np.zeros(vxyz.size)
-
-        v0 = np.zeros(vxyz.size)
-        for i in range(nx):
-            for j in range(ny):
-                for kk in range(nz):
-                    nb = bs.noblok(i, j, kk, nx, ny)
-                    v0[nb] = vxyz[i,j,kk]
-
-        for i in range(vxyz.size):
-            dv[i] = (-1*ds[i]*(v0[i]**2))/(1+ds[i]*v0[i])
-
-        v1 = np.zeros(vxyz.size)
-        for jj in range(len(v1)):
-            v1[jj] = v0[jj] + dv[jj]
-
-        vxyzn = np.zeros(vxyz.shape)
-
-        for ii in range(len(v1)):
-            for i in range(nx):
-                for j in range(ny):
-                    for kk in range(nz):
-                        nb = bs.noblok(i, j, kk, nx, ny)
-                        if ii == nb:
-                            vxyzn[i, j, kk] = v1[ii]
-        if vxyzn.min() >= 0:
-            vxyz = vxyzn
+    progress_callback.emit('parameterization')
+    with progress_callback.stage('parameterize'):
+        if phase == 'S':
+            x,y,z,vxyz = pr.paramS(cat,velocity,deg2km,nx,ny,nz)
         else:
-            break
+            x,y,z,vxyz = pr.param2(cat,velocity,deg2km,nx,ny,nz)
+        src, rcv, tobs = cat.phase(phase)
+        offset = cat.offsets(phase)
+
+    progress_callback.emit('forward modelling -> ' + str(len(tobs)) + ' rays')
+    kray, tcal, paths = forward(x,y,z,vxyz,src,rcv,biter,cacah,nproc,None,ttol,None,gmode,engine,refine,
+                                progress_callback,linear=linear,offset=offset)
+
+    pairs = [(normd,gradd) for normd in normds for gradd in gradds]
+    progress_callback.emit('L-curve -> ' + str(len(pairs)) + ' (norm, gradient) pairs')
+    with progress_callback.stage('solve'):
+        table, models = lc.sweep(kray,tobs - tcal,vxyz,pairs,solver,tol,maxiter,smooth,wh,wv,nproc)
+    return x,y,z,table,models
+
+def resolution(evtfile,statfile,velfile,deg2km,nx,ny,nz,normd,gradd,iter,gr,biter,cacah,sizes,perts,progress_callback,
+               phase='P',diag=False,solver='INV',tol=1e-6,maxiter=None,smooth=2,wh=1.0,wv=1.0,nproc=1,ttol=0,
+               gmode='forward',engine='BENDING',refine=2,linear=False):
+    # uji papan catur memakai kernel inversi sebenarnya: waktu tempuh sintetik dari K, tanpa penelusuran sinar ulang
+    progress_callback = pg.wrap(progress_callback)
+    progress_callback.emit('load data')
+    with progress_callback.stage('load'):
+        cat, velocity = load(evtfile,statfile,velfile,deg2km,progress_callback)
 
-    return x,y,z,vxyz,velr,rms
+    progress_callback.emit('parameterization')
+    with progress_callback.stage('parameterize'):
+        if phase == 'S':
+            x,y,z,vxyz = pr.paramS(cat,velocity,deg2km,nx,ny,nz)
+        else:
+            x,y,z,vxyz = pr.param2(cat,velocity,deg2km,nx,ny,nz)
+        src, rcv, tobs = cat.phase(phase)
+        offset = cat.offsets(phase)
+
+    with pl.session(workers(nproc,engine)) as pool:
+        vxyz, rms = invert(x,y,z,vxyz,src,rcv,tobs,normd,gradd,iter,biter,cacah,progress_callback,solver,tol,maxiter,
+                           smooth,wh,wv,nproc,ttol,gmode,engine,refine,pool=pool,linear=linear,offset=offset)
+        progress_callback.emit('resolution -> kernel of the final model')
+        kray, tcal, paths = forward(x,y,z,vxyz,src,rcv,biter,cacah,nproc,None,ttol,None,gmode,engine,refine,
+                                    progress_callback,pool,linear,offset=offset)
+
+    cases = []
+    velr = []
+    rec = []
+    for size in sizes:
+        for pert in perts:
+            progress_callback.emit('resolution -> checkerboard size ' + str(size) + ', perturbation ' + str(pert))
+            v = rs.checkerboard(vxyz,size,pert)
+            with progress_callback.stage('solve'):
+                r, corr = rs.recover(kray,vxyz,v,normd,gradd,solver,tol,maxiter,smooth,wh,wv)
+            cases.append([size,pert,corr])
+            velr.append(v)
+            rec.append(r)
+
+    hits = rs.hitcount(kray,vxyz.shape)
+    weight = rs.dws(kray,vxyz.shape)
+    rdiag = None
+    if diag:
+        progress_callback.emit('resolution -> diagonal of the resolution matrix')
+        rdiag = rs.diagonal(kray,vxyz.shape,normd,gradd,smooth,wh,wv)
+    return x,y,z,vxyz,np.array(cases),np.array(velr),np.array(rec),hits,weight,rdiag
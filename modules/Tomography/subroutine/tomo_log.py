@@ -1,6 +1,8 @@
 class tomo_log(object):
     def __init__(self, path, evtdat, statdat, veldat, xout, yout, zout, velog, velobsout, velcalout, velpout, velsout,
-                 velpsout, type, deg2km, nx, ny, nz, normd, gradd, iter, cacah, biter, split, pert):
+                 velpsout, type, deg2km, nx, ny, nz, normd, gradd, iter, cacah, biter, split, pert, solver='INV', tol='1e-6',
+                 maxiter='0', nproc='1', ttol='0', engine='BENDING', budget='0',
+                 levels='1', lscale='1', minhits='0', depth='3', linear='0'):
         file = open(path, 'w')
         file.write(
             'Path of Input Data ->' + '\n' +
@@ -34,11 +36,31 @@ class tomo_log(object):
             'Number of Tomography Iteration:' + '\t' + iter + '\n' +
             'Number of Part of Ray Bending:' + '\t' + cacah + '\n' +
             'Number of Ray Iteration:' + '\t' + biter + '\n' +
-            'Number of Splitting Ray Resolution:' + '\t' + split + '\n' +
-            'Value of Perturbation Test:' + '\t' + pert + '\n'
+            'Number of Splitting Ray Resolution (deprecated, unused):' + '\t' + split + '\n' +
+            'Value of Perturbation Test:' + '\t' + pert + '\n' +
+            'Solver:' + '\t' + solver + '\n' +
+            'Solver Tolerance:' + '\t' + tol + '\n' +
+            'Solver Iteration Limit:' + '\t' + maxiter + '\n' +
+            'Number of Processes:' + '\t' + nproc + '\n' +
+            'Ray Bending Tolerance:' + '\t' + ttol + '\n' +
+            'Forward Engine:' + '\t' + engine + '\n' +
+            'Memory Budget (MB):' + '\t' + budget + '\n' +
+            'Grid Levels:' + '\t' + levels + '\n' +
+            'Level Damping Factor:' + '\t' + lscale + '\n' +
+            'Adaptive Min Hits:' + '\t' + minhits + '\n' +
+            'Adaptive Merge Depth:' + '\t' + depth + '\n' +
+            'Trilinear Ray Bending:' + '\t' + linear + '\n'
         )
         file.close()
 
+def stage_log(path, times):
+    # seconds spent in every stage of the run, appended after the rms
+    file = open(path, 'a')
+    file.write('\n' + 'Stage Time:' + '\n')
+    for name in times:
+        file.write(name + ':' + '\t' + '%.3f' % times[name] + '\n')
+    file.close()
+
 def read_log(path):
     file = open(path,'r')
     data = file.readlines()
@@ -98,7 +120,8 @@ def read_log(path):
     else:
         velpsout = ''
 
-    type = data[21][-1]
+    # 'P & S' is split in three
+    type = ' '.join(data[21][3:])
     deg2km = data[22][-1]
     nx = data[23][-1]
     ny = data[24][-1]
@@ -111,4 +134,38 @@ def read_log(path):
     split = data[31][-1]
     pert = data[32][-1]
 
-    return evtdat, statdat, veldat, xout, yout, zout, velog, velobsout, velcalout, velpout, velsout, velpsout, type, deg2km, nx, ny, nz, normd, gradd, iter, cacah, biter, split, pert
\ No newline at end of file
+    # logs written before the solver settings existed
+    solver = 'INV'
+    tol = '1e-6'
+    maxiter = '0'
+    if len(data) > 35 and data[33] != [] and data[33][0] == 'Solver:':
+        solver = data[33][-1]
+        tol = data[34][-1]
+        maxiter = data[35][-1]
+    nproc = '1'
+    if len(data) > 36 and data[36] != [] and data[36][0] == 'Number' and data[36][2] == 'Processes:':
+        nproc = data[36][-1]
+    ttol = '0'
+    if len(data) > 37 and data[37] != [] and data[37][0] == 'Ray' and data[37][2] == 'Tolerance:':
+        ttol = data[37][-1]
+    engine = 'BENDING'
+    if len(data) > 38 and data[38] != [] and data[38][0] == 'Forward' and data[38][1] == 'Engine:':
+        engine = data[38][-1]
+    budget = '0'
+    if len(data) > 39 and data[39] != [] and data[39][0] == 'Memory' and data[39][1] == 'Budget':
+        budget = data[39][-1]
+    levels = '1'
+    lscale = '1'
+    if len(data) > 41 and data[40] != [] and data[40][0] == 'Grid' and data[40][1] == 'Levels:':
+        levels = data[40][-1]
+        lscale = data[41][-1]
+    minhits = '0'
+    depth = '3'
+    if len(data) > 43 and data[42] != [] and data[42][0] == 'Adaptive' and data[42][1] == 'Min':
+        minhits = data[42][-1]
+        depth = data[43][-1]
+    linear = '0'
+    if len(data) > 44 and data[44] != [] and data[44][0] == 'Trilinear':
+        linear = data[44][-1]
+
+    return evtdat, statdat, veldat, xout, yout, zout, velog, velobsout, velcalout, velpout, velsout, velpsout, type, deg2km, nx, ny, nz, normd, gradd, iter, cacah, biter, split, pert, solver, tol, maxiter, nproc, ttol, engine, budget, levels, lscale, minhits, depth, linear
\ No newline at end of file
@@ -0,0 +1,63 @@
+import numpy as np
+
+# exact ray length per block (Amanatides-Woo style grid traversal). A block spans
+# [a[i], a[i] + da) along each axis, the same cells bs.index snaps to.
+
+
+def traverse_all(axes, paths):
+    # paths is (nray, npts, ndim); returns ray number, block number and length,
+    # one entry per block crossed by each ray
+    paths = np.asarray(paths, dtype=float)
+    nray, npts, ndim = paths.shape
+    p0 = paths[:, :-1, :].reshape(-1, ndim)
+    p1 = paths[:, 1:, :].reshape(-1, ndim)
+    nseg = p0.shape[0]
+    seglen = np.sqrt(np.sum((p1 - p0) ** 2, axis=1))
+
+    t = [np.zeros(nseg), np.ones(nseg)]
+    seg = [np.arange(nseg), np.arange(nseg)]
+    for n in range(ndim):
+        a = axes[n]
+        da = a[1] - a[0]
+        u0 = (p0[:, n] - a[0]) / da
+        u1 = (p1[:, n] - a[0]) / da
+        # cell faces strictly between the two ends of each segment
+        lo = np.floor(np.minimum(u0, u1)) + 1
+        hi = np.ceil(np.maximum(u0, u1)) - 1
+        cnt = np.maximum(hi - lo + 1, 0).astype(int)
+        sg = np.repeat(np.arange(nseg), cnt)
+        m = lo[sg] + np.arange(cnt.sum()) - np.repeat(np.cumsum(cnt) - cnt, cnt)
+        t.append((m - u0[sg]) / (u1[sg] - u0[sg]))
+        seg.append(sg)
+    t = np.concatenate(t)
+    seg = np.concatenate(seg)
+    order = np.lexsort((t, seg))
+    t = t[order]
+    seg = seg[order]
+
+    same = seg[1:] == seg[:-1]
+    sg = seg[1:][same]
+    tm = 0.5 * (t[1:] + t[:-1])[same]
+    l = (t[1:] - t[:-1])[same] * seglen[sg]
+
+    # block holding the middle of every piece
+    nb = np.zeros(sg.size, dtype=int)
+    stride = 1
+    for n in range(ndim):
+        a = axes[n]
+        pm = p0[sg, n] + tm * (p1[sg, n] - p0[sg, n])
+        i = np.clip(np.floor((pm - a[0]) / (a[1] - a[0])), 0, len(a) - 1).astype(int)
+        nb = nb + i * stride
+        stride = stride * len(a)
+
+    ray = sg // (npts - 1)
+    keep = l > 0
+    key, inv = np.unique(ray[keep] * stride + nb[keep], return_inverse=True)
+    l = np.bincount(inv, weights=l[keep]).astype(float)
+    return key // stride, key % stride, l
+
+
+def traverse(axes, path):
+    # path is one polyline (npts, ndim); returns block numbers and lengths
+    ray, nb, l = traverse_all(axes, np.asarray(path, dtype=float)[None])
+    return nb, l
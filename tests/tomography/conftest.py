@@ -0,0 +1,17 @@
+import pytest
+import modules.Tomography.benchmark as bm
+import modules.Tomography.batch as bt
+
+# run from the repository root: python -m pytest tests/tomography
+
+
+@pytest.fixture(scope='session')
+def problem(tmp_path_factory):
+    # .evt, station and velocity files of a small synthetic catalog, 12 events at 8 stations
+    return bm.problem3d(str(tmp_path_factory.mktemp('problem')), 12, 8)
+
+
+@pytest.fixture
+def progress():
+    # silent progress callback
+    return bt.progress(None)
@@ -0,0 +1,25 @@
+import numpy as np
+import modules.Tomography.benchmark as bm
+import modules.Tomography.subroutine.tomo_inverse as ti
+import modules.Tomography.subroutine.parameterization as pr
+import modules.Tomography.subroutine.bending as bd
+import modules.Tomography.subroutine.basic as bs
+import modules.Tomography.subroutine.lookup as lk
+
+
+def test_bend_follows_iterbending(problem, progress):
+    # same node order as the scalar iterbending, on a rough model so that rays do bend
+    cat, velocity = ti.load(*problem, 111.19, progress)
+    x, y, z, vxyz = pr.param2(cat, velocity, 111.19, 5, 5, 4)
+    vxyz = vxyz * (1 + 0.15 * np.random.default_rng(1).standard_normal(vxyz.shape))
+    dvx, dvy, dvz = bs.diff_cube(vxyz, x, y, z)
+    src, rcv, tobs = cat.phase('P')
+    rcv = rcv.copy()
+    rcv[:, 2] = 0
+    for biter, cacah in [(1, 6), (5, 6), (10, 12)]:
+        old = bm.legacy_forward(x, y, z, vxyz, src, rcv, biter, cacah)
+        new = bd.bend(x, y, z, vxyz, dvx, dvy, dvz, src, rcv, biter, cacah, eps=0)
+        # iterbending lets a node above the grid through as a mirrored block index, bend stops the ray there
+        inside = np.all(lk.locate((x, y, z), old, True)[1], axis=1)
+        assert inside.sum() > 0.9 * len(src)
+        assert np.allclose(new[inside], old[inside], rtol=0, atol=1e-9)
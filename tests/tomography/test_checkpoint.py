@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+import modules.Tomography.subroutine.tomo_inverse as ti
+import modules.Tomography.subroutine.checkpoint as cp
+
+
+@pytest.mark.parametrize('options', [dict(), dict(solver='LSQR'), dict(budget=8 * 2 ** 20), dict(minhits=20)])
+def test_resume(problem, progress, tmp_path, options):
+    # two iterations, stopped, then resumed to four: the same model and misfit as four at once
+    args = (*problem, 111.19, 5, 5, 4, 20, 20)
+    checkpoint = str(tmp_path / 'run.ckpt.npz')
+    fresh = ti.inversion(*args, 4, 1, 5, 6, progress, **options)
+    ti.inversion(*args, 2, 1, 5, 6, progress, checkpoint=checkpoint, **options)
+    assert cp.load(checkpoint)['niter'] == 1
+    resumed = ti.inversion(*args, 4, 1, 5, 6, progress, checkpoint=checkpoint, resume=True, **options)
+    assert np.array_equal(fresh[3], resumed[3])
+    assert np.array_equal(fresh[4], resumed[4])
+
+
+def test_resume_other_settings(problem, progress, tmp_path):
+    args = (*problem, 111.19, 5, 5, 4, 20, 20)
+    checkpoint = str(tmp_path / 'run.ckpt.npz')
+    ti.inversion(*args, 2, 1, 5, 6, progress, checkpoint=checkpoint)
+    with pytest.raises(ValueError):
+        ti.inversion(*args, 4, 1, 10, 6, progress, checkpoint=checkpoint, resume=True)
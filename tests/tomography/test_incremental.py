@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+import modules.Tomography.subroutine.tomo_inverse as ti
+import modules.Tomography.subroutine.incremental as ic
+import modules.Tomography.subroutine.block as blk
+
+
+def catalogs(problem, tmp_path):
+    # the catalog without its last pick, and the whole catalog
+    lines = open(problem[0]).read().splitlines()
+    first = str(tmp_path / 'first.evt')
+    open(first, 'w').write('\n'.join(lines[:-1]) + '\n')
+    return first, problem[0]
+
+
+def test_one_pick(problem, progress, tmp_path):
+    # two iterations on the catalog, then one update step for one more pick: close to
+    # three iterations on the whole catalog, the old rays keep their stored kernel
+    first, whole = catalogs(problem, tmp_path)
+    state = str(tmp_path / 'run.state.npz')
+    args = (*problem[1:], 111.19, 4, 4, 3, 10, 10)
+    a = ti.inversion(first, *args, 2, 1, 5, 6, progress, state=state)
+    u = ti.inversion(whole, *args, 1, 1, 5, 6, progress, state=state, update=True)
+    f = ti.inversion(whole, *args, 3, 1, 5, 6, progress)
+    # P picks of 12 events at 8 stations, the last one new
+    assert ic.load(state)['nray'] == 96
+    assert np.abs(u[3] - f[3]).max() < 0.2 * np.abs(a[3] - f[3]).max()
+    assert np.isclose(u[4][-1], f[4][-1], rtol=1e-2)
+
+    # nothing new: the stored model comes back
+    again = ti.inversion(whole, *args, 1, 1, 5, 6, progress, state=state, update=True)
+    assert np.array_equal(again[3], u[3])
+
+
+def test_settings(problem, progress, tmp_path):
+    # an update solves on the adaptive cells of the earlier run, other grid settings are refused
+    first, whole = catalogs(problem, tmp_path)
+    state = str(tmp_path / 'run.state.npz')
+    args = (*problem[1:], 111.19, 4, 4, 3, 10, 10)
+    ti.inversion(first, *args, 2, 1, 5, 6, progress, state=state, minhits=20)
+    old = ic.load(state)
+    assert old['cell'] is not None and len(np.unique(old['cell'])) < old['vxyz'].size
+    for options in [dict(), dict(minhits=10), dict(minhits=20, levels=2)]:
+        with pytest.raises(ValueError):
+            ti.inversion(whole, *args, 1, 1, 5, 6, progress, state=state, update=True, **options)
+    u = ti.inversion(whole, *args, 1, 1, 5, 6, progress, state=state, update=True, minhits=20)
+    ds = 1 / blk.flatten(u[3]) - 1 / blk.flatten(old['vxyz'])
+    assert max(np.ptp(ds[old['cell'] == c]) for c in np.unique(old['cell'])) < 1e-12
+
+
+def test_outside(problem, progress, tmp_path):
+    # a new event beyond the stored grid is refused and named
+    first, whole = catalogs(problem, tmp_path)
+    lines = open(whole).read().splitlines()
+    far = str(tmp_path / 'far.evt')
+    head = lines[0].split()
+    head[8] = '%.4f' % (float(head[8]) + 1.5)
+    open(far, 'w').write('\n'.join(lines + [' '.join(head)] + lines[1:3]) + '\n')
+    state = str(tmp_path / 'run.state.npz')
+    args = (*problem[1:], 111.19, 4, 4, 3, 10, 10)
+    ti.inversion(whole, *args, 1, 1, 5, 6, progress, state=state)
+    with pytest.raises(ValueError, match='event 13 '):
+        ti.inversion(far, *args, 1, 1, 5, 6, progress, state=state, update=True)
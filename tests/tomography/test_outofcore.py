@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+import modules.Tomography.subroutine.tomo_inverse as ti
+import modules.Tomography.subroutine.outofcore as oc
+import modules.Tomography.subroutine.catalog as ct
+
+
+def budget(shape, cacah, solver, nray):
+    # memory budget that leaves room for about nray rays per chunk
+    return oc.fixed(shape, solver) + nray * oc.perray(shape, cacah)
+
+
+def test_chunks_keep_events(problem, progress):
+    cat = ti.load(*problem, 111.19, progress)[0]
+    offset = cat.offsets('P')
+    bounds = oc.chunks(offset, budget((5, 5, 4), 6, 'INV', 20), (5, 5, 4), 6)
+    assert len(bounds) > 3
+    assert bounds[0] == 0 and bounds[-1] == offset[-1]
+    assert set(bounds) <= set(offset)
+    with pytest.raises(ValueError):
+        oc.chunks(offset, oc.fixed((5, 5, 4)), (5, 5, 4), 6)
+
+
+@pytest.mark.parametrize('solver, tol', [('INV', 1e-10), ('LSQR', 1e-5)])
+def test_budget(problem, progress, solver, tol):
+    # normal equations summed chunk by chunk give the model of the whole kernel
+    args = (*problem, 111.19, 5, 5, 4, 20, 20, 3, 1, 5, 6, progress)
+    whole = ti.inversion(*args, solver=solver)
+    chunked = ti.inversion(*args, solver=solver, budget=budget((5, 5, 4), 6, solver, 20))
+    assert np.allclose(whole[3], chunked[3], rtol=0, atol=tol)
+    assert np.allclose(whole[4], chunked[4], rtol=tol)
+
+
+def test_window():
+    offset = np.array([0, 3, 5, 9])
+    assert list(ct.window(offset, 2, 7)) == [0, 1, 3, 5]
@@ -0,0 +1,25 @@
+import numpy as np
+import modules.Tomography.subroutine.tomo_inverse as ti
+import modules.Tomography.subroutine.parameterization as pr
+
+# a process pool shards the rays by event; the result must not depend on the number of processes
+
+
+def test_inversion(problem, progress):
+    args = (*problem, 111.19, 5, 5, 4, 20, 20, 2, 1, 5, 6)
+    serial = ti.inversion(*args, progress, nproc=1)
+    pool = ti.inversion(*args, progress, nproc=2)
+    assert np.array_equal(serial[3], pool[3])
+    assert np.array_equal(serial[4], pool[4])
+
+
+def test_forward(problem, progress):
+    cat, velocity = ti.load(*problem, 111.19, progress)
+    x, y, z, vxyz = pr.param2(cat, velocity, 111.19, 5, 5, 4)
+    src, rcv, tobs = cat.phase('P')
+    offset = cat.offsets('P')
+    k1, t1, p1 = ti.forward(x, y, z, vxyz, src, rcv, 5, 6, nproc=1, offset=offset)
+    k3, t3, p3 = ti.forward(x, y, z, vxyz, src, rcv, 5, 6, nproc=3, offset=offset)
+    assert (k1 != k3).nnz == 0
+    assert np.array_equal(t1, t3)
+    assert np.array_equal(p1, p3)
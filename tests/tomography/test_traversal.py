@@ -0,0 +1,44 @@
+import numpy as np
+import modules.Tomography.subroutine.traversal as tv
+
+
+def polylines(axes, nray, npts, seed=0):
+    # random polylines with every node inside the grid
+    rng = np.random.default_rng(seed)
+    return np.stack([rng.uniform(a[0], a[-1], (nray, npts)) for a in axes], axis=-1)
+
+
+def length(paths):
+    return np.sum(np.sqrt(np.sum(np.diff(paths, axis=-2) ** 2, axis=-1)), axis=-1)
+
+
+def test_length_3d():
+    axes = (np.linspace(0, 40, 9), np.linspace(-10, 20, 7), np.linspace(0, 25, 6))
+    paths = polylines(axes, 50, 8)
+    ray, nb, l = tv.traverse_all(axes, paths)
+    assert np.all(l > 0)
+    assert np.all((nb >= 0) & (nb < 9 * 7 * 6))
+    assert np.allclose(np.bincount(ray, weights=l, minlength=50), length(paths), rtol=1e-12)
+
+
+def test_length_2d():
+    axes = (np.linspace(0, 10, 11), np.linspace(0, 5, 6))
+    for path in polylines(axes, 20, 5, seed=1):
+        nb, l = tv.traverse(axes, path)
+        assert np.isclose(np.sum(l), length(path), rtol=1e-12)
+
+
+def test_nodes_on_block_faces():
+    # nodes and whole segments lying on block faces are counted once
+    axes = (np.linspace(0, 4, 5), np.linspace(0, 4, 5), np.linspace(0, 4, 5))
+    path = np.array([[0.0, 1.0, 1.0], [2.0, 1.0, 1.0], [2.0, 3.0, 1.0], [3.5, 3.5, 2.0], [4.0, 4.0, 4.0]])
+    nb, l = tv.traverse(axes, path)
+    assert np.isclose(np.sum(l), length(path), rtol=1e-12)
+
+
+def test_blocks_along_an_axis():
+    # a ray along x through the middle of block (., 2, 1) crosses every block of the row once
+    axes = (np.linspace(0, 6, 7), np.linspace(0, 4, 5), np.linspace(0, 3, 4))
+    nb, l = tv.traverse(axes, np.array([[0.0, 2.5, 1.5], [6.0, 2.5, 1.5]]))
+    assert np.array_equal(nb, np.arange(6) + 2 * 7 + 1 * 7 * 5)
+    assert np.allclose(l, 1.0)